@@ -1,21 +1,92 @@
 from django.contrib import admin
-from .models import Client, Message, Mailing, MailingAttempt
+from .models import (
+    AttemptRetry, Client, ClientImport, Message, Mailing, MailingAttempt, MailingJob, OwnerShare, OwnerStats, Segment,
+)
+from .search import filter_clients
 
 @admin.register(Client)
 class ClientAdmin(admin.ModelAdmin):
     list_display = ('email', 'full_name')
     search_fields = ('email', 'full_name')
 
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо LIKE '%...%' по каждому полю — поисковый индекс (FTS5 или pg_trgm).
+        if not search_term:
+            return queryset, False
+        return filter_clients(queryset, search_term), False
+
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
     list_display = ('subject', )
 
 @admin.register(Mailing)
 class MailingAdmin(admin.ModelAdmin):
-    list_display = ('id', 'start_time', 'end_time', 'status', 'message')
-    filter_horizontal = ('recipients',)
+    list_display = ('id', 'owner', 'start_time', 'end_time', 'status', 'recipient_count', 'segment',
+                    'success_count', 'failed_count', 'message')
+    list_filter = ('status',)
+    list_select_related = ('owner', 'segment')
+    autocomplete_fields = ('recipients', 'segment')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_list_stats()
+
+    @admin.display(description='Выбрано получателей', ordering='recipient_count')
+    def recipient_count(self, obj):
+        return obj.recipient_count
+
+    @admin.display(description='Успешно', ordering='success_count')
+    def success_count(self, obj):
+        return obj.success_count
+
+    @admin.display(description='Не успешно', ordering='failed_count')
+    def failed_count(self, obj):
+        return obj.failed_count
 
 @admin.register(MailingAttempt)
 class MailingAttemptAdmin(admin.ModelAdmin):
     list_display = ('mailing', 'attempt_time', 'status')
-    readonly_fields = ('attempt_time',)
\ No newline at end of file
+    list_select_related = ('mailing',)
+    readonly_fields = ('attempt_time',)
+
+@admin.register(MailingJob)
+class MailingJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'mailing', 'status', 'total', 'sent', 'failed', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    list_select_related = ('mailing',)
+
+
+@admin.register(AttemptRetry)
+class AttemptRetryAdmin(admin.ModelAdmin):
+    list_display = ('mailing', 'client', 'state', 'retries', 'due_at', 'last_error')
+    list_filter = ('state',)
+    list_select_related = ('mailing', 'client')
+    raw_id_fields = ('mailing', 'client')
+
+
+@admin.register(OwnerShare)
+class OwnerShareAdmin(admin.ModelAdmin):
+    list_display = ('owner', 'weight', 'served_at')
+    list_select_related = ('owner',)
+    list_editable = ('weight',)
+
+
+@admin.register(OwnerStats)
+class OwnerStatsAdmin(admin.ModelAdmin):
+    list_display = ('owner', 'mailings', 'success', 'failed')
+    list_select_related = ('owner',)
+    readonly_fields = ('mailings', 'success', 'failed')
+
+
+@admin.register(ClientImport)
+class ClientImportAdmin(admin.ModelAdmin):
+    list_display = ('id', 'owner', 'status', 'processed', 'imported', 'rejected', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    list_select_related = ('owner',)
+    readonly_fields = ('size', 'position', 'processed', 'imported', 'rejected', 'error')
+
+
+@admin.register(Segment)
+class SegmentAdmin(admin.ModelAdmin):
+    list_display = ('name', 'owner', 'email_domain', 'tags', 'created_after', 'created_before')
+    list_select_related = ('owner',)
+    search_fields = ('name',)
@@ -0,0 +1,157 @@
+import gzip
+import json
+import os
+import time
+from datetime import timedelta, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import MailingAttempt
+
+FIELDS = ('id', 'mailing_id', 'mailing__owner_id', 'client_id', 'attempt_time', 'status', 'server_response')
+PENDING = '.pending.json'
+
+
+def archive_dir(directory=None):
+    return Path(directory or settings.MAILING_ARCHIVE_DIR)
+
+
+def month_of(moment):
+    return moment.astimezone(dt_timezone.utc).strftime('%Y-%m')
+
+
+def month_path(directory, month):
+    return directory / f'attempts-{month}.jsonl.gz'
+
+
+def _write_pending(directory, state):
+    tmp = directory / (PENDING + '.tmp')
+    tmp.write_text(json.dumps(state))
+    os.replace(tmp, directory / PENDING)
+
+
+def recover(directory):
+    """Доводит до конца пачку, прерванную падением процесса.
+
+    Перед дозаписью пачки в .pending.json сохраняются её id и размеры файлов.
+    Если строки пачки ещё в таблице, удаление не прошло — файлы обрезаются до
+    сохранённых размеров, и пачка будет заархивирована заново. Если строк уже
+    нет, пачка целиком в архиве.
+    """
+    pending = directory / PENDING
+    if not pending.exists():
+        return
+    state = json.loads(pending.read_text())
+    if MailingAttempt.objects.filter(pk__in=state['ids']).exists():
+        for name, size in state['sizes'].items():
+            with open(directory / name, 'r+b') as f:
+                f.truncate(size)
+    pending.unlink()
+
+
+def _row(values):
+    row = dict(zip(FIELDS, values))
+    row['owner_id'] = row.pop('mailing__owner_id')
+    row['attempt_time'] = row['attempt_time'].isoformat()
+    return row
+
+
+def archive_batch(directory, cutoff, batch_size):
+    """Переносит в архив одну пачку попыток старше cutoff; возвращает её размер."""
+    rows = list(
+        MailingAttempt.objects.filter(attempt_time__lt=cutoff)
+        .order_by('pk')
+        .values_list(*FIELDS)[:batch_size]
+    )
+    if not rows:
+        return 0
+    by_month = {}
+    for values in rows:
+        row = _row(values)
+        by_month.setdefault(month_of(values[FIELDS.index('attempt_time')]), []).append(row)
+
+    paths = {month: month_path(directory, month) for month in by_month}
+    ids = [values[0] for values in rows]
+    _write_pending(directory, {
+        'ids': ids,
+        'sizes': {path.name: path.stat().st_size if path.exists() else 0 for path in paths.values()},
+    })
+    for month, month_rows in by_month.items():
+        # Каждая пачка — отдельный gzip-член: gzip читает такие файлы как один поток.
+        with open(paths[month], 'ab') as f:
+            f.write(gzip.compress(
+                ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in month_rows).encode()
+            ))
+            f.flush()
+            os.fsync(f.fileno())
+    with transaction.atomic():
+        MailingAttempt.objects.filter(pk__in=ids).delete()
+    (directory / PENDING).unlink()
+    return len(rows)
+
+
+def archive_attempts(older_than=None, batch_size=None, directory=None, pause=0.0, max_batches=None):
+    """Переносит попытки старше older_than (timedelta) из таблицы в архив по месяцам.
+
+    Каждая пачка удаляется отдельной короткой транзакцией по первичным ключам,
+    поэтому таблица не блокируется надолго; pause — пауза между пачками.
+    Счётчики статистики и корзины графиков архивом не затрагиваются.
+    Возвращает число перенесённых попыток.
+    """
+    directory = archive_dir(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    recover(directory)
+    if older_than is None:
+        older_than = timedelta(days=settings.MAILING_ATTEMPT_RETENTION_DAYS)
+    cutoff = timezone.now() - older_than
+    batch_size = batch_size or settings.MAILING_ARCHIVE_BATCH_SIZE
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        count = archive_batch(directory, cutoff, batch_size)
+        if not count:
+            break
+        moved += count
+        batches += 1
+        if pause:
+            time.sleep(pause)
+    return moved
+
+
+def archived_months(directory=None):
+    """Месяцы (ГГГГ-ММ), за которые есть архивные файлы, по возрастанию."""
+    return sorted(
+        path.name[len('attempts-'):-len('.jsonl.gz')]
+        for path in archive_dir(directory).glob('attempts-*.jsonl.gz')
+    )
+
+
+def read_archive(since=None, until=None, mailing_id=None, owner_id=None, status=None, directory=None):
+    """Итератор по архивным попыткам в [since, until) с фильтрами; читает только нужные месяцы.
+
+    attempt_time возвращается как datetime, остальные поля — как в FIELDS.
+    """
+    directory = archive_dir(directory)
+    for month in archived_months(directory):
+        if since is not None and month < month_of(since):
+            continue
+        if until is not None and month > month_of(until):
+            continue
+        with gzip.open(month_path(directory, month), 'rt', encoding='utf-8') as f:
+            for line in f:
+                row = json.loads(line)
+                if mailing_id is not None and row['mailing_id'] != mailing_id:
+                    continue
+                if owner_id is not None and row['owner_id'] != owner_id:
+                    continue
+                if status is not None and row['status'] != status:
+                    continue
+                row['attempt_time'] = parse_datetime(row['attempt_time'])
+                if since is not None and row['attempt_time'] < since:
+                    continue
+                if until is not None and row['attempt_time'] >= until:
+                    continue
+                yield row
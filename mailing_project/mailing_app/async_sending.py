@@ -0,0 +1,105 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .attempt_log import AttemptWriter
+from .jobs import finish_job, heartbeat, requeue_job, should_stop, slice_size
+from .models import MailingJob
+from .ratelimit import get_limiter
+from .recipients import RecipientStream
+from .sending import job_progress, record_results
+from .smtp_pool import ConnectionPool
+
+
+async def send_concurrently(messages, pool, concurrency, executor=None):
+    """Отправляет письма параллельно в пуле из concurrency потоков.
+
+    SMTP-клиент в Django синхронный, поэтому каждое письмо уходит в потоке
+    пула, а event loop только раздаёт письма и собирает результаты; число
+    писем в полёте ограничивает сам пул потоков. Возвращает ошибки в порядке
+    messages, как ConnectionPool.send_batch.
+    """
+    loop = asyncio.get_running_loop()
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='smtp')
+
+    async def deliver(message):
+        errors = await loop.run_in_executor(executor, pool.send_batch, [message])
+        return errors[0]
+
+    try:
+        return await asyncio.gather(*(deliver(message) for message in messages))
+    finally:
+        if own_executor:
+            executor.shutdown(wait=False)
+
+
+async def run_job_async(job, concurrency=None):
+    """Вариант sending.run_job, который отправляет письма пачки параллельно в пуле потоков.
+
+    Запросы к базе (получатели, лимиты, запись попыток) синхронные и идут через
+    sync_to_async, SMTP — в потоках send_concurrently. Выигрыш перед sync —
+    параллельная отправка писем пачки вместо последовательной через одно соединение.
+    """
+    concurrency = concurrency or settings.MAILING_ASYNC_CONCURRENCY
+    chunk_size = concurrency * 10
+    mailing = job.mailing
+    pool = ConnectionPool(size=concurrency)
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='smtp')
+    writer = AttemptWriter(on_flush=job_progress(job))
+
+    recipients = await sync_to_async(RecipientStream)(mailing, chunk_size)
+    processed_before = job.sent + job.failed
+
+    limiter = get_limiter()
+    share = await sync_to_async(slice_size)(job)
+
+    async def send_chunk(chunk):
+        results = {}
+        pending = chunk
+        while pending:
+            if limiter is None:
+                allowed, pending, wait = pending, [], 0
+            else:
+                allowed, pending, wait = await sync_to_async(limiter.partition)(mailing.email, pending)
+            messages = [mailing.build_email(recipient.email) for recipient in allowed]
+            errors = await send_concurrently(messages, pool, concurrency, executor)
+            results.update(zip((recipient.pk for recipient in allowed), errors))
+            if pending:
+                await asyncio.sleep(wait)
+        errors = [results[recipient.pk] for recipient in chunk]
+        await sync_to_async(record_results)(mailing, chunk, errors, writer)
+
+    stopped = yielded = False
+    try:
+        while True:
+            chunk = await sync_to_async(recipients.next_chunk)()
+            if not chunk:
+                break
+            if await sync_to_async(should_stop)(job):
+                stopped = True
+                break
+            await send_chunk(chunk)
+            job.total = processed_before + recipients.count
+            await sync_to_async(heartbeat)(job)
+            if recipients.count >= share:
+                yielded = True
+                break
+        await sync_to_async(writer.close)()
+    except Exception as e:
+        await sync_to_async(writer.close)()
+        await sync_to_async(finish_job)(job, MailingJob.STATUS_FAILED, error=str(e))
+        raise
+    finally:
+        executor.shutdown(wait=True)
+        pool.close()
+
+    if yielded:
+        await sync_to_async(requeue_job)(job)
+    else:
+        status = MailingJob.STATUS_CANCELLED if stopped else MailingJob.STATUS_DONE
+        await sync_to_async(finish_job)(job, status)
+    return job
@@ -0,0 +1,132 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import AttemptRetry, MailingAttempt
+from .rollups import record_rollups
+from .stats import record_attempts
+
+_metrics_lock = threading.Lock()
+_metrics = {
+    'flushes': 0,
+    'rows': 0,
+    'last_flush_size': 0,
+    'max_flush_size': 0,
+    'last_flush_seconds': 0.0,
+    'max_flush_seconds': 0.0,
+    'total_flush_seconds': 0.0,
+}
+
+
+def get_metrics():
+    """Счётчики сбросов буфера попыток в этом процессе."""
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    metrics['avg_flush_size'] = metrics['rows'] / metrics['flushes'] if metrics['flushes'] else 0
+    metrics['avg_flush_seconds'] = metrics['total_flush_seconds'] / metrics['flushes'] if metrics['flushes'] else 0
+    return metrics
+
+
+def _record_flush(size, seconds):
+    with _metrics_lock:
+        _metrics['flushes'] += 1
+        _metrics['rows'] += size
+        _metrics['last_flush_size'] = size
+        _metrics['max_flush_size'] = max(_metrics['max_flush_size'], size)
+        _metrics['last_flush_seconds'] = seconds
+        _metrics['max_flush_seconds'] = max(_metrics['max_flush_seconds'], seconds)
+        _metrics['total_flush_seconds'] += seconds
+
+
+def unsaved(batch):
+    """Попытки пачки, которых ещё нет в базе (после перезапуска задачи часть уже записана)."""
+    existing = set(
+        MailingAttempt.objects.filter(
+            mailing_id__in={attempt.mailing_id for attempt in batch},
+            client_id__in={attempt.client_id for attempt in batch if attempt.client_id is not None},
+        ).values_list('mailing_id', 'client_id')
+    )
+    if not existing:
+        return batch
+    return [attempt for attempt in batch if (attempt.mailing_id, attempt.client_id) not in existing]
+
+
+class AttemptWriter:
+    """Буферизует MailingAttempt в памяти и пишет их пачками через bulk_create.
+
+    Буфер сбрасывается, когда в нём набралось max_size записей или с прошлого
+    сброса прошло max_delay секунд, а также при выходе из контекстного
+    менеджера — в том числе по исключению.
+
+    Гарантия at-least-once: прогресс отправки (счётчики задачи) двигается только
+    в on_flush, то есть после того как попытки записаны. Если процесс упадёт с
+    непустым буфером, задача будет перезапущена с последней записанной точки, и
+    эти получатели получат письмо повторно, но ни одна попытка не потеряется.
+    Если запись не удалась, пачка возвращается в буфер. Повторно записанные
+    попытки отбрасываются до вставки (и уникальным ограничением (mailing, client)),
+    поэтому в счётчики статистики, часовые корзины, метрики и on_flush попадают
+    только новые попытки.
+    """
+
+    def __init__(self, max_size=None, max_delay=None, on_flush=None):
+        self.max_size = max_size or settings.MAILING_ATTEMPT_FLUSH_SIZE
+        self.max_delay = max_delay if max_delay is not None else settings.MAILING_ATTEMPT_FLUSH_INTERVAL
+        self.on_flush = on_flush
+        self._buffer = []
+        self._retries = []
+        self._lock = threading.RLock()
+        self._last_flush = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def add(self, retry=None, **fields):
+        """Добавляет попытку в буфер; retry — AttemptRetry, который нужно записать вместе с ней."""
+        with self._lock:
+            self._buffer.append(MailingAttempt(**fields))
+            if retry is not None:
+                self._retries.append(retry)
+            if self.flush_due():
+                self.flush()
+
+    def flush_due(self):
+        return (
+            len(self._buffer) >= self.max_size
+            or time.monotonic() - self._last_flush >= self.max_delay
+        )
+
+    def flush(self):
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+            retries, self._retries = self._retries, []
+            self._last_flush = time.monotonic()
+            if not batch:
+                return 0
+            started = time.perf_counter()
+            try:
+                with transaction.atomic():
+                    fresh = unsaved(batch)
+                    MailingAttempt.objects.bulk_create(fresh, batch_size=self.max_size, ignore_conflicts=True)
+                    AttemptRetry.objects.bulk_create(retries, batch_size=self.max_size, ignore_conflicts=True)
+                    record_attempts(fresh)
+                    record_rollups(fresh)
+            except Exception:
+                self._buffer = batch + self._buffer
+                self._retries = retries + self._retries
+                raise
+            # Метрики и on_flush видят только действительно записанные попытки.
+            _record_flush(len(fresh), time.perf_counter() - started)
+            if fresh and self.on_flush is not None:
+                self.on_flush(fresh)
+            return len(fresh)
+
+    def close(self):
+        self.flush()
@@ -0,0 +1,97 @@
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.commands.createcachetable import Command as CreateCacheTable
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.utils.module_loading import import_string
+
+DB_TABLE = 'mailing_bench_cache'
+
+
+def backends(directory):
+    """Сравниваемые бэкенды: (имя, путь к классу, LOCATION)."""
+    return [
+        ('locmem', 'django.core.cache.backends.locmem.LocMemCache', 'mailing-bench'),
+        ('database', 'django.core.cache.backends.db.DatabaseCache', DB_TABLE),
+        ('sqlite', 'mailing_app.sqlite_cache.SQLiteCache', os.path.join(directory, 'cache.sqlite3')),
+    ]
+
+
+def build(path, location, max_entries):
+    return import_string(path)(location, {'OPTIONS': {'MAX_ENTRIES': max_entries}, 'TIMEOUT': 300})
+
+
+def timed(operation, count):
+    started = time.perf_counter()
+    for i in range(count):
+        operation(i)
+    return round(count / (time.perf_counter() - started), 1)
+
+
+def bench_operations(cache, count):
+    """Операций в секунду для основных вызовов в одном процессе."""
+    cache.clear()
+    results = {
+        'set': timed(lambda i: cache.set(f'key:{i}', {'value': i}), count),
+        'get_hit': timed(lambda i: cache.get(f'key:{i}'), count),
+        'get_miss': timed(lambda i: cache.get(f'missing:{i}'), count),
+    }
+    cache.set('counter', 0)
+    results['incr'] = timed(lambda i: cache.incr('counter'), count)
+    results['add'] = timed(lambda i: cache.add(f'added:{i}', i), count)
+    return results
+
+
+def _incr_worker(path, location, max_entries, key, count):
+    connections.close_all()
+    cache = build(path, location, max_entries)
+    started = time.perf_counter()
+    for _ in range(count):
+        cache.incr(key)
+    return time.perf_counter() - started
+
+
+def bench_processes(path, location, max_entries, processes, count):
+    """incr одного ключа из нескольких процессов: суммарная скорость и сколько приращений видно родителю.
+
+    У LocMemCache каждый процесс считает в своей памяти, поэтому родитель не
+    видит ни одного приращения.
+    """
+    cache = build(path, location, max_entries)
+    cache.set('shared', 0)
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+        started = time.perf_counter()
+        futures = [executor.submit(_incr_worker, path, location, max_entries, 'shared', count)
+                   for _ in range(processes)]
+        for future in futures:
+            future.result()
+        elapsed = time.perf_counter() - started
+    return {
+        'processes': processes,
+        'ops_per_sec': round(processes * count / elapsed, 1),
+        'expected': processes * count,
+        'visible_to_parent': cache.get('shared'),
+    }
+
+
+def run(count=2000, processes=4, max_entries=100_000):
+    creator = CreateCacheTable()
+    creator.verbosity = 0
+    creator.create_table(DEFAULT_DB_ALIAS, DB_TABLE, dry_run=False)
+    results = {'database': connection.vendor, 'operations': count, 'backends': {}}
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for name, path, location in backends(directory):
+                results['backends'][name] = {
+                    'single_process': bench_operations(build(path, location, max_entries), count),
+                    'multi_process_incr': bench_processes(path, location, max_entries, processes, count // processes),
+                }
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE {connection.ops.quote_name(DB_TABLE)}')
+    return results
@@ -0,0 +1,181 @@
+import math
+import random
+from array import array
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from mailing_app.models import Client, Mailing, MailingAttempt
+from mailing_app.rollups import rebuild_rollups
+from mailing_app.stats import rebuild_stats
+from users.models import CustomUser
+
+DOMAINS = [
+    ('gmail.com', 30), ('yandex.ru', 25), ('mail.ru', 20), ('outlook.com', 8),
+    ('icloud.com', 5), ('rambler.ru', 4), ('corp.example.com', 8),
+]
+COMMENTS = ['', '', '', 'VIP', 'постоянный клиент', 'оптовик', 'отписывался ранее', 'новый']
+SUCCESS_RATE = 0.93
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Временно отключает auto_now/auto_now_add, чтобы bulk_create сохранил заданные даты."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class LoadDataGenerator:
+    """Воспроизводимый по seed генератор больших объёмов данных для бенчмарков.
+
+    Распределения: число клиентов у владельца и получателей у рассылки — с
+    тяжёлым хвостом (Парето и логнормальное), домены почты — по весам DOMAINS,
+    попытки успешны в SUCCESS_RATE случаев. Всё пишется через bulk_create
+    пачками по chunk_size, в том числе строки M2M-таблицы получателей.
+    """
+
+    def __init__(self, owners=1000, clients=1_000_000, mailings=10_000, recipients_per_mailing=2000,
+                 attempts=20_000_000, seed=0, chunk_size=10_000, log=None):
+        self.owners = owners
+        self.clients = clients
+        self.mailings = mailings
+        self.recipients_per_mailing = recipients_per_mailing
+        self.attempts = attempts
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.log = log or (lambda message: None)
+        self.random = random.Random(seed)
+        self.now = timezone.now()
+
+    def run(self):
+        owner_ids = self.create_owners()
+        clients_by_owner = self.create_clients(owner_ids)
+        self.create_mailings(owner_ids, clients_by_owner)
+        # bulk_create не вызывает сигналы и не обновляет счётчики статистики и корзины.
+        rebuild_stats()
+        rebuild_rollups()
+
+    def split(self, total, weights):
+        """Делит total на целые части пропорционально weights."""
+        scale = total / sum(weights)
+        parts = [int(weight * scale) for weight in weights]
+        for i in self.random.sample(range(len(parts)), total - sum(parts)):
+            parts[i] += 1
+        return parts
+
+    def create_owners(self):
+        users = [
+            CustomUser(email=f'owner{i}-s{self.seed}@example.com', password='!', is_active=True)
+            for i in range(self.owners)
+        ]
+        ids = []
+        for chunk in chunked(users, self.chunk_size):
+            ids.extend(user.pk for user in CustomUser.objects.bulk_create(chunk))
+        self.log(f'Владельцев: {len(ids)}')
+        return ids
+
+    def create_clients(self, owner_ids):
+        weights = [self.random.paretovariate(1.2) for _ in owner_ids]
+        per_owner = self.split(self.clients, weights)
+        domains, domain_weights = zip(*DOMAINS)
+        clients_by_owner = {owner_id: array('q') for owner_id in owner_ids}
+
+        buffer, number = [], 0
+        for owner_id, count in zip(owner_ids, per_owner):
+            for _ in range(count):
+                domain = self.random.choices(domains, domain_weights)[0]
+                buffer.append(Client(
+                    owner_id=owner_id,
+                    email=f'c{number}-s{self.seed}@{domain}',
+                    full_name=f'Клиент {number}',
+                    comment=self.random.choice(COMMENTS),
+                ))
+                number += 1
+                if len(buffer) >= self.chunk_size:
+                    self._flush_clients(buffer, clients_by_owner)
+                    buffer = []
+        if buffer:
+            self._flush_clients(buffer, clients_by_owner)
+        self.log(f'Клиентов: {number}')
+        return clients_by_owner
+
+    def _flush_clients(self, buffer, clients_by_owner):
+        with transaction.atomic():
+            for client in Client.objects.bulk_create(buffer):
+                clients_by_owner[client.owner_id].append(client.pk)
+
+    def create_mailings(self, owner_ids, clients_by_owner):
+        owners_with_clients = [owner_id for owner_id in owner_ids if clients_by_owner[owner_id]]
+        sigma = 1.0
+        mu = math.log(self.recipients_per_mailing) - sigma ** 2 / 2
+        plans = []
+        for _ in range(self.mailings):
+            owner_id = self.random.choice(owners_with_clients)
+            available = len(clients_by_owner[owner_id])
+            size = max(1, min(available, int(self.random.lognormvariate(mu, sigma))))
+            plans.append((owner_id, size))
+        total_recipients = sum(size for _, size in plans)
+        attempt_ratio = min(1.0, self.attempts / total_recipients) if total_recipients else 0
+
+        mailing_fields = [Mailing._meta.get_field('created_at'), Mailing._meta.get_field('updated_at')]
+        attempt_fields = [MailingAttempt._meta.get_field('attempt_time')]
+        Through = Mailing.recipients.through
+        created = recipients = attempts = 0
+
+        with explicit_timestamps(*mailing_fields, *attempt_fields):
+            for plan_chunk in chunked(plans, max(1, self.chunk_size // 100)):
+                with transaction.atomic():
+                    mailings = Mailing.objects.bulk_create([self._mailing(owner_id) for owner_id, _ in plan_chunk])
+                    links, attempt_rows = [], []
+                    for mailing, (owner_id, size) in zip(mailings, plan_chunk):
+                        client_ids = self.random.sample(clients_by_owner[owner_id], size)
+                        links.extend(Through(mailing_id=mailing.pk, client_id=client_id) for client_id in client_ids)
+                        sent = round(size * attempt_ratio) if mailing.start_time <= self.now else 0
+                        attempt_rows.extend(self._attempt(mailing, client_id) for client_id in client_ids[:sent])
+                    for chunk in chunked(links, self.chunk_size):
+                        Through.objects.bulk_create(chunk)
+                    for chunk in chunked(attempt_rows, self.chunk_size):
+                        MailingAttempt.objects.bulk_create(chunk)
+                created += len(mailings)
+                recipients += len(links)
+                attempts += len(attempt_rows)
+                self.log(f'Рассылок: {created}, получателей: {recipients}, попыток: {attempts}')
+
+    def _mailing(self, owner_id):
+        start = self.now + timedelta(minutes=self.random.randint(-180 * 24 * 60, 30 * 24 * 60))
+        created = start - timedelta(minutes=self.random.randint(10, 7 * 24 * 60))
+        mailing = Mailing(
+            owner_id=owner_id,
+            email=f'news@owner{owner_id}.example.com',
+            start_time=start,
+            end_time=start + timedelta(hours=self.random.choice([1, 2, 6, 24, 72])),
+            message='Текст рассылки для нагрузочного тестирования.',
+            is_active=self.random.random() < 0.9,
+            created_at=created,
+            updated_at=created,
+        )
+        mailing.status = mailing.scheduled_status(self.now)
+        return mailing
+
+    def _attempt(self, mailing, client_id):
+        success = self.random.random() < SUCCESS_RATE
+        return MailingAttempt(
+            mailing_id=mailing.pk,
+            client_id=client_id,
+            attempt_time=mailing.start_time + timedelta(seconds=self.random.randint(0, 3600)),
+            status='success' if success else 'failed',
+            server_response='Письмо отправлено успешно.' if success else '550 Mailbox unavailable',
+        )
@@ -0,0 +1,36 @@
+import asyncio
+import time
+
+from mailing_app.async_sending import send_concurrently
+from mailing_app.smtp_pool import ConnectionPool
+from .smtp import SMTP_BACKEND, build_messages
+from .smtp_server import StandInSMTPServer
+
+
+def run(count=200, latency=0.005, concurrency=20, batch_size=50):
+    """Сравнивает последовательную отправку с параллельной в пуле потоков на SMTP-заглушке с задержкой."""
+    messages = build_messages(count)
+    results = {}
+
+    with StandInSMTPServer(latency=latency) as server:
+        smtp_kwargs = {'host': server.host, 'port': server.port, 'use_tls': False, 'use_ssl': False,
+                       'username': '', 'password': ''}
+
+        pool = ConnectionPool(size=1, backend=SMTP_BACKEND, **smtp_kwargs)
+        started = time.perf_counter()
+        for i in range(0, count, batch_size):
+            pool.send_batch(messages[i:i + batch_size])
+        elapsed = time.perf_counter() - started
+        pool.close()
+        results['sync'] = {'seconds': round(elapsed, 4), 'messages_per_sec': round(count / elapsed, 1)}
+
+        pool = ConnectionPool(size=concurrency, backend=SMTP_BACKEND, **smtp_kwargs)
+        started = time.perf_counter()
+        asyncio.run(send_concurrently(messages, pool, concurrency))
+        elapsed = time.perf_counter() - started
+        pool.close()
+        results['async'] = {'seconds': round(elapsed, 4), 'messages_per_sec': round(count / elapsed, 1),
+                            'peak_sessions': server.peak_sessions}
+
+    results['params'] = {'count': count, 'latency': latency, 'concurrency': concurrency}
+    return results
@@ -0,0 +1,71 @@
+import tracemalloc
+import uuid
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from mailing_app.models import Client, Mailing
+from mailing_app.recipients import RecipientStream
+from users.models import CustomUser
+
+
+def create_mailing(size, comment_size=2000):
+    owner = CustomUser.objects.create(email=f'bench-{uuid.uuid4().hex}@example.com')
+    prefix = uuid.uuid4().hex[:8]
+    comment = 'x' * comment_size
+    clients = Client.objects.bulk_create(
+        [Client(owner=owner, email=f'{prefix}-{i}@example.com', full_name=f'Клиент {i}', comment=comment)
+         for i in range(size)],
+        batch_size=1000,
+    )
+    now = timezone.now()
+    mailing = Mailing.objects.create(owner=owner, email='bench@example.com', message='Бенчмарк',
+                                     start_time=now + timedelta(hours=1), end_time=now + timedelta(hours=2))
+    Through = Mailing.recipients.through
+    Through.objects.bulk_create(
+        [Through(mailing_id=mailing.pk, client_id=client.pk) for client in clients],
+        batch_size=1000,
+    )
+    return mailing
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def iterate_materialised(mailing):
+    recipients = mailing.recipients.all()
+    for client in recipients:
+        client.email
+    recipients.count()
+
+
+def iterate_streaming(mailing, chunk_size):
+    stream = RecipientStream(mailing, chunk_size)
+    for chunk in stream:
+        for recipient in chunk:
+            recipient.email
+
+
+def run(sizes=(1000, 10000, 50000), chunk_size=1000):
+    """Пиковая память Python-кучи (tracemalloc) при обходе получателей рассылки.
+
+    Данные создаются внутри транзакции, которая в конце откатывается.
+    """
+    results = []
+    for size in sizes:
+        with transaction.atomic():
+            mailing = create_mailing(size)
+            results.append({
+                'recipients': size,
+                'materialised_peak_bytes': peak_memory(lambda: iterate_materialised(mailing)),
+                'streaming_peak_bytes': peak_memory(lambda: iterate_streaming(mailing, chunk_size)),
+            })
+            transaction.set_rollback(True)
+    return {'chunk_size': chunk_size, 'runs': results}
@@ -0,0 +1,74 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core import mail
+from django.core.mail import EmailMessage, get_connection
+
+from mailing_app.smtp_pool import ConnectionPool
+from .smtp_server import StandInSMTPServer
+
+LOCMEM_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+SMTP_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+
+
+def build_messages(count):
+    return [
+        EmailMessage(
+            subject=f'Бенчмарк #{i}',
+            body='Тестовое письмо',
+            from_email='bench@example.com',
+            to=[f'user{i}@example.com'],
+        )
+        for i in range(count)
+    ]
+
+
+def send_per_message(messages, backend, **kwargs):
+    """Текущий путь send_mail: новое соединение на каждое письмо."""
+    for message in messages:
+        get_connection(backend, fail_silently=False, **kwargs).send_messages([message])
+
+
+def send_pooled(messages, backend, pool_size, batch_size, **kwargs):
+    pool = ConnectionPool(size=pool_size, backend=backend, **kwargs)
+    batches = [messages[i:i + batch_size] for i in range(0, len(messages), batch_size)]
+    try:
+        with ThreadPoolExecutor(max_workers=pool_size) as executor:
+            for errors in executor.map(pool.send_batch, batches):
+                failed = [e for e in errors if e is not None]
+                if failed:
+                    raise failed[0]
+    finally:
+        pool.close()
+    return pool.opened
+
+
+def measure(func, messages, *args, **kwargs):
+    started = time.perf_counter()
+    func(messages, *args, **kwargs)
+    elapsed = time.perf_counter() - started
+    return {
+        'messages': len(messages),
+        'seconds': round(elapsed, 4),
+        'messages_per_sec': round(len(messages) / elapsed, 1) if elapsed else None,
+    }
+
+
+def run(count=500, latency=0.001, pool_size=4, batch_size=50):
+    messages = build_messages(count)
+    results = {}
+
+    results['locmem_per_message'] = measure(send_per_message, messages, LOCMEM_BACKEND)
+    results['locmem_pooled'] = measure(send_pooled, messages, LOCMEM_BACKEND, pool_size, batch_size)
+    mail.outbox = []
+
+    with StandInSMTPServer(latency=latency) as server:
+        smtp_kwargs = {'host': server.host, 'port': server.port, 'use_tls': False, 'use_ssl': False,
+                       'username': '', 'password': ''}
+        results['smtp_per_message'] = measure(send_per_message, messages, SMTP_BACKEND, **smtp_kwargs)
+        results['smtp_pooled'] = measure(send_pooled, messages, SMTP_BACKEND, pool_size, batch_size,
+                                         **smtp_kwargs)
+        results['smtp_sessions'] = server.sessions
+
+    results['params'] = {'count': count, 'latency': latency, 'pool_size': pool_size, 'batch_size': batch_size}
+    return results
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+
+
+class StandInSMTPServer:
+    """Минимальный SMTP-сервер на asyncio для бенчмарков и тестов.
+
+    Принимает любые письма и только считает их. latency добавляет задержку к
+    каждому ответу сервера, имитируя сетевой RTT; max_messages_per_session
+    заставляет сервер разрывать сессию после N писем, как делают реальные MTA.
+    rejections — словарь {адрес: ответ на RCPT}, например {'a@b.c': '451 Try later'}.
+    Сервер работает в отдельном потоке со своим event loop, поэтому к нему
+    можно подключаться и из синхронного кода.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, max_messages_per_session=None, rejections=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.max_messages_per_session = max_messages_per_session
+        self.rejections = rejections or {}
+        self.messages = 0
+        self.sessions = 0
+        self.active_sessions = 0
+        self.peak_sessions = 0
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._sessions = set()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='smtp-stand-in', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            for task in self._sessions:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*self._sessions, return_exceptions=True))
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+    async def _reply(self, writer, line):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        writer.write(line.encode() + b'\r\n')
+        await writer.drain()
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._sessions.add(task)
+        self.sessions += 1
+        self.active_sessions += 1
+        self.peak_sessions = max(self.peak_sessions, self.active_sessions)
+        session_messages = 0
+        try:
+            await self._reply(writer, '220 stand-in ESMTP')
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode(errors='replace').strip().upper()
+                if command.startswith('EHLO'):
+                    await self._reply(writer, '250-stand-in\r\n250 8BITMIME')
+                elif command.startswith('RCPT'):
+                    address = command.partition(':')[2].strip(' <>').lower()
+                    await self._reply(writer, self.rejections.get(address, '250 OK'))
+                elif command.startswith(('HELO', 'MAIL', 'RSET', 'NOOP')):
+                    await self._reply(writer, '250 OK')
+                elif command == 'DATA':
+                    await self._reply(writer, '354 End data with <CR><LF>.<CR><LF>')
+                    while (await reader.readline()) not in (b'.\r\n', b''):
+                        pass
+                    self.messages += 1
+                    session_messages += 1
+                    await self._reply(writer, '250 OK queued')
+                    if self.max_messages_per_session and session_messages >= self.max_messages_per_session:
+                        break
+                elif command == 'QUIT':
+                    await self._reply(writer, '221 Bye')
+                    break
+                else:
+                    await self._reply(writer, '502 Command not implemented')
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.active_sessions -= 1
+            self._sessions.discard(task)
+            writer.close()
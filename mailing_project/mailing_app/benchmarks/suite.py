@@ -0,0 +1,168 @@
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.test import Client as HttpClient, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from mailing_app.jobs import claim_job, enqueue_mailing
+from mailing_app.models import Client, Mailing
+from mailing_app.pagination import encode_cursor
+from mailing_app.sending import run_job
+from users.models import CustomUser
+from .dataset import LoadDataGenerator
+
+SIZES = {
+    'small': {'owners': 10, 'clients': 2_000, 'mailings': 100, 'recipients_per_mailing': 100, 'attempts': 10_000},
+    'medium': {'owners': 100, 'clients': 20_000, 'mailings': 1_000, 'recipients_per_mailing': 200,
+               'attempts': 100_000},
+    'large': {'owners': 1_000, 'clients': 200_000, 'mailings': 10_000, 'recipients_per_mailing': 200,
+              'attempts': 1_000_000},
+}
+
+VIEWS = [
+    ('HomePageView', 'mailing_app:home', {}),
+    ('StatisticsView', 'mailing_app:statistics', {}),
+    ('ClientListView', 'mailing_app:clients-list', {}),
+    ('ClientListView (deep page)', 'mailing_app:clients-list', {'deep': (Client, ('-pk',))}),
+    ('MailingListView', 'mailing_app:mailings-list', {}),
+    ('MailingListView (deep page)', 'mailing_app:mailings-list', {'deep': (Mailing, ('-start_time', '-pk'))}),
+]
+DEEP_PAGE_DEPTH = 0.9
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=settings.BASE_DIR).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'commit': commit,
+        'database': connection.vendor,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'timestamp': timezone.now().isoformat(),
+    }
+
+
+class QueryCounter:
+    """Считает запросы через execute_wrapper: queries_log ограничен по длине
+    и после генерации данных уже заполнен."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure_view(http, url, requests):
+    queries = QueryCounter()
+    with connection.execute_wrapper(queries):
+        response = http.get(url)
+    latencies = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        http.get(url)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return {
+        'status_code': response.status_code,
+        'queries': queries.count,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+    }
+
+
+def bench_views(requests):
+    owner = (
+        CustomUser.objects.annotate(mailing_count=Count('mailing'))
+        .order_by('-mailing_count')
+        .first()
+    )
+    http = HttpClient()
+    http.force_login(owner)
+    results = {}
+    for name, url_name, params in VIEWS:
+        url = reverse(url_name)
+        if 'deep' in params:
+            # Курсор на строку в конце списка владельца (90% глубины) — аналог последней страницы.
+            model, ordering = params['deep']
+            keys = model.objects.owned_by(owner).order_by(*ordering).values_list(
+                *[field.lstrip('-') for field in ordering])
+            depth = int(keys.count() * DEEP_PAGE_DEPTH)
+            if not depth:
+                continue
+            url = f'{url}?cursor={encode_cursor(keys[depth])}'
+        results[name] = measure_view(http, url, requests)
+    return results
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', MAILING_RATE_LIMITS={},
+                   MAILING_FAIR_SLICE=10 ** 9)
+def bench_send(recipients):
+    """Отправляет рассылку на recipients клиентов через locmem-бэкенд: писем в секунду и пик памяти."""
+    owner = CustomUser.objects.create(email=f'send-bench-{time.time_ns()}@example.com', password='!')
+    clients = Client.objects.bulk_create(
+        [Client(owner=owner, email=f'send-{owner.pk}-{i}@example.com', full_name='Получатель')
+         for i in range(recipients)],
+        batch_size=5000,
+    )
+    now = timezone.now()
+    mailing = Mailing.objects.create(owner=owner, email='bench@example.com', message='Бенчмарк',
+                                     start_time=now + timedelta(seconds=1), end_time=now + timedelta(hours=1))
+    Mailing.objects.filter(pk=mailing.pk).update(start_time=now)
+    Through = Mailing.recipients.through
+    Through.objects.bulk_create([Through(mailing_id=mailing.pk, client_id=c.pk) for c in clients], batch_size=5000)
+    enqueue_mailing(mailing)
+    job = claim_job('benchmark')
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    run_job(job)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    mail.outbox = []
+    return {
+        'recipients': recipients,
+        'seconds': round(elapsed, 3),
+        'messages_per_sec': round(recipients / elapsed, 1),
+        'peak_memory_bytes': peak,
+    }
+
+
+def run(sizes=('small',), requests=20, send_recipients=(1000, 10000), seed=0, log=None):
+    """Полный прогон: для каждого размера набора данных — задержки и число запросов
+    страниц, затем скорость и память отправки.
+
+    База очищается перед каждым набором, поэтому запускать только на тестовой
+    базе (так делает команда run_benchmarks).
+    """
+    log = log or (lambda message: None)
+    results = {'environment': environment(), 'sizes': {}, 'send': []}
+    for size in sizes:
+        call_command('flush', interactive=False, verbosity=0)
+        log(f'Генерация набора данных {size}...')
+        LoadDataGenerator(seed=seed, **SIZES[size]).run()
+        log(f'Замер страниц на наборе {size}...')
+        results['sizes'][size] = {'dataset': SIZES[size], 'views': bench_views(requests)}
+    for recipients in send_recipients:
+        log(f'Замер отправки на {recipients} получателей...')
+        results['send'].append(bench_send(recipients))
+    return results
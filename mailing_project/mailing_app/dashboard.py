@@ -0,0 +1,71 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Count, Max, Min, Q
+from django.utils import timezone
+
+from .models import Client, Mailing
+
+VERSION_KEY = 'mailing:dashboard:version'
+
+
+ACTIVE = Q(status=Mailing.STATUS_RUNNING)
+
+
+def dashboard_version():
+    # Если ключ версии вытеснен из кэша, новая версия не совпадёт ни с одной из старых.
+    return cache.get_or_set(VERSION_KEY, time.time_ns, None)
+
+
+def invalidate_dashboard():
+    """Сдвигает версию: все закэшированные цифры главной страницы становятся недоступны."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def compute_dashboard():
+    """Цифры главной страницы: один агрегирующий запрос по рассылкам с условиями и COUNT клиентов."""
+    numbers = Mailing.objects.aggregate(
+        total_mailings=Count('pk'),
+        active_mailings=Count('pk', filter=ACTIVE),
+        min_start=Min('start_time', filter=ACTIVE),
+        max_end=Max('end_time', filter=ACTIVE),
+    )
+    numbers['start_time'] = numbers.pop('min_start')
+    numbers['end_time'] = numbers.pop('max_end')
+    numbers['total_recipients'] = Client.objects.count()
+    numbers['last_updated'] = timezone.now()
+    return numbers
+
+
+def dashboard_numbers():
+    """Цифры главной страницы из кэша по ключу текущей версии.
+
+    Версия сдвигается сигналами при изменении рассылок и клиентов, а
+    MAILING_DASHBOARD_CACHE_TTL ограничивает устаревание числа активных
+    рассылок: их статус воркеры и планировщик меняют UPDATE без сигналов.
+    """
+    key = f'mailing:dashboard:{dashboard_version()}'
+    numbers = cache.get(key)
+    if numbers is None:
+        numbers = compute_dashboard()
+        cache.set(key, numbers, settings.MAILING_DASHBOARD_CACHE_TTL)
+    return numbers
+
+
+class KnownCountPaginator(Paginator):
+    """Пагинатор с заранее известным числом объектов, чтобы не делать отдельный COUNT."""
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.__dict__['count'] = count
+
+
+def active_mailings_page(number, numbers):
+    mailings = Mailing.objects.filter(ACTIVE).order_by('start_time', 'pk')
+    paginator = KnownCountPaginator(mailings, settings.MAILING_DASHBOARD_PAGE_SIZE, numbers['active_mailings'])
+    return paginator.get_page(number)
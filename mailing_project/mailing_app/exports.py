@@ -0,0 +1,99 @@
+import csv
+import json
+from datetime import datetime
+
+from django.conf import settings
+
+from .archive import FIELDS as ARCHIVE_FIELDS, read_archive
+from .models import Client, Mailing, MailingAttempt
+
+ATTEMPT_COLUMNS = ('id', 'mailing_id', 'owner_id', 'client_id', 'attempt_time', 'status', 'server_response')
+CLIENT_COLUMNS = ('id', 'email', 'full_name', 'comment')
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+def attempt_rows(owner_id=None, mailing_id=None, since=None, until=None, status=None, archived=False,
+                 chunk_size=None):
+    """Кортежи попыток в порядке ATTEMPT_COLUMNS, попытки в [since, until).
+
+    Выбираются только нужные колонки через iterator(): на PostgreSQL это
+    серверный курсор, на SQLite — fetchmany, так что в памяти не больше
+    chunk_size строк. С archived=True сначала идут попытки из архива.
+    """
+    if archived:
+        for row in read_archive(since, until, mailing_id, owner_id, status):
+            yield tuple(row[column] for column in ATTEMPT_COLUMNS)
+    attempts = MailingAttempt.objects.order_by()
+    if owner_id is not None:
+        attempts = attempts.filter(mailing__owner_id=owner_id)
+    if mailing_id is not None:
+        attempts = attempts.filter(mailing_id=mailing_id)
+    if since is not None:
+        attempts = attempts.filter(attempt_time__gte=since)
+    if until is not None:
+        attempts = attempts.filter(attempt_time__lt=until)
+    if status is not None:
+        attempts = attempts.filter(status=status)
+    # Порядок колонок архива совпадает с ATTEMPT_COLUMNS (mailing__owner_id — это owner_id).
+    chunk_size = chunk_size or settings.MAILING_EXPORT_CHUNK_SIZE
+    yield from attempts.values_list(*ARCHIVE_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def client_rows(owner_id=None, mailing_id=None, chunk_size=None):
+    """Кортежи клиентов в порядке CLIENT_COLUMNS.
+
+    С mailing_id — только получатели рассылки: явно выбранные и клиенты её
+    сегмента; рассылка другого владельца даёт пустую выгрузку.
+    """
+    clients = Client.objects.all()
+    if mailing_id is not None:
+        mailings = Mailing.objects.select_related('segment').filter(pk=mailing_id)
+        if owner_id is not None:
+            mailings = mailings.filter(owner_id=owner_id)
+        mailing = mailings.first()
+        clients = mailing.all_recipients() if mailing is not None else Client.objects.none()
+    clients = clients.order_by()
+    if owner_id is not None:
+        clients = clients.filter(owner_id=owner_id)
+    chunk_size = chunk_size or settings.MAILING_EXPORT_CHUNK_SIZE
+    yield from clients.values_list(*CLIENT_COLUMNS).iterator(chunk_size=chunk_size)
+
+
+def cell(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class Echo:
+    """Файлоподобный объект для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def render(rows, columns, fmt, group=None):
+    """Строки выгрузки в формате csv или jsonl, склеенные по group строк.
+
+    Заголовок CSV отдаётся сразу, до первого запроса к базе, — клиент получает
+    первый байт без ожидания.
+    """
+    group = group or settings.MAILING_EXPORT_CHUNK_SIZE
+    writer = csv.writer(Echo())
+
+    def line(row):
+        if fmt == 'csv':
+            return writer.writerow([cell(value) for value in row])
+        return json.dumps(dict(zip(columns, map(cell, row))), ensure_ascii=False) + '\n'
+
+    if fmt == 'csv':
+        yield writer.writerow(columns)
+    buffer = []
+    for row in rows:
+        buffer.append(line(row))
+        if len(buffer) >= group:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
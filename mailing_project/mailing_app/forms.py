@@ -3,29 +3,142 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.core.validators import FileExtensionValidator
+from django.urls import reverse_lazy
 from django.utils import timezone
 
 from users.models import CustomUser
-from .models import Client, Message, Mailing
-
+from .models import Client, Message, Mailing, Segment
+
+# Сколько id проверяется одним запросом (лимит параметров SQLite — 32766).
+ID_CHUNK_SIZE = 10_000
+
+
+def existing_client_ids(ids, owner=None):
+    """Какие из ids есть среди клиентов owner: по запросу на ID_CHUNK_SIZE id, а не на каждый."""
+    clients = Client.objects.all() if owner is None else Client.objects.owned_by(owner)
+    found = set()
+    for start in range(0, len(ids), ID_CHUNK_SIZE):
+        found.update(clients.filter(pk__in=ids[start:start + ID_CHUNK_SIZE]).values_list('pk', flat=True))
+    return found
+
+
+class RecipientPickerWidget(forms.Widget):
+    """Поиск получателей через autocomplete; в форму уходят только id выбранных клиентов."""
+    template_name = 'mailing_app/widgets/recipient_picker.html'
+
+    def __init__(self, url=reverse_lazy('mailing_app:clients-autocomplete'), attrs=None, owner=None):
+        super().__init__(attrs)
+        self.url = url
+        self.owner = owner
+
+    def format_value(self, value):
+        if not value:
+            return []
+        # После ошибки в форме приходят строки из POST; нечисловые id не показываются.
+        ids = []
+        for item in value:
+            try:
+                ids.append(int(getattr(item, 'pk', item)))
+            except (TypeError, ValueError):
+                continue
+        return ids
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        ids = context['widget']['value']
+        context['widget']['url'] = str(self.url)
+        # Подписи только для уже выбранных клиентов владельца, одним запросом.
+        clients = Client.objects.all() if self.owner is None else Client.objects.owned_by(self.owner)
+        labels = dict(clients.filter(pk__in=ids).values_list('pk', 'email')) if ids else {}
+        context['widget']['selected'] = [(pk, labels.get(pk, f'#{pk}')) for pk in ids]
+        return context
+
+    def value_from_datadict(self, data, files, name):
+        return data.getlist(name) if hasattr(data, 'getlist') else data.get(name)
+
+    def value_omitted_from_data(self, data, files, name):
+        return False
+
+
+class RecipientsField(forms.Field):
+    """Список id клиентов; существование и принадлежность владельцу проверяются пачками."""
+    widget = RecipientPickerWidget
+    default_error_messages = {
+        'required': 'Выберите хотя бы одного получателя',
+        'invalid': 'Некорректный идентификатор получателя',
+        'unknown': 'Получатели не найдены: %(ids)s',
+    }
+
+    def __init__(self, owner=None, queryset=None, limit_choices_to=None, **kwargs):
+        # queryset и limit_choices_to передаёт ManyToManyField.formfield; варианты здесь не перечисляются.
+        super().__init__(**kwargs)
+        self.owner = owner
+
+    def to_python(self, value):
+        if not value:
+            return []
+        try:
+            return list(dict.fromkeys(int(item) for item in value))
+        except (TypeError, ValueError):
+            raise ValidationError(self.error_messages['invalid'], code='invalid')
+
+    def validate(self, value):
+        super().validate(value)
+        if not value:
+            return
+        found = existing_client_ids(value, self.owner)
+        missing = [pk for pk in value if pk not in found]
+        if missing:
+            raise ValidationError(self.error_messages['unknown'], code='unknown',
+                                  params={'ids': ', '.join(map(str, missing[:10]))})
+
+    def has_changed(self, initial, data):
+        return set(self.widget.format_value(initial)) != set(self.to_python(data))
 
 
 class ClientForm(forms.ModelForm):
     class Meta:
         model = Client
-        fields = '__all__'
+        fields = ['email', 'full_name', 'comment']
+
+
+class ClientImportForm(forms.Form):
+    file = forms.FileField(
+        label='CSV-файл',
+        help_text='Колонки email, full_name и необязательная comment; кодировка UTF-8.',
+        validators=[FileExtensionValidator(['csv'])],
+    )
+
+
+class SegmentForm(forms.ModelForm):
+    class Meta:
+        model = Segment
+        fields = ['name', 'email_domain', 'tags', 'created_after', 'created_before']
+        widgets = {
+            'created_after': forms.DateTimeInput(attrs={'type': 'datetime-local'}),
+            'created_before': forms.DateTimeInput(attrs={'type': 'datetime-local'}),
+        }
+
+    def clean(self):
+        cleaned_data = super().clean()
+        after = cleaned_data.get('created_after')
+        before = cleaned_data.get('created_before')
+        if after and before and after >= before:
+            raise ValidationError('Начало периода должно быть раньше конца')
+        return cleaned_data
 
 
 class MessageForm(forms.ModelForm):
     class Meta:
         model = Message
-        fields = '__all__'
+        fields = ['subject', 'body']
 
 
 class MailingForm(forms.ModelForm):
     class Meta:
         model = Mailing
-        fields = ['email', 'start_time', 'end_time', 'message', 'recipients']
+        fields = ['email', 'start_time', 'end_time', 'message', 'recipients', 'segment']
         widgets = {
             'email': forms.EmailInput(attrs={
                 'class': 'form-control',
@@ -47,6 +160,9 @@ class MailingForm(forms.ModelForm):
                 'placeholder': 'Введите текст рассылки...'
             }),
         }
+        field_classes = {
+            'recipients': RecipientsField,
+        }
         error_messages = {
             'email': {
                 'required': 'Введите email отправителя',
@@ -60,16 +176,24 @@ class MailingForm(forms.ModelForm):
             },
         }
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, owner=None, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['recipients'].queryset = Client.objects.all()
+        # Получателей можно выбирать только из клиентов владельца рассылки.
+        self.fields['recipients'].owner = owner or (self.instance.owner if self.instance.owner_id else None)
+        self.fields['recipients'].widget.owner = self.fields['recipients'].owner
         self.fields['recipients'].widget.attrs.update({'class': 'form-control'})
+        self.fields['segment'].queryset = Segment.objects.owned_by(self.fields['recipients'].owner)
+        self.fields['segment'].widget.attrs.update({'class': 'form-select'})
 
     def clean(self):
         cleaned_data = super().clean()
         start = cleaned_data.get('start_time')
         end = cleaned_data.get('end_time')
 
+        has_recipients = cleaned_data.get('recipients') or 'recipients' in self.errors
+        if not has_recipients and not cleaned_data.get('segment'):
+            raise ValidationError('Выберите получателей или сегмент')
+
         if start and end:
             if start >= end:
                 raise ValidationError('Время начала должно быть раньше времени окончания')
@@ -0,0 +1,207 @@
+import csv
+import io
+import logging
+import os
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.base_user import BaseUserManager
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .dashboard import invalidate_dashboard
+from .models import Client, ClientImport
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ('email', 'full_name')
+REJECTED_COLUMNS = ('line', 'email', 'full_name', 'comment', 'error')
+EMAIL_MAX_LENGTH = Client._meta.get_field('email').max_length
+NAME_MAX_LENGTH = Client._meta.get_field('full_name').max_length
+
+
+def clean_row(row, owner):
+    """Клиент из строки CSV или (None, причина отказа)."""
+    email = BaseUserManager.normalize_email((row.get('email') or '').strip())
+    full_name = (row.get('full_name') or '').strip()
+    if not email:
+        return None, 'Не указан email'
+    if len(email) > EMAIL_MAX_LENGTH:
+        return None, 'Слишком длинный email'
+    try:
+        validate_email(email)
+    except ValidationError:
+        return None, 'Неверный формат email'
+    if not full_name:
+        return None, 'Не указано имя'
+    if len(full_name) > NAME_MAX_LENGTH:
+        return None, 'Слишком длинное имя'
+    return Client(owner=owner, email=email, full_name=full_name, comment=(row.get('comment') or '').strip()), None
+
+
+def import_chunk(rows, owner):
+    """Записывает пачку строк (номер, строка) одним bulk_create с обновлением по email.
+
+    Возвращает (число принятых строк, [(номер, строка, причина)]).
+    Повтор email внутри пачки: в базу попадает последняя строка. Email, который уже
+    принадлежит другому владельцу, отклоняется — одним запросом на пачку.
+    """
+    rejected = []
+    clients = {}
+    for line, row in rows:
+        client, error = clean_row(row, owner)
+        if error:
+            rejected.append((line, row, error))
+        else:
+            clients[client.email] = (line, row, client)
+    foreign = set(
+        Client.objects.filter(email__in=list(clients)).exclude(owner=owner).values_list('email', flat=True)
+    )
+    for email in foreign:
+        line, row, _ = clients.pop(email)
+        rejected.append((line, row, 'Email уже занят другим пользователем'))
+    if clients:
+        with transaction.atomic():
+            Client.objects.bulk_create(
+                [client for _, _, client in clients.values()],
+                update_conflicts=True,
+                unique_fields=['email'],
+                update_fields=['full_name', 'comment'],
+            )
+    rejected.sort(key=lambda item: item[0])
+    return len(rows) - len(rejected), rejected
+
+
+def import_clients(stream, owner, rejected, chunk_size=None, skip=0, progress=None):
+    """Загружает клиентов owner из CSV в текстовом потоке stream.
+
+    Файл читается построчно и записывается пачками по chunk_size строк,
+    поэтому память не зависит от размера файла. Нужны колонки email и
+    full_name, comment — по желанию. Отклонённые строки с номером и причиной
+    пишутся в CSV rejected. skip — сколько строк данных пропустить (продолжение
+    прерванной загрузки); progress(counts) вызывается после каждой пачки.
+    Возвращает counts: processed, imported, rejected за этот вызов.
+    """
+    chunk_size = chunk_size or settings.MAILING_IMPORT_CHUNK_SIZE
+    reader = csv.DictReader(stream)
+    missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or ())]
+    if missing:
+        raise ValueError(f'В файле нет колонок: {", ".join(missing)}')
+    writer = csv.writer(rejected)
+    # Продолжение загрузки дописывает в тот же файл: заголовок только в пустой.
+    if rejected.tell() == 0:
+        writer.writerow(REJECTED_COLUMNS)
+    counts = {'processed': 0, 'imported': 0, 'rejected': 0}
+
+    def flush(batch):
+        imported, failed = import_chunk(batch, owner)
+        writer.writerows([line, row.get('email'), row.get('full_name'), row.get('comment'), error]
+                         for line, row, error in failed)
+        rejected.flush()
+        counts['processed'] += len(batch)
+        counts['imported'] += imported
+        counts['rejected'] += len(failed)
+        invalidate_dashboard()
+        if progress:
+            progress(counts)
+
+    batch = []
+    for index, row in enumerate(reader):
+        if index < skip:
+            continue
+        # line_num — номер строки файла, на которой закончилась запись (с учётом переносов в кавычках).
+        batch.append((reader.line_num, row))
+        if len(batch) >= chunk_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    return counts
+
+
+# Фоновая загрузка
+
+
+def save_upload(upload, owner):
+    """Сохраняет загруженный файл на диск по частям и ставит импорт в очередь."""
+    os.makedirs(settings.MAILING_IMPORT_DIR, exist_ok=True)
+    path = os.path.join(settings.MAILING_IMPORT_DIR, f'{uuid.uuid4().hex}.csv')
+    with open(path, 'wb') as target:
+        for chunk in upload.chunks():
+            target.write(chunk)
+    return ClientImport.objects.create(owner=owner, source=path, size=upload.size)
+
+
+def claimable_imports():
+    stale = timezone.now() - timedelta(seconds=settings.MAILING_JOB_STALE_AFTER)
+    return Q(status=ClientImport.STATUS_PENDING) | Q(status=ClientImport.STATUS_RUNNING, heartbeat_at__lt=stale)
+
+
+def claim_import(worker):
+    """Забирает импорт из очереди условным UPDATE; брошенный упавшим воркером — тоже."""
+    candidates = (
+        ClientImport.objects.filter(claimable_imports())
+        .order_by('created_at', 'pk')
+        .values_list('pk', flat=True)[:10]
+    )
+    for pk in candidates:
+        now = timezone.now()
+        if ClientImport.objects.filter(claimable_imports(), pk=pk).update(
+            status=ClientImport.STATUS_RUNNING, heartbeat_at=now, worker=worker,
+        ):
+            ClientImport.objects.filter(pk=pk, started_at__isnull=True).update(started_at=now)
+            return ClientImport.objects.select_related('owner').get(pk=pk)
+    return None
+
+
+def fail_import(client_import, error):
+    ClientImport.objects.filter(pk=client_import.pk).update(
+        status=ClientImport.STATUS_FAILED, finished_at=timezone.now(), error=str(error),
+    )
+
+
+def run_import(client_import):
+    """Выполняет импорт с контрольной точки processed, отмечая прогресс после каждой пачки."""
+    base = {
+        'processed': client_import.processed,
+        'imported': client_import.imported,
+        'rejected': client_import.rejected,
+    }
+    try:
+        with open(client_import.source, 'rb') as raw, \
+                open(client_import.rejected_path, 'a', newline='', encoding='utf-8') as rejected:
+            stream = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+
+            def progress(counts):
+                ClientImport.objects.filter(pk=client_import.pk).update(
+                    heartbeat_at=timezone.now(),
+                    position=raw.tell(),
+                    **{name: base[name] + value for name, value in counts.items()},
+                )
+
+            import_clients(stream, client_import.owner, rejected, skip=base['processed'], progress=progress)
+    except (OSError, UnicodeDecodeError, ValueError, csv.Error) as error:
+        logger.exception('Импорт клиентов #%s завершился с ошибкой', client_import.pk)
+        fail_import(client_import, error)
+        return False
+    except Exception as error:
+        # Иначе импорт остался бы в running, и воркеры забирали бы его снова без конца.
+        fail_import(client_import, error)
+        raise
+    ClientImport.objects.filter(pk=client_import.pk).update(
+        status=ClientImport.STATUS_DONE, finished_at=timezone.now(), position=client_import.size,
+    )
+    os.remove(client_import.source)
+    return True
+
+
+def process_next_import(worker):
+    client_import = claim_import(worker)
+    if client_import is None:
+        return False
+    run_import(client_import)
+    return True
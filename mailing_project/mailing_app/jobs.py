@@ -0,0 +1,153 @@
+import os
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .lifecycle import set_status
+from .models import Mailing, MailingJob, OwnerShare
+
+
+def worker_name():
+    return f'{os.uname().nodename}:{os.getpid()}:{threading.current_thread().name}'
+
+
+ACTIVE_STATUSES = [MailingJob.STATUS_PENDING, MailingJob.STATUS_RUNNING]
+
+
+def enqueue_mailing(mailing):
+    """Ставит рассылку в очередь; если задача уже есть в очереди или выполняется, возвращает её."""
+    try:
+        with transaction.atomic():
+            return MailingJob.objects.create(mailing=mailing)
+    except IntegrityError:
+        return MailingJob.objects.get(mailing=mailing, status__in=ACTIVE_STATUSES)
+
+
+def claimable():
+    """Задачи в очереди и задачи, чей воркер перестал отмечаться (упал посреди отправки)."""
+    stale = timezone.now() - timedelta(seconds=settings.MAILING_JOB_STALE_AFTER)
+    return Q(status=MailingJob.STATUS_PENDING) | Q(status=MailingJob.STATUS_RUNNING, heartbeat_at__lt=stale)
+
+
+def heartbeat(job):
+    MailingJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now(), total=job.total)
+
+
+# Сначала владельцы, которых дольше всех не обслуживали, затем задачи по возрасту.
+FAIR_ORDER = [
+    F('mailing__owner__mailing_share__served_at').asc(nulls_first=True),
+    F('served_at').asc(nulls_first=True),
+    'created_at',
+    'pk',
+]
+
+
+def claim_job(worker=None):
+    """Забирает следующую задачу из очереди и помечает её как выполняемую.
+
+    Очередь упорядочена по владельцам (см. OwnerShare), чтобы большая рассылка
+    одного владельца не вытесняла рассылки остальных.
+
+    На Postgres строки блокируются через SELECT ... FOR UPDATE SKIP LOCKED, поэтому
+    воркеры не ждут друг друга. На SQLite блокировок строк нет, и задача
+    захватывается условным UPDATE по статусу: выигрывает только один воркер.
+    Задачи упавших воркеров забираются повторно и продолжаются с контрольной
+    точки рассылки.
+    """
+    worker = worker or worker_name()
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = (
+                MailingJob.objects.select_for_update(skip_locked=True, of=('self',))
+                .filter(claimable())
+                .order_by(*FAIR_ORDER)
+                .first()
+            )
+            if job is None:
+                return None
+            job.status = MailingJob.STATUS_RUNNING
+            job.started_at = job.heartbeat_at = timezone.now()
+            job.worker = worker
+            job.save(update_fields=['status', 'started_at', 'heartbeat_at', 'worker'])
+            set_status(job.mailing_id, Mailing.STATUS_RUNNING)
+            return job
+
+    candidates = (
+        MailingJob.objects.filter(claimable())
+        .order_by(*FAIR_ORDER)
+        .values_list('pk', flat=True)[:10]
+    )
+    for pk in candidates:
+        now = timezone.now()
+        claimed = MailingJob.objects.filter(claimable(), pk=pk).update(
+            status=MailingJob.STATUS_RUNNING,
+            started_at=now,
+            heartbeat_at=now,
+            worker=worker,
+        )
+        if claimed:
+            job = MailingJob.objects.select_related('mailing').get(pk=pk)
+            set_status(job.mailing_id, Mailing.STATUS_RUNNING)
+            return job
+    return None
+
+
+def owner_weight(job):
+    share = OwnerShare.objects.filter(owner_id=job.mailing.owner_id).values_list('weight', flat=True).first()
+    return share or 1
+
+
+def slice_size(job):
+    """Сколько писем задача отправляет за один подход, прежде чем уступить очередь."""
+    return settings.MAILING_FAIR_SLICE * owner_weight(job)
+
+
+def mark_served(owner_id, when):
+    if not OwnerShare.objects.filter(owner_id=owner_id).update(served_at=when):
+        OwnerShare.objects.get_or_create(owner_id=owner_id, defaults={'served_at': when})
+
+
+def requeue_job(job):
+    """Возвращает недоделанную задачу в очередь после её доли отправки."""
+    now = timezone.now()
+    MailingJob.objects.filter(pk=job.pk, status=MailingJob.STATUS_RUNNING).update(
+        status=MailingJob.STATUS_PENDING,
+        served_at=now,
+        worker='',
+        total=job.total,
+        sent=job.sent,
+        failed=job.failed,
+    )
+    mark_served(job.mailing.owner_id, now)
+
+
+def cancel_jobs(mailing_id):
+    """Останавливает ожидающие и выполняющиеся задачи рассылки."""
+    return MailingJob.objects.filter(
+        mailing_id=mailing_id,
+        status__in=ACTIVE_STATUSES,
+    ).update(status=MailingJob.STATUS_CANCELLED, finished_at=timezone.now())
+
+
+def should_stop(job):
+    """Проверяется воркером между пачками: окно рассылки закрылось, задачу или рассылку остановили."""
+    if timezone.now() > job.mailing.end_time:
+        return True
+    return MailingJob.objects.filter(
+        Q(status=MailingJob.STATUS_CANCELLED) | Q(mailing__status=Mailing.STATUS_STOPPED),
+        pk=job.pk,
+    ).exists()
+
+
+def finish_job(job, status, error=''):
+    mark_served(job.mailing.owner_id, timezone.now())
+    job.status = status
+    job.finished_at = timezone.now()
+    job.error = error
+    job.save(update_fields=['status', 'finished_at', 'error', 'total', 'sent', 'failed'])
+    if status in (MailingJob.STATUS_DONE, MailingJob.STATUS_CANCELLED):
+        set_status(job.mailing_id, Mailing.STATUS_FINISHED)
@@ -0,0 +1,32 @@
+from django.utils import timezone
+
+from .models import Mailing
+
+OPEN_STATUSES = [Mailing.STATUS_CREATED, Mailing.STATUS_RUNNING]
+
+
+def set_status(mailing_id, status):
+    """Переводит рассылку в status условным UPDATE, если переход разрешён из текущего статуса.
+
+    Возвращает True, если статус изменился.
+    """
+    sources = [source for source, targets in Mailing.TRANSITIONS.items() if status in targets]
+    return bool(Mailing.objects.filter(pk=mailing_id, status__in=sources).update(status=status))
+
+
+def advance_statuses(now=None):
+    """Периодический переход по расписанию: три UPDATE по индексу (status, start_time).
+
+    Нужен для рассылок, которые воркеры не трогали (нет получателей, задача не
+    ставилась) или изменённых в обход save(). Возвращает число переведённых
+    рассылок по новым статусам.
+    """
+    now = now or timezone.now()
+    open_mailings = Mailing.objects.filter(status__in=OPEN_STATUSES)
+    return {
+        Mailing.STATUS_STOPPED: open_mailings.filter(is_active=False).update(status=Mailing.STATUS_STOPPED),
+        Mailing.STATUS_FINISHED: open_mailings.filter(end_time__lt=now).update(status=Mailing.STATUS_FINISHED),
+        Mailing.STATUS_RUNNING: Mailing.objects.filter(status=Mailing.STATUS_CREATED, start_time__lte=now).update(
+            status=Mailing.STATUS_RUNNING,
+        ),
+    }
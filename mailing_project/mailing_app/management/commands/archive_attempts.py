@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from mailing_app.archive import archive_attempts
+
+
+class Command(BaseCommand):
+    help = ('Переносит старые попытки отправки из таблицы в сжатые JSON-lines файлы по месяцам '
+            'и удаляет их из таблицы короткими пачками')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=settings.MAILING_ATTEMPT_RETENTION_DAYS)
+        parser.add_argument('--batch-size', type=int, default=settings.MAILING_ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--dir', help='Каталог архива; по умолчанию MAILING_ARCHIVE_DIR')
+        parser.add_argument('--pause', type=float, default=0.0, help='Пауза между пачками, секунд')
+        parser.add_argument('--max-batches', type=int, help='Остановиться после стольких пачек')
+
+    def handle(self, *args, **options):
+        moved = archive_attempts(
+            older_than=timedelta(days=options['older_than_days']),
+            batch_size=options['batch_size'],
+            directory=options['dir'],
+            pause=options['pause'],
+            max_batches=options['max_batches'],
+        )
+        self.stdout.write(f'Перенесено в архив попыток: {moved}')
@@ -0,0 +1,17 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from mailing_app.benchmarks import cache
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает общий SQLite-кэш с LocMemCache и DatabaseCache: скорость операций и incr из нескольких процессов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operations', type=int, default=2000, help='Операций каждого вида')
+        parser.add_argument('--processes', type=int, default=4)
+
+    def handle(self, *args, **options):
+        results = cache.run(count=options['operations'], processes=options['processes'])
+        self.stdout.write(json.dumps(results, indent=2, ensure_ascii=False))
@@ -0,0 +1,23 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from mailing_app.benchmarks import dispatch
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает последовательную и параллельную (пул потоков) отправку на SMTP-заглушке с задержкой'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200)
+        parser.add_argument('--latency', type=float, default=0.005,
+                            help='Задержка ответа SMTP-заглушки в секундах')
+        parser.add_argument('--concurrency', type=int, default=20)
+
+    def handle(self, *args, **options):
+        results = dispatch.run(
+            count=options['messages'],
+            latency=options['latency'],
+            concurrency=options['concurrency'],
+        )
+        self.stdout.write(json.dumps(results, indent=2, ensure_ascii=False))
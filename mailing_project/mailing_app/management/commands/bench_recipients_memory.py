@@ -0,0 +1,17 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from mailing_app.benchmarks import memory
+
+
+class Command(BaseCommand):
+    help = 'Измеряет пиковую память при обходе получателей рассылки разного размера'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        results = memory.run(sizes=options['sizes'], chunk_size=options['chunk_size'])
+        self.stdout.write(json.dumps(results, indent=2, ensure_ascii=False))
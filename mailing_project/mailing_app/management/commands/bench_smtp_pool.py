@@ -0,0 +1,25 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from mailing_app.benchmarks import smtp
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость отправки через пул SMTP-соединений и через новое соединение на письмо'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=500)
+        parser.add_argument('--latency', type=float, default=0.001,
+                            help='Задержка ответа SMTP-заглушки в секундах')
+        parser.add_argument('--pool-size', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=50)
+
+    def handle(self, *args, **options):
+        results = smtp.run(
+            count=options['messages'],
+            latency=options['latency'],
+            pool_size=options['pool_size'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(json.dumps(results, indent=2, ensure_ascii=False))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from mailing_app.exports import ATTEMPT_COLUMNS, CLIENT_COLUMNS, FORMATS, attempt_rows, client_rows, render
+from mailing_app.views import parse_moment
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = ('Выгружает попытки рассылок или клиентов в CSV или JSON Lines потоком, '
+            'не загружая строки в память целиком.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['attempts', 'clients'])
+        parser.add_argument('--format', choices=list(FORMATS), default='csv')
+        parser.add_argument('--output', help='Файл выгрузки; по умолчанию stdout')
+        parser.add_argument('--owner', help='Email владельца')
+        parser.add_argument('--mailing', type=int, help='Номер рассылки')
+        parser.add_argument('--since', help='Начало интервала попыток (ISO 8601)')
+        parser.add_argument('--until', help='Конец интервала попыток (ISO 8601), не включая')
+        parser.add_argument('--status', choices=['success', 'failed'])
+        parser.add_argument('--archived', action='store_true', help='Добавить попытки из архива')
+
+    def handle(self, *args, **options):
+        owner_id = None
+        if options['owner']:
+            owner_id = CustomUser.objects.filter(email=options['owner']).values_list('pk', flat=True).first()
+            if owner_id is None:
+                raise CommandError(f"Пользователь {options['owner']} не найден.")
+        if options['kind'] == 'attempts':
+            bounds = {}
+            for name in ('since', 'until'):
+                if options[name]:
+                    bounds[name] = parse_moment(options[name])
+                    if bounds[name] is None:
+                        raise CommandError(f'Некорректная дата --{name}.')
+            rows = attempt_rows(owner_id=owner_id, mailing_id=options['mailing'], status=options['status'],
+                                archived=options['archived'], **bounds)
+            columns = ATTEMPT_COLUMNS
+        else:
+            rows = client_rows(owner_id=owner_id, mailing_id=options['mailing'])
+            columns = CLIENT_COLUMNS
+
+        if not options['output']:
+            for chunk in render(rows, columns, options['format']):
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+            for chunk in render(rows, columns, options['format']):
+                output.write(chunk)
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from mailing_app.benchmarks.dataset import LoadDataGenerator
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу большим воспроизводимым набором владельцев, клиентов, рассылок и попыток'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owners', type=int, default=1000)
+        parser.add_argument('--clients', type=int, default=1_000_000)
+        parser.add_argument('--mailings', type=int, default=10_000)
+        parser.add_argument('--recipients-per-mailing', type=int, default=2000,
+                            help='Среднее число получателей рассылки')
+        parser.add_argument('--attempts', type=int, default=20_000_000,
+                            help='Сколько попыток отправки создать (не больше числа получателей)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--chunk-size', type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        LoadDataGenerator(
+            owners=options['owners'],
+            clients=options['clients'],
+            mailings=options['mailings'],
+            recipients_per_mailing=options['recipients_per_mailing'],
+            attempts=options['attempts'],
+            seed=options['seed'],
+            chunk_size=options['chunk_size'],
+            log=self.stdout.write,
+        ).run()
@@ -0,0 +1,37 @@
+import io
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mailing_app.imports import import_clients
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = ('Загружает клиентов из CSV (колонки email, full_name, comment) пачками с обновлением '
+            'существующих по email. Отклонённые строки записываются в отдельный CSV.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV-файл в кодировке UTF-8')
+        parser.add_argument('--owner', required=True, help='Email пользователя, которому принадлежат клиенты')
+        parser.add_argument('--rejected', help='Файл отклонённых строк; по умолчанию <path>.rejected.csv')
+        parser.add_argument('--chunk-size', type=int,
+                            help='Строк в одной пачке; по умолчанию MAILING_IMPORT_CHUNK_SIZE')
+
+    def handle(self, *args, **options):
+        owner = CustomUser.objects.filter(email=options['owner']).first()
+        if owner is None:
+            raise CommandError(f"Пользователь {options['owner']} не найден.")
+        rejected_path = options['rejected'] or f"{options['path']}.rejected.csv"
+
+        def progress(counts):
+            self.stdout.write(f"Обработано строк: {counts['processed']}, записано: {counts['imported']}, "
+                              f"отклонено: {counts['rejected']}")
+
+        try:
+            with open(options['path'], 'rb') as raw, open(rejected_path, 'w', newline='', encoding='utf-8') as rejected:
+                counts = import_clients(io.TextIOWrapper(raw, encoding='utf-8-sig', newline=''), owner, rejected,
+                                        chunk_size=options['chunk_size'], progress=progress)
+        except (OSError, UnicodeDecodeError, ValueError) as error:
+            raise CommandError(str(error))
+        self.stdout.write(f"Готово: записано {counts['imported']}, отклонено {counts['rejected']} "
+                          f"(см. {rejected_path})")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from mailing_app.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает часовые корзины рассылок и дневные корзины владельцев по таблице попыток '
+            'и архиву попыток.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Дата (ГГГГ-ММ-ДД), с которой пересчитать корзины; по умолчанию все')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_date(options['since'])
+            if since is None:
+                raise CommandError('Дата --since должна быть в формате ГГГГ-ММ-ДД.')
+        hours, days = rebuild_rollups(since)
+        self.stdout.write(f'Пересчитано часовых корзин: {hours}, дневных: {days}')
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from mailing_app.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = ('Пересоздаёт поисковый индекс клиентов: FTS5-таблицу и триггеры в SQLite '
+            'или триграммные GIN-индексы в PostgreSQL.')
+
+    def handle(self, *args, **options):
+        rebuild_search_index()
+        self.stdout.write('Поисковый индекс клиентов пересоздан')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from mailing_app.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики статистики рассылок и владельцев с нуля по таблице попыток и архиву'
+
+    def handle(self, *args, **options):
+        mailings, owners = rebuild_stats()
+        self.stdout.write(f'Пересчитано рассылок: {mailings}, владельцев: {owners}')
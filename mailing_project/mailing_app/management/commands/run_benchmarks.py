@@ -0,0 +1,42 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from mailing_app.benchmarks import suite
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет бенчмарки отправки и страниц на отдельной тестовой базе и выводит результат в JSON. '
+            'Движок базы берётся из настроек (SQLite по умолчанию, Postgres через DATABASE_ENGINE).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', choices=list(suite.SIZES), default=['small'])
+        parser.add_argument('--requests', type=int, default=20, help='Запросов на страницу для перцентилей')
+        parser.add_argument('--send-recipients', type=int, nargs='+', default=[1000, 10000])
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Файл для JSON-результата; по умолчанию stdout')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            results = suite.run(
+                sizes=options['sizes'],
+                requests=options['requests'],
+                send_recipients=options['send_recipients'],
+                seed=options['seed'],
+                log=self.stderr.write,
+            )
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+        output = json.dumps(results, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
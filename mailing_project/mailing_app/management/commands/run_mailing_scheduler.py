@@ -0,0 +1,36 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from mailing_app.scheduler import MailingScheduler
+
+
+class Command(BaseCommand):
+    help = 'Запускает и останавливает рассылки по их start_time/end_time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=5.0,
+                            help='Как часто проверять новые и изменённые рассылки, в секундах')
+        parser.add_argument('--horizon', type=int, default=10,
+                            help='На сколько минут вперёд подгружать события из базы')
+        parser.add_argument('--once', action='store_true', help='Выполнить один шаг и выйти')
+
+    def handle(self, *args, **options):
+        scheduler = MailingScheduler(horizon=timedelta(minutes=options['horizon']))
+        poll_interval = options['poll_interval']
+
+        try:
+            while True:
+                close_old_connections()
+                next_event = scheduler.tick()
+                if options['once']:
+                    break
+                delay = poll_interval
+                if next_event is not None:
+                    delay = min(delay, max((next_event - timezone.now()).total_seconds(), 0))
+                time.sleep(delay)
+        except KeyboardInterrupt:
+            self.stdout.write('Планировщик остановлен')
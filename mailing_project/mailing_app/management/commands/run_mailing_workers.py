@@ -0,0 +1,95 @@
+import logging
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from mailing_app.attempt_log import get_metrics
+from mailing_app.imports import process_next_import
+from mailing_app.jobs import claim_job, worker_name
+from mailing_app.retries import process_due_retries
+from mailing_app.sending import dispatch_job
+from mailing_app.smtp_pool import close_pool
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = ('Запускает воркеры, которые забирают задачи рассылок из очереди и отправляют письма, '
+            'а в свободное время выполняют загрузки клиентов из CSV')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='Количество потоков-воркеров')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Пауза в секундах, если очередь пуста')
+        parser.add_argument('--once', action='store_true',
+                            help='Выйти, когда очередь опустеет')
+        parser.add_argument('--retry-batch', type=int,
+                            help='Сколько повторов обрабатывать между задачами; по умолчанию MAILING_RETRY_BATCH_SIZE')
+        parser.add_argument('--mode', choices=['sync', 'async'],
+                            help='Режим отправки; по умолчанию MAILING_DISPATCH_MODE')
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        threads = [
+            threading.Thread(
+                target=self.work,
+                args=(stop, options['poll_interval'], options['once'], options['mode'], options['retry_batch']),
+                name=f'mailing-worker-{i}',
+                daemon=True,
+            )
+            for i in range(options['workers'])
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f'Запущено воркеров: {len(threads)}')
+
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            self.stdout.write('Остановка воркеров...')
+            stop.set()
+            for thread in threads:
+                thread.join()
+        finally:
+            close_pool()
+            metrics = get_metrics()
+            self.stdout.write(
+                f"Записано попыток: {metrics['rows']} за {metrics['flushes']} сбросов, "
+                f"средний размер пачки {metrics['avg_flush_size']:.0f}, "
+                f"среднее время сброса {metrics['avg_flush_seconds'] * 1000:.1f} мс"
+            )
+
+    def work(self, stop, poll_interval, once, mode, retry_batch):
+        name = worker_name()
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                job = claim_job(name)
+                if job is not None:
+                    try:
+                        dispatch_job(job, mode)
+                    except Exception:
+                        logger.exception('Задача #%s завершилась с ошибкой', job.pk)
+                # Повторы обрабатываются ограниченной пачкой между задачами,
+                # чтобы поток ошибок не вытеснял новые рассылки.
+                try:
+                    retried = process_due_retries(retry_batch)
+                except Exception:
+                    logger.exception('Ошибка при обработке повторов')
+                    retried = 0
+                # Импорт клиентов — только когда нет рассылок и повторов: он может идти минутами.
+                imported = False
+                if job is None and not retried:
+                    try:
+                        imported = process_next_import(name)
+                    except Exception:
+                        logger.exception('Ошибка при импорте клиентов')
+                if job is None and not retried and not imported:
+                    if once:
+                        return
+                    stop.wait(poll_interval)
+        finally:
+            connections.close_all()
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 00:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailing_app', '0007_mailingattempt_client_mailingjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mailing',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='mailingjob',
+            name='status',
+            field=models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Завершена'), ('failed', 'Ошибка'), ('cancelled', 'Остановлена')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='mailing',
+            index=models.Index(fields=['start_time'], name='mailing_app_start_t_c743d7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mailing',
+            index=models.Index(fields=['end_time'], name='mailing_app_end_tim_972e72_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-18 00:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailing_app', '0008_mailing_updated_at_and_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mailing',
+            name='send_checkpoint',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='mailingjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='mailingattempt',
+            constraint=models.UniqueConstraint(fields=('mailing', 'client'), name='unique_attempt_per_client'),
+        ),
+        migrations.AddConstraint(
+            model_name='mailingjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('mailing',), name='unique_active_job_per_mailing'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-18 00:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailing_app', '0009_resumable_sends'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttemptRetry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state', models.CharField(choices=[('scheduled', 'Запланирована'), ('dead', 'Исчерпана')], default='scheduled', max_length=20)),
+                ('retries', models.PositiveSmallIntegerField(default=0)),
+                ('due_at', models.DateTimeField()),
+                ('lease', models.CharField(blank=True, max_length=32)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='retries', to='mailing_app.client')),
+                ('mailing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='retries', to='mailing_app.mailing')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['state', 'due_at'], name='mailing_app_state_cab489_idx'), models.Index(fields=['lease'], name='mailing_app_lease_54b7a5_idx')],
+                'constraints': [models.UniqueConstraint(fields=('mailing', 'client'), name='unique_retry_per_client')],
+            },
+        ),
+    ]
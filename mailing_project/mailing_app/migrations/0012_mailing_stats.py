@@ -0,0 +1,57 @@
+# Generated by Django 6.0 on 2026-10-18 00:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def fill_stats(apps, schema_editor):
+    Mailing = apps.get_model('mailing_app', 'Mailing')
+    MailingStats = apps.get_model('mailing_app', 'MailingStats')
+    OwnerStats = apps.get_model('mailing_app', 'OwnerStats')
+    per_mailing = Mailing.objects.order_by().values_list('pk', 'owner_id').annotate(
+        success=Count('attempts', filter=Q(attempts__status='success')),
+        failed=Count('attempts', filter=Q(attempts__status='failed')),
+    )
+    owners = {}
+    rows = []
+    for mailing_id, owner_id, success, failed in per_mailing:
+        rows.append(MailingStats(mailing_id=mailing_id, owner_id=owner_id, success=success, failed=failed))
+        totals = owners.setdefault(owner_id, {'mailings': 0, 'success': 0, 'failed': 0})
+        totals['mailings'] += 1
+        totals['success'] += success
+        totals['failed'] += failed
+    MailingStats.objects.bulk_create(rows, batch_size=5000)
+    OwnerStats.objects.bulk_create([OwnerStats(owner_id=pk, **totals) for pk, totals in owners.items()], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailing_app', '0011_ownershare'),
+        ('users', '0004_alter_customuser_managers_remove_customuser_username_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OwnerStats',
+            fields=[
+                ('owner', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('mailings', models.PositiveIntegerField(default=0)),
+                ('success', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MailingStats',
+            fields=[
+                ('mailing', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='mailing_app.mailing')),
+                ('success', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mailing_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 6.0 on 2026-10-18 00:55
+
+import django.db.models.deletion
+from django.conf import settings
+from datetime import timezone
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate, TruncHour
+
+
+def fill_rollups(apps, schema_editor):
+    MailingAttempt = apps.get_model('mailing_app', 'MailingAttempt')
+    MailingHourlyStats = apps.get_model('mailing_app', 'MailingHourlyStats')
+    OwnerDailyStats = apps.get_model('mailing_app', 'OwnerDailyStats')
+    counts = {
+        'success': Count('pk', filter=Q(status='success')),
+        'failed': Count('pk', filter=Q(status='failed')),
+    }
+    attempts = MailingAttempt.objects.order_by()
+    hourly = attempts.annotate(bucket=TruncHour('attempt_time', tzinfo=timezone.utc)).values_list(
+        'mailing_id', 'bucket').annotate(**counts)
+    MailingHourlyStats.objects.bulk_create(
+        [MailingHourlyStats(mailing_id=mailing_id, hour=hour, success=success, failed=failed)
+         for mailing_id, hour, success, failed in hourly.iterator(chunk_size=5000)],
+        batch_size=5000,
+    )
+    daily = attempts.annotate(bucket=TruncDate('attempt_time', tzinfo=timezone.utc)).values_list(
+        'mailing__owner_id', 'bucket').annotate(**counts)
+    OwnerDailyStats.objects.bulk_create(
+        [OwnerDailyStats(owner_id=owner_id, day=day, success=success, failed=failed)
+         for owner_id, day, success, failed in daily.iterator(chunk_size=5000)],
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailing_app', '0012_mailing_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MailingHourlyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('success', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('mailing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_stats', to='mailing_app.mailing')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('mailing', 'hour'), name='unique_mailing_hour')],
+            },
+        ),
+        migrations.CreateModel(
+            name='OwnerDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('success', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('owner', 'day'), name='unique_owner_day')],
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-18 00:58
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_status(apps, schema_editor):
+    Mailing = apps.get_model('mailing_app', 'Mailing')
+    now = timezone.now()
+    Mailing.objects.filter(is_active=False).update(status='stopped')
+    Mailing.objects.filter(is_active=True, end_time__lt=now).update(status='finished')
+    Mailing.objects.filter(is_active=True, start_time__lte=now, end_time__gte=now).update(status='running')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailing_app', '0013_attempt_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mailing',
+            name='status',
+            field=models.CharField(choices=[('created', 'Создана'), ('running', 'Запущена'), ('finished', 'Завершена'), ('stopped', 'Остановлена')], default='created', editable=False, max_length=20, verbose_name='Статус'),
+        ),
+        migrations.AddIndex(
+            model_name='mailing',
+            index=models.Index(fields=['owner', 'status'], name='mailing_app_owner_i_a6605d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mailing',
+            index=models.Index(fields=['status', 'start_time'], name='mailing_app_status_38bf33_idx'),
+        ),
+        migrations.RunPython(fill_status, migrations.RunPython.noop),
+    ]
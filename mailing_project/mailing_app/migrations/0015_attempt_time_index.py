@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 01:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailing_app', '0014_mailing_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mailingattempt',
+            index=models.Index(fields=['mailing', 'attempt_time'], name='mailing_app_mailing_547456_idx'),
+        ),
+    ]
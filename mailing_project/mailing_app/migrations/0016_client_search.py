@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-18 01:20
+
+from django.db import migrations
+
+
+def install(apps, schema_editor):
+    from mailing_app.search import install_search_index
+    install_search_index(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    from mailing_app.search import uninstall_search_index
+    uninstall_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailing_app', '0015_attempt_time_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
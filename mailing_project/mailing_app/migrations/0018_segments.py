@@ -0,0 +1,46 @@
+# Generated by Django 6.0 on 2026-10-18 01:15
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailing_app', '0017_client_import'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='mailing',
+            name='recipients',
+            field=models.ManyToManyField(blank=True, to='mailing_app.client', verbose_name='Получатели'),
+        ),
+        migrations.CreateModel(
+            name='Segment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='Название')),
+                ('email_domain', models.CharField(blank=True, help_text='Например, example.com', max_length=255, verbose_name='Домен email')),
+                ('tags', models.CharField(blank=True, help_text='Теги из комментария клиента через пробел, например #vip #msk; нужны все', max_length=255, verbose_name='Теги')),
+                ('created_after', models.DateTimeField(blank=True, null=True, verbose_name='Клиенты добавлены не раньше')),
+                ('created_before', models.DateTimeField(blank=True, null=True, verbose_name='Клиенты добавлены раньше')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segments', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='mailing',
+            name='segment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='mailings', to='mailing_app.segment', verbose_name='Сегмент'),
+        ),
+    ]
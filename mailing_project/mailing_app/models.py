@@ -1,30 +1,161 @@
+import re
+
 from django.conf import settings
+from django.core.mail import EmailMessage
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 
 
+class OwnedQuerySet(models.QuerySet):
+    """Строки моделей с владельцем: представления и формы читают их только через owned_by."""
+
+    def owned_by(self, user):
+        return self.filter(owner=user)
+
+
 class Client(models.Model):
-    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='clients')
+    # Отдельный индекс по owner не нужен: его заменяет составной (owner, id).
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='clients',
+                              db_index=False)
     email = models.EmailField(unique=True)
     full_name = models.CharField(max_length=255)
     comment = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = OwnedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Страницы клиентов владельца по убыванию pk и пачки сегментов по возрастанию.
+            models.Index(fields=['owner', 'id']),
+        ]
 
     def __str__(self):
         return f'{self.full_name} <{self.email}>'
 
+
+class Segment(models.Model):
+    """Сохранённый фильтр по клиентам владельца.
+
+    Рассылка с сегментом не хранит получателей построчно: отправка сама
+    выбирает подходящих клиентов пачками (см. RecipientStream), поэтому
+    рассылка «на всех клиентов» не пишет по строке на каждого.
+    """
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='segments')
+    name = models.CharField('Название', max_length=255)
+    email_domain = models.CharField('Домен email', max_length=255, blank=True,
+                                    help_text='Например, example.com')
+    tags = models.CharField('Теги', max_length=255, blank=True,
+                            help_text='Теги из комментария клиента через пробел, например #vip #msk; нужны все')
+    created_after = models.DateTimeField('Клиенты добавлены не раньше', null=True, blank=True)
+    created_before = models.DateTimeField('Клиенты добавлены раньше', null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = OwnedQuerySet.as_manager()
+
+    def __str__(self):
+        return self.name
+
+    def tag_list(self):
+        return ['#' + tag.lstrip('#') for tag in re.split(r'[\s,]+', self.tags) if tag.lstrip('#')]
+
+    def client_filter(self):
+        """Условие на Client: клиенты владельца, подходящие под все заданные признаки."""
+        condition = models.Q(owner_id=self.owner_id)
+        if self.email_domain:
+            condition &= models.Q(email__iendswith='@' + self.email_domain.lstrip('@'))
+        for tag in self.tag_list():
+            # Тег — отдельное слово комментария: #vip не совпадает с #vipclub.
+            condition &= models.Q(comment__iregex=rf'(^|\s){re.escape(tag)}($|[\s,.;])')
+        if self.created_after:
+            condition &= models.Q(created_at__gte=self.created_after)
+        if self.created_before:
+            condition &= models.Q(created_at__lt=self.created_before)
+        return condition
+
+    def clients(self):
+        return Client.objects.filter(self.client_filter())
+
 class Message(models.Model):
+    # Сообщения, созданные до появления владельца, остаются без него и видны только в админке.
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='messages',
+                              null=True, blank=True, db_index=False)
     subject = models.CharField(max_length=255)
     body = models.TextField()
 
+    objects = OwnedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'id']),
+        ]
+
     def __str__(self):
         return self.subject
 
+class MailingQuerySet(OwnedQuerySet):
+    def with_list_stats(self):
+        """Рассылки с владельцем, сегментом и счётчиками для списков одним запросом.
+
+        recipient_count — только явно выбранные получатели: клиентов сегмента
+        заранее не посчитать, поэтому списки показывают рядом имя сегмента.
+        recipient_count и last_attempt_time — коррелированные подзапросы по
+        индексам (mailing_id в таблице получателей, (mailing, attempt_time) у
+        попыток), success_count и failed_count берутся из MailingStats. JOIN по
+        получателям и попыткам сразу размножил бы строки.
+        """
+        through = Mailing.recipients.through
+        recipient_count = (
+            through.objects.filter(mailing_id=models.OuterRef('pk'))
+            .order_by()
+            .values('mailing_id')
+            .annotate(count=models.Count('pk'))
+            .values('count')
+        )
+        last_attempt = (
+            MailingAttempt.objects.filter(mailing_id=models.OuterRef('pk'))
+            .order_by('-attempt_time')
+            .values('attempt_time')[:1]
+        )
+        return self.select_related('owner', 'segment').annotate(
+            recipient_count=Coalesce(models.Subquery(recipient_count), 0),
+            success_count=Coalesce('stats__success', 0),
+            failed_count=Coalesce('stats__failed', 0),
+            last_attempt_time=models.Subquery(last_attempt),
+        )
+
+
 class Mailing(models.Model):
+    """Рассылка с хранимым статусом.
+
+    Статус пересчитывается по расписанию при сохранении, дальше его двигают
+    воркеры отправки и периодический переход в планировщике (см. lifecycle.py).
+    """
+    STATUS_CREATED = 'created'
+    STATUS_RUNNING = 'running'
+    STATUS_FINISHED = 'finished'
+    STATUS_STOPPED = 'stopped'
+    STATUS_CHOICES = [
+        (STATUS_CREATED, 'Создана'),
+        (STATUS_RUNNING, 'Запущена'),
+        (STATUS_FINISHED, 'Завершена'),
+        (STATUS_STOPPED, 'Остановлена'),
+    ]
+    # Из какого статуса в какие разрешён переход.
+    TRANSITIONS = {
+        STATUS_CREATED: {STATUS_RUNNING, STATUS_FINISHED, STATUS_STOPPED},
+        STATUS_RUNNING: {STATUS_FINISHED, STATUS_STOPPED},
+        STATUS_STOPPED: set(),
+        STATUS_FINISHED: set(),
+    }
+
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
-        verbose_name='Владелец'
+        verbose_name='Владелец',
+        db_index=False,
     )
     email = models.EmailField('Email отправителя')
     start_time = models.DateTimeField('Время начала')
@@ -33,10 +164,28 @@ class Mailing(models.Model):
     recipients = models.ManyToManyField(
         Client,
         verbose_name='Получатели',
-        blank=False
+        blank=True
     )
+    segment = models.ForeignKey(Segment, on_delete=models.PROTECT, null=True, blank=True, related_name='mailings',
+                                verbose_name='Сегмент')
     is_active = models.BooleanField(default=True)
+    status = models.CharField('Статус', max_length=20, choices=STATUS_CHOICES, default=STATUS_CREATED,
+                              editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    send_checkpoint = models.BigIntegerField(default=0, editable=False)
+
+    objects = MailingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['start_time']),
+            models.Index(fields=['end_time']),
+            models.Index(fields=['owner', 'status']),
+            # Список рассылок владельца по времени начала; заменяет индекс по owner.
+            models.Index(fields=['owner', 'start_time']),
+            models.Index(fields=['status', 'start_time']),
+        ]
 
     def clean(self):
         from django.core.exceptions import ValidationError
@@ -53,21 +202,42 @@ class Mailing(models.Model):
 
     def save(self, *args, **kwargs):
         self.clean()
+        self.status = self.scheduled_status()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'status'}
         super().save(*args, **kwargs)
 
-    @property
-    def status(self):
-        from django.utils import timezone
-        now = timezone.now()
+    def scheduled_status(self, now=None):
+        """Статус, который рассылка должна иметь по расписанию и флагу is_active."""
+        now = now or timezone.now()
+        if not self.is_active:
+            return self.STATUS_STOPPED
         if now < self.start_time:
-            return 'Создана'
-        elif self.start_time <= now <= self.end_time:
-            return 'Запущена'
-        else:
-            return 'Завершена'
+            return self.STATUS_CREATED
+        if now <= self.end_time:
+            return self.STATUS_RUNNING
+        return self.STATUS_FINISHED
+
+    def recipient_filter(self):
+        """Условие на Client: явно выбранные получатели и клиенты сегмента."""
+        through = Mailing.recipients.through
+        condition = models.Q(pk__in=through.objects.filter(mailing_id=self.pk).values('client_id'))
+        if self.segment_id:
+            condition |= self.segment.client_filter()
+        return condition
+
+    def all_recipients(self):
+        return Client.objects.filter(self.recipient_filter())
+
+    @property
+    def subject(self):
+        return f'Рассылка #{self.pk}'
+
+    def build_email(self, to):
+        return EmailMessage(subject=self.subject, body=self.message, from_email=self.email, to=[to])
 
     def __str__(self):
-        return f'Рассылка #{self.pk} ({self.status})'
+        return f'Рассылка #{self.pk} ({self.get_status_display()})'
 
 class MailingAttempt(models.Model):
     STATUS_CHOICES = [
@@ -76,9 +246,212 @@ class MailingAttempt(models.Model):
     ]
 
     mailing = models.ForeignKey(Mailing, on_delete=models.CASCADE, related_name='attempts')
+    client = models.ForeignKey(Client, on_delete=models.SET_NULL, null=True, blank=True, related_name='attempts')
     attempt_time = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES)
     server_response = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['mailing', 'attempt_time']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['mailing', 'client'], name='unique_attempt_per_client'),
+        ]
+
+    def __str__(self):
+        return f'Попытка #{self.pk} рассылки #{self.mailing_id} – {self.get_status_display()} в {self.attempt_time}'
+
+
+class MailingJob(models.Model):
+    """Задача очереди на отправку рассылки, которую выполняют воркеры run_mailing_workers."""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Завершена'),
+        (STATUS_FAILED, 'Ошибка'),
+        (STATUS_CANCELLED, 'Остановлена'),
+    ]
+
+    mailing = models.ForeignKey(Mailing, on_delete=models.CASCADE, related_name='jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    served_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=255, blank=True)
+    total = models.PositiveIntegerField(default=0)
+    sent = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['mailing'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='unique_active_job_per_mailing',
+            ),
+        ]
+
     def __str__(self):
-        return f'Попытка #{self.pk} рассылки #{self.mailing.pk} – {self.get_status_display()} в {self.attempt_time}'
+        return f'Задача #{self.pk} рассылки #{self.mailing_id} ({self.get_status_display()})'
+
+
+class AttemptRetry(models.Model):
+    """Повторная отправка получателю после временной ошибки SMTP.
+
+    Исчерпавшие попытки записи остаются в таблице в состоянии dead (dead letter).
+    """
+    STATE_SCHEDULED = 'scheduled'
+    STATE_DEAD = 'dead'
+    STATE_CHOICES = [
+        (STATE_SCHEDULED, 'Запланирована'),
+        (STATE_DEAD, 'Исчерпана'),
+    ]
+
+    mailing = models.ForeignKey(Mailing, on_delete=models.CASCADE, related_name='retries')
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='retries')
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default=STATE_SCHEDULED)
+    retries = models.PositiveSmallIntegerField(default=0)
+    due_at = models.DateTimeField()
+    lease = models.CharField(max_length=32, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['state', 'due_at']),
+            models.Index(fields=['lease']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['mailing', 'client'], name='unique_retry_per_client'),
+        ]
+
+    def __str__(self):
+        return f'Повтор рассылки #{self.mailing_id} для клиента #{self.client_id} ({self.get_state_display()})'
+
+
+class OwnerShare(models.Model):
+    """Вес владельца при справедливом распределении воркеров между рассылками.
+
+    Воркеры по очереди обслуживают владельцев, которых дольше всех не
+    обслуживали; за один подход задача владельца с весом N отправляет в N раз
+    больше писем, чем с весом 1.
+    """
+    owner = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='mailing_share')
+    weight = models.PositiveSmallIntegerField(default=1)
+    served_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    def __str__(self):
+        return f'{self.owner} (вес {self.weight})'
+
+
+class MailingStats(models.Model):
+    """Счётчики попыток рассылки, которые обновляются вместе с записью попыток.
+
+    Пересобираются с нуля командой reconcile_mailing_stats.
+    """
+    mailing = models.OneToOneField(Mailing, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='mailing_stats')
+    success = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'Статистика рассылки #{self.mailing_id}'
+
+
+class OwnerStats(models.Model):
+    """Итоговые счётчики владельца для страницы статистики: одна строка на владельца."""
+    owner = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+                                 related_name='stats')
+    mailings = models.PositiveIntegerField(default=0)
+    success = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'Статистика {self.owner}'
+
+
+class MailingHourlyStats(models.Model):
+    """Число попыток рассылки за час (UTC) для графиков; обновляется вместе с записью попыток."""
+    mailing = models.ForeignKey(Mailing, on_delete=models.CASCADE, related_name='hourly_stats')
+    hour = models.DateTimeField()
+    success = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['mailing', 'hour'], name='unique_mailing_hour'),
+        ]
+
+    def __str__(self):
+        return f'Рассылка #{self.mailing_id} за {self.hour:%d.%m.%Y %H:00}'
+
+
+class OwnerDailyStats(models.Model):
+    """Число попыток всех рассылок владельца за день (UTC) для отчётов."""
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+    success = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'day'], name='unique_owner_day'),
+        ]
+
+    def __str__(self):
+        return f'{self.owner} за {self.day:%d.%m.%Y}'
+
+
+class ClientImport(models.Model):
+    """Загрузка клиентов из CSV, которую выполняют воркеры run_mailing_workers в свободное от рассылок время."""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Завершена'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='client_imports')
+    source = models.CharField(max_length=500)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=255, blank=True)
+    size = models.PositiveBigIntegerField(default=0)
+    position = models.PositiveBigIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    imported = models.PositiveIntegerField(default=0)
+    rejected = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    objects = OwnedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f'Импорт клиентов #{self.pk} ({self.get_status_display()})'
+
+    @property
+    def rejected_path(self):
+        return f'{self.source}.rejected.csv'
@@ -0,0 +1,127 @@
+import base64
+import json
+
+from django.db.models import Q
+from django.http import Http404
+
+NEXT = 'next'
+PREV = 'prev'
+
+
+def encode_cursor(values, direction=NEXT):
+    """Непрозрачный курсор для URL: значения ключа граничной строки и направление."""
+    payload = json.dumps([direction, [str(value) for value in values]], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        direction, values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise Http404('Некорректный курсор страницы.')
+    if direction not in (NEXT, PREV) or not isinstance(values, list):
+        raise Http404('Некорректный курсор страницы.')
+    return direction, values
+
+
+def keyset_filter(ordering, values):
+    """Условие «строго после values» для сортировки ordering, например ('-created_at', '-pk').
+
+    Для ключа (a, b) по убыванию: a < va ИЛИ (a = va И b < vb) — такое условие
+    база выполняет как диапазонный проход по индексу без OFFSET.
+    """
+    condition = Q()
+    equal = {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= Q(**equal, **{f'{name}__{lookup}': value})
+        equal[name] = value
+    return condition
+
+
+def reverse_ordering(ordering):
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+class KeysetPage:
+    """Страница без номера и общего числа строк: только соседние курсоры."""
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginationMixin:
+    """Постраничный вывод ListView по ключу вместо OFFSET.
+
+    Строки сортируются по keyset_ordering (по умолчанию по убыванию pk —
+    первичный ключ всегда проиндексирован), а страница задаётся курсором
+    ?cursor=... со значениями ключа граничной строки. Запрос страницы — один
+    диапазонный SELECT ... LIMIT paginate_by + 1 без COUNT(*), поэтому
+    10 000-я страница стоит столько же, сколько первая. Номеров страниц и
+    общего числа нет — только «Назад» и «Вперёд».
+    """
+    keyset_ordering = ('-pk',)
+    cursor_kwarg = 'cursor'
+
+    def key_values(self, obj):
+        return [getattr(obj, field.lstrip('-')) for field in self.keyset_ordering]
+
+    def parse_key(self, queryset, values):
+        if len(values) != len(self.keyset_ordering):
+            raise Http404('Некорректный курсор страницы.')
+        parsed = []
+        for field, value in zip(self.keyset_ordering, values):
+            name = field.lstrip('-')
+            model_field = queryset.model._meta.pk if name == 'pk' else queryset.model._meta.get_field(name)
+            try:
+                parsed.append(model_field.to_python(value))
+            except Exception:
+                raise Http404('Некорректный курсор страницы.')
+        return parsed
+
+    def paginate_queryset(self, queryset, page_size):
+        ordering = list(self.keyset_ordering)
+        queryset = queryset.order_by(*ordering)
+        cursor = self.request.GET.get(self.cursor_kwarg)
+        direction, values = decode_cursor(cursor) if cursor else (NEXT, None)
+
+        if direction == PREV:
+            rows = list(
+                queryset.order_by(*reverse_ordering(ordering))
+                .filter(keyset_filter(reverse_ordering(ordering), self.parse_key(queryset, values)))[:page_size + 1]
+            )
+            has_more = len(rows) > page_size
+            rows = rows[:page_size][::-1]
+            has_previous, has_next = has_more, True
+        else:
+            if values is not None:
+                queryset = queryset.filter(keyset_filter(ordering, self.parse_key(queryset, values)))
+            rows = list(queryset[:page_size + 1])
+            has_next = len(rows) > page_size
+            rows = rows[:page_size]
+            has_previous = values is not None
+
+        page = KeysetPage(
+            rows,
+            encode_cursor(self.key_values(rows[-1]), NEXT) if has_next and rows else None,
+            encode_cursor(self.key_values(rows[0]), PREV) if has_previous and rows else None,
+        )
+        return None, page, rows, page.has_other_pages()
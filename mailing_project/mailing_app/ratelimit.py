@@ -0,0 +1,137 @@
+import time
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.cache import cache
+
+KEY_PREFIX = 'mailing-ratelimit'
+
+
+def get_limiter():
+    """Лимитер для отправки или None, если MAILING_RATE_LIMITS не заданы."""
+    return RateLimiter() if settings.MAILING_RATE_LIMITS else None
+
+
+def email_domain(email):
+    return email.rpartition('@')[2].lower()
+
+
+class RateLimiter:
+    """Ограничение скорости отправки по домену получателя и по адресу отправителя.
+
+    Для каждого ключа (домен или отправитель) действует корзина на limit писем
+    за period секунд, которая пополняется в начале каждого окна. Счётчики лежат
+    в кэше Django (cache.add + cache.incr), поэтому при общем бэкенде кэша лимит
+    общий для всех воркеров и процессов. Лимиты задаются в MAILING_RATE_LIMITS:
+    {'domain': {'default': 600, 'gmail.com': 300}, 'sender': {'default': 1200}};
+    None снимает ограничение.
+    """
+
+    scopes = ('sender', 'domain')
+
+    def __init__(self, limits=None, period=None, cache_backend=None):
+        self.limits = limits if limits is not None else settings.MAILING_RATE_LIMITS
+        self.period = period or settings.MAILING_RATE_LIMIT_PERIOD
+        self.cache = cache_backend or cache
+        self._registered = set()
+
+    def limit(self, scope, key):
+        limits = self.limits.get(scope) or {}
+        return limits.get(key, limits.get('default'))
+
+    def window(self, now):
+        return int(now // self.period)
+
+    def cache_key(self, scope, key, window):
+        return f'{KEY_PREFIX}:{scope}:{key}:{window}'
+
+    def grant(self, scope, key, requested, now=None):
+        """Выдаёт до requested токенов из корзины ключа; возвращает, сколько выдано."""
+        limit = self.limit(scope, key)
+        if limit is None or requested == 0:
+            return requested
+        window = self.window(now or time.time())
+        cache_key = self.cache_key(scope, key, window)
+        self.cache.add(cache_key, 0, timeout=self.period * 2)
+        self._register(scope, key, window)
+        try:
+            used = self.cache.incr(cache_key, requested)
+        except ValueError:
+            # Ключ истёк между add и incr.
+            self.cache.add(cache_key, requested, timeout=self.period * 2)
+            used = requested
+        granted = max(0, min(requested, limit - (used - requested)))
+        if granted < requested:
+            self.refund(scope, key, requested - granted, now)
+        return granted
+
+    def refund(self, scope, key, count, now=None):
+        if count and self.limit(scope, key) is not None:
+            try:
+                self.cache.decr(self.cache_key(scope, key, self.window(now or time.time())), count)
+            except ValueError:
+                pass
+
+    def seconds_until_refill(self, now=None):
+        now = now or time.time()
+        return (self.window(now) + 1) * self.period - now
+
+    def partition(self, sender, recipients, now=None, email=attrgetter('email')):
+        """Делит получателей на тех, кому можно писать сейчас, и отложенных.
+
+        email достаёт адрес из элемента recipients. Возвращает (allowed, deferred, wait),
+        где wait — через сколько секунд есть смысл попробовать отложенных снова.
+        """
+        now = now or time.time()
+        sender = sender.lower()
+        granted = self.grant('sender', sender, len(recipients), now)
+        deferred = list(recipients[granted:])
+
+        by_domain = {}
+        for recipient in recipients[:granted]:
+            by_domain.setdefault(email_domain(email(recipient)), []).append(recipient)
+
+        allowed = []
+        for domain, group in by_domain.items():
+            domain_granted = self.grant('domain', domain, len(group), now)
+            allowed.extend(group[:domain_granted])
+            deferred.extend(group[domain_granted:])
+            self.refund('sender', sender, len(group) - domain_granted, now)
+
+        return allowed, deferred, self.seconds_until_refill(now) if deferred else 0
+
+    def _register(self, scope, key, window):
+        # Реестр ключей текущего окна нужен только для snapshot(); он ведётся по
+        # принципу best effort, поэтому гонка при get/set здесь не страшна.
+        if (scope, key, window) in self._registered:
+            return
+        if any(registered[2] != window for registered in self._registered):
+            self._registered.clear()
+        self._registered.add((scope, key, window))
+        registry_key = f'{KEY_PREFIX}:keys:{window}'
+        keys = self.cache.get(registry_key) or set()
+        if (scope, key) not in keys:
+            keys.add((scope, key))
+            self.cache.set(registry_key, keys, timeout=self.period * 2)
+
+    def snapshot(self, now=None):
+        """Текущая загрузка лимитов: сколько писем отправлено в этом окне по каждому ключу."""
+        now = now or time.time()
+        window = self.window(now)
+        keys = sorted(self.cache.get(f'{KEY_PREFIX}:keys:{window}') or set())
+        used = self.cache.get_many([self.cache_key(scope, key, window) for scope, key in keys])
+        elapsed = now - window * self.period
+        return {
+            'period': self.period,
+            'window_elapsed': round(elapsed, 2),
+            'keys': [
+                {
+                    'scope': scope,
+                    'key': key,
+                    'limit': self.limit(scope, key),
+                    'used': used.get(self.cache_key(scope, key, window), 0),
+                    'rate_per_sec': round(used.get(self.cache_key(scope, key, window), 0) / max(elapsed, 1), 2),
+                }
+                for scope, key in keys
+            ],
+        }
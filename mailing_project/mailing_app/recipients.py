@@ -0,0 +1,71 @@
+from collections import namedtuple
+
+from django.db.models import Exists, OuterRef
+
+from .models import Client, Mailing, MailingAttempt
+
+Recipient = namedtuple('Recipient', ['pk', 'email'])
+
+
+class RecipientStream:
+    """Потоковый обход получателей рассылки пачками фиксированного размера.
+
+    Получатели — явно выбранные клиенты и клиенты сегмента рассылки (см.
+    Segment). Явные получатели читаются прямо из таблицы связи по индексу
+    (mailing_id, client_id) с keyset-курсором по client_id, клиенты сегмента —
+    по индексу (owner, id) с условиями сегмента; два отсортированных по pk
+    потока сливаются в Python без повторов. Так пачка стоит одинаково в
+    начале и в конце списка и не требует сортировки всех оставшихся
+    получателей. Из базы выбираются только pk и email, не больше chunk_size
+    строк на поток за запрос, — память воркера не зависит от числа получателей.
+    Пропускаются получатели, которым уже была попытка. Количество получателей
+    считается по ходу обхода в count, без отдельного COUNT(*).
+    """
+
+    def __init__(self, mailing, chunk_size, cursor=None):
+        self.mailing = mailing
+        self.chunk_size = chunk_size
+        if cursor is None:
+            cursor = Mailing.objects.values_list('send_checkpoint', flat=True).get(pk=mailing.pk)
+        self.cursor = cursor
+        self.count = 0
+        self.segment = mailing.segment if mailing.segment_id else None
+
+    def __iter__(self):
+        while True:
+            chunk = self.next_chunk()
+            if not chunk:
+                return
+            yield chunk
+
+    def attempted(self, field):
+        return Exists(MailingAttempt.objects.filter(mailing_id=self.mailing.pk, client_id=OuterRef(field)))
+
+    def explicit_rows(self):
+        through = Mailing.recipients.through
+        return (
+            through.objects.filter(mailing_id=self.mailing.pk, client_id__gt=self.cursor)
+            .filter(~self.attempted('client_id'))
+            .order_by('client_id')
+            .values_list('client_id', 'client__email')[:self.chunk_size]
+        )
+
+    def segment_rows(self):
+        # client_filter начинается с owner_id, так что обход идёт по индексу (owner, id).
+        return (
+            Client.objects.filter(self.segment.client_filter(), pk__gt=self.cursor)
+            .filter(~self.attempted('pk'))
+            .order_by('pk')
+            .values_list('pk', 'email')[:self.chunk_size]
+        )
+
+    def next_chunk(self):
+        chunk = [Recipient(*row) for row in self.explicit_rows()]
+        if self.segment is not None:
+            merged = {recipient.pk: recipient for recipient in chunk}
+            merged.update((pk, Recipient(pk, email)) for pk, email in self.segment_rows())
+            chunk = [merged[pk] for pk in sorted(merged)[:self.chunk_size]]
+        if chunk:
+            self.cursor = chunk[-1].pk
+            self.count += len(chunk)
+        return chunk
@@ -0,0 +1,146 @@
+import random
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AttemptRetry, Mailing, MailingAttempt
+from .ratelimit import get_limiter
+from .rollups import record_delivered_rollups
+from .smtp_pool import get_pool, is_transient
+from .stats import record_delivered_retries
+
+
+def backoff_delay(retries):
+    """Экспоненциальная задержка перед повтором номер retries (с нуля) с джиттером.
+
+    Задержка выбирается случайно между половиной и полным значением base * 2**retries,
+    чтобы повторы после массового сбоя не приходили на сервер одной волной.
+    """
+    delay = min(settings.MAILING_RETRY_BASE_DELAY * 2 ** retries, settings.MAILING_RETRY_MAX_DELAY)
+    return timedelta(seconds=random.uniform(delay / 2, delay))
+
+
+def new_retry(mailing, client_id, error):
+    return AttemptRetry(
+        mailing=mailing,
+        client_id=client_id,
+        due_at=timezone.now() + backoff_delay(0),
+        last_error=str(error),
+    )
+
+
+def mailing_stopped(mailing):
+    return mailing.status == Mailing.STATUS_STOPPED or not mailing.is_active
+
+
+def can_resend(mailing, now):
+    """Можно ли ещё слать повторы рассылки: её не остановили и окно отправки открыто."""
+    return not mailing_stopped(mailing) and mailing.scheduled_status(now) == Mailing.STATUS_RUNNING
+
+
+def lease_due_retries(limit, lease_seconds=300):
+    """Забирает не больше limit наступивших повторов, продлевая их due_at на время аренды.
+
+    Повторы захватываются условным UPDATE по due_at, так что параллельные
+    воркеры не получат одну и ту же запись.
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    due = (
+        AttemptRetry.objects.filter(state=AttemptRetry.STATE_SCHEDULED, due_at__lte=now)
+        .order_by('due_at')
+        .values_list('pk', flat=True)[:limit]
+    )
+    AttemptRetry.objects.filter(pk__in=list(due), due_at__lte=now).update(
+        lease=token,
+        due_at=now + timedelta(seconds=lease_seconds),
+    )
+    return list(AttemptRetry.objects.filter(lease=token).select_related('mailing', 'client'))
+
+
+def process_due_retries(limit=None, pool=None):
+    """Повторно отправляет одну пачку наступивших повторов; возвращает их количество.
+
+    Размер пачки ограничен MAILING_RETRY_BATCH_SIZE, чтобы волна ошибок не
+    вытесняла отправку новых рассылок: воркер берёт не больше одной пачки
+    повторов между задачами. Повторы остановленных рассылок и рассылок с
+    закрытым окном отправки не отправляются, а переводятся в dead.
+    """
+    limit = limit or settings.MAILING_RETRY_BATCH_SIZE
+    retries = lease_due_retries(limit)
+    if not retries:
+        return 0
+
+    now = timezone.now()
+    live = [retry for retry in retries if can_resend(retry.mailing, now)]
+    limiter = get_limiter()
+    deferred = []
+    if limiter is not None:
+        by_sender = {}
+        for retry in live:
+            by_sender.setdefault(retry.mailing.email, []).append(retry)
+        live = []
+        for sender, group in by_sender.items():
+            allowed, held, wait = limiter.partition(sender, group, email=lambda retry: retry.client.email)
+            live.extend(allowed)
+            deferred.extend(held)
+    errors = (pool or get_pool()).send_batch(
+        [retry.mailing.build_email(retry.client.email) for retry in live]
+    )
+    results = dict(zip((retry.pk for retry in live), errors))
+
+    delivered, updated = [], []
+    deferred_pks = {retry.pk for retry in deferred}
+    for retry in retries:
+        retry.lease = ''
+        if retry.pk in deferred_pks:
+            # Упёрлись в лимит скорости: попытка не тратится, повтор в следующем окне.
+            retry.due_at = now + timedelta(seconds=limiter.seconds_until_refill())
+            updated.append(retry)
+            continue
+        if retry.pk not in results:
+            retry.state = AttemptRetry.STATE_DEAD
+            if mailing_stopped(retry.mailing):
+                retry.last_error = 'Рассылка остановлена до успешной отправки.'
+            else:
+                retry.last_error = 'Окно рассылки закрыто до успешной отправки.'
+            updated.append(retry)
+            continue
+        error = results[retry.pk]
+        if error is None:
+            delivered.append(retry)
+            continue
+        retry.retries += 1
+        retry.last_error = str(error)
+        if is_transient(error) and retry.retries < settings.MAILING_RETRY_MAX_ATTEMPTS:
+            retry.due_at = now + backoff_delay(retry.retries)
+        else:
+            retry.state = AttemptRetry.STATE_DEAD
+        updated.append(retry)
+
+    delivered_by_mailing = {}
+    for retry in delivered:
+        delivered_by_mailing.setdefault(retry.mailing, []).append(retry.client_id)
+
+    with transaction.atomic():
+        for mailing, client_ids in delivered_by_mailing.items():
+            moved = list(
+                MailingAttempt.objects.filter(mailing=mailing, client_id__in=client_ids, status='failed')
+                .values_list('pk', 'attempt_time')
+            )
+            MailingAttempt.objects.filter(pk__in=[pk for pk, _ in moved]).update(
+                status='success',
+                server_response='Письмо отправлено успешно после повтора.',
+            )
+            record_delivered_retries(mailing, len(moved))
+            record_delivered_rollups(mailing, [attempt_time for _, attempt_time in moved])
+        for retry in updated:
+            MailingAttempt.objects.filter(mailing_id=retry.mailing_id, client_id=retry.client_id).update(
+                server_response=retry.last_error,
+            )
+        AttemptRetry.objects.filter(pk__in=[retry.pk for retry in delivered]).delete()
+        AttemptRetry.objects.bulk_update(updated, ['state', 'retries', 'due_at', 'lease', 'last_error'])
+    return len(retries)
@@ -0,0 +1,161 @@
+from collections import Counter
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate, TruncHour
+
+from .archive import read_archive
+from .models import Mailing, MailingAttempt, MailingHourlyStats, OwnerDailyStats
+from .stats import bump
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+REBUILD_CHUNK_SIZE = 5000
+
+
+def hour_bucket(moment):
+    return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(moment):
+    return moment.astimezone(dt_timezone.utc).date()
+
+
+def _apply(hourly, daily):
+    for (mailing_id, hour), counter in hourly.items():
+        bump(MailingHourlyStats, {'mailing_id': mailing_id, 'hour': hour},
+             success=counter['success'], failed=counter['failed'])
+    for (owner_id, day), counter in daily.items():
+        bump(OwnerDailyStats, {'owner_id': owner_id, 'day': day},
+             success=counter['success'], failed=counter['failed'])
+
+
+def record_rollups(attempts):
+    """Добавляет записанные попытки в часовые и дневные корзины.
+
+    Пачка обычно попадает в один-два часа, так что это пара UPDATE на рассылку.
+    """
+    hourly, daily = {}, {}
+    for attempt in attempts:
+        hourly.setdefault((attempt.mailing_id, hour_bucket(attempt.attempt_time)), Counter())[attempt.status] += 1
+        daily.setdefault((attempt.mailing.owner_id, day_bucket(attempt.attempt_time)), Counter())[attempt.status] += 1
+    _apply(hourly, daily)
+
+
+def record_delivered_rollups(mailing, attempt_times):
+    """Переносит доставленные повтором попытки из неудачных в успешные в их исходных корзинах."""
+    hourly, daily = {}, {}
+    for moment in attempt_times:
+        hourly.setdefault((mailing.pk, hour_bucket(moment)), Counter()).update(success=1, failed=-1)
+        daily.setdefault((mailing.owner_id, day_bucket(moment)), Counter()).update(success=1, failed=-1)
+    _apply(hourly, daily)
+
+
+def forget_mailing(mailing):
+    """Вычитает попытки удаляемой рассылки из дневных корзин владельца (часовые удалятся каскадом)."""
+    daily = {}
+    for hour, success, failed in MailingHourlyStats.objects.filter(mailing_id=mailing.pk).values_list(
+            'hour', 'success', 'failed'):
+        daily.setdefault((mailing.owner_id, day_bucket(hour)), Counter()).update(success=-success, failed=-failed)
+    _apply({}, daily)
+
+
+def _series(rows, start, until, step):
+    counts = {bucket: (success, failed) for bucket, success, failed in rows}
+    series = []
+    bucket = start
+    while bucket < until:
+        success, failed = counts.get(bucket, (0, 0))
+        series.append({'time': bucket, 'success': success, 'failed': failed})
+        bucket += step
+    return series
+
+
+def mailing_hourly(mailing, since, until):
+    """Попытки рассылки по часам в [since, until), включая пустые часы."""
+    start = hour_bucket(since)
+    rows = MailingHourlyStats.objects.filter(mailing=mailing, hour__gte=start, hour__lt=until).values_list(
+        'hour', 'success', 'failed')
+    return _series(rows, start, until, HOUR)
+
+
+def owner_daily(owner, since, until):
+    """Попытки всех рассылок владельца по дням в [since, until) (даты), включая пустые дни."""
+    rows = OwnerDailyStats.objects.filter(owner=owner, day__gte=since, day__lt=until).values_list(
+        'day', 'success', 'failed')
+    return _series(rows, since, until, DAY)
+
+
+def chart_data(series):
+    """Ряд в виде, готовом для графика: подписи и два массива значений."""
+    return {
+        'labels': [point['time'].isoformat() for point in series],
+        'success': [point['success'] for point in series],
+        'failed': [point['failed'] for point in series],
+    }
+
+
+def archived_rollups(since=None, directory=None):
+    """Архивные попытки с момента since по корзинам: (часовые, дневные) словари счётчиков.
+
+    Попытки удалённых рассылок пропускаются, владелец берётся из рассылки.
+    """
+    hourly = {}
+    for row in read_archive(since=since, directory=directory):
+        counter = hourly.setdefault((row['mailing_id'], hour_bucket(row['attempt_time'])), Counter())
+        counter[row['status']] += 1
+    mailings = Mailing.objects.only('owner').in_bulk({mailing_id for mailing_id, _ in hourly})
+    daily = {}
+    for (mailing_id, hour), counter in list(hourly.items()):
+        if mailing_id not in mailings:
+            del hourly[mailing_id, hour]
+            continue
+        daily.setdefault((mailings[mailing_id].owner_id, day_bucket(hour)), Counter()).update(counter)
+    return hourly, daily
+
+
+def rebuild_rollups(since=None, directory=None):
+    """Пересчитывает корзины с дня since (или все) по таблице попыток и архиву; возвращает (часов, дней)."""
+    attempts = MailingAttempt.objects.order_by()
+    hours = MailingHourlyStats.objects.all()
+    days = OwnerDailyStats.objects.all()
+    start = None
+    if since is not None:
+        start = datetime.combine(since, time.min, tzinfo=dt_timezone.utc)
+        attempts = attempts.filter(attempt_time__gte=start)
+        hours = hours.filter(hour__gte=start)
+        days = days.filter(day__gte=since)
+    counts = {
+        'success': Count('pk', filter=Q(status='success')),
+        'failed': Count('pk', filter=Q(status='failed')),
+    }
+    hourly = (
+        attempts.annotate(bucket=TruncHour('attempt_time', tzinfo=dt_timezone.utc))
+        .values_list('mailing_id', 'bucket')
+        .annotate(**counts)
+    )
+    daily = (
+        attempts.annotate(bucket=TruncDate('attempt_time', tzinfo=dt_timezone.utc))
+        .values_list('mailing__owner_id', 'bucket')
+        .annotate(**counts)
+    )
+    hourly_counts, daily_counts = archived_rollups(start, directory)
+    with transaction.atomic():
+        hours.delete()
+        days.delete()
+        for mailing_id, hour, success, failed in hourly.iterator(chunk_size=REBUILD_CHUNK_SIZE):
+            hourly_counts.setdefault((mailing_id, hour), Counter()).update(success=success, failed=failed)
+        for owner_id, day, success, failed in daily.iterator(chunk_size=REBUILD_CHUNK_SIZE):
+            daily_counts.setdefault((owner_id, day), Counter()).update(success=success, failed=failed)
+        hourly_rows = MailingHourlyStats.objects.bulk_create(
+            [MailingHourlyStats(mailing_id=mailing_id, hour=hour, success=counter['success'], failed=counter['failed'])
+             for (mailing_id, hour), counter in hourly_counts.items()],
+            batch_size=REBUILD_CHUNK_SIZE,
+        )
+        daily_rows = OwnerDailyStats.objects.bulk_create(
+            [OwnerDailyStats(owner_id=owner_id, day=day, success=counter['success'], failed=counter['failed'])
+             for (owner_id, day), counter in daily_counts.items()],
+            batch_size=REBUILD_CHUNK_SIZE,
+        )
+    return len(hourly_rows), len(daily_rows)
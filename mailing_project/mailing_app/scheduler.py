@@ -0,0 +1,137 @@
+import heapq
+import itertools
+import logging
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .jobs import cancel_jobs, enqueue_mailing
+from .lifecycle import advance_statuses, set_status
+from .models import Mailing, MailingJob
+
+logger = logging.getLogger(__name__)
+
+START = 'start'
+END = 'end'
+
+
+class MailingScheduler:
+    """Запускает и останавливает рассылки по start_time/end_time.
+
+    События старта и окончания лежат в min-heap. Из базы подгружается только
+    окно ближайших horizon событий (диапазонные запросы по индексам start_time и
+    end_time), а новые и изменённые рассылки подхватываются опросом по индексу
+    updated_at, без полного сканирования таблицы Mailing.
+
+    Устаревшие записи кучи не удаляются: у каждой рассылки хранится текущая
+    версия (start_time, end_time, is_active), и событие со старой версией при
+    извлечении просто пропускается.
+
+    Раз в status_interval статусы рассылок дополнительно сверяются с
+    расписанием (lifecycle.advance_statuses).
+    """
+
+    def __init__(self, horizon=timedelta(minutes=10), change_overlap=timedelta(seconds=5),
+                 status_interval=timedelta(minutes=1)):
+        self.horizon = horizon
+        self.change_overlap = change_overlap
+        self.status_interval = status_interval
+        self._statuses_advanced = None
+        self._heap = []
+        self._seq = itertools.count()
+        self._versions = {}
+        self._loaded_until = None
+        self._watermark = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    @staticmethod
+    def version(mailing):
+        return (mailing.start_time, mailing.end_time, mailing.is_active)
+
+    def _push(self, when, kind, mailing):
+        heapq.heappush(self._heap, (when, next(self._seq), kind, mailing.pk, self.version(mailing)))
+
+    def _track(self, mailing):
+        self._versions[mailing.pk] = self.version(mailing)
+
+    def bootstrap(self, now=None):
+        """Первичная загрузка: идущие сейчас рассылки и события ближайшего окна."""
+        now = now or timezone.now()
+        self._watermark = now
+        self._loaded_until = now
+        for mailing in Mailing.objects.filter(start_time__lte=now, end_time__gt=now):
+            self._track(mailing)
+            self._push(now, START, mailing)
+            self._push(mailing.end_time, END, mailing)
+        self.load_window(now)
+
+    def load_window(self, now):
+        until = now + self.horizon
+        if until <= self._loaded_until:
+            return
+        since = self._loaded_until
+        for mailing in Mailing.objects.filter(start_time__gt=since, start_time__lte=until):
+            self._track(mailing)
+            self._push(mailing.start_time, START, mailing)
+        for mailing in Mailing.objects.filter(end_time__gt=since, end_time__lte=until):
+            self._track(mailing)
+            self._push(mailing.end_time, END, mailing)
+        self._loaded_until = until
+
+    def poll_changes(self, now):
+        """Подхватывает рассылки, созданные или изменённые с прошлого опроса."""
+        changed = Mailing.objects.filter(updated_at__gt=self._watermark - self.change_overlap)
+        self._watermark = now
+        for mailing in changed:
+            if self._versions.get(mailing.pk) == self.version(mailing):
+                continue
+            self._track(mailing)
+            # События за пределами окна подгрузит load_window, когда до них дойдёт очередь.
+            if mailing.start_time <= self._loaded_until:
+                self._push(max(mailing.start_time, now), START, mailing)
+            if mailing.end_time <= self._loaded_until:
+                self._push(mailing.end_time, END, mailing)
+
+    def next_event_time(self):
+        return self._heap[0][0] if self._heap else None
+
+    def due_events(self, now):
+        while self._heap and self._heap[0][0] <= now:
+            when, _, kind, mailing_id, version = heapq.heappop(self._heap)
+            if self._versions.get(mailing_id) != version:
+                continue
+            if kind == END:
+                self._versions.pop(mailing_id, None)
+            yield kind, mailing_id
+
+    def fire(self, kind, mailing_id):
+        if kind == END:
+            set_status(mailing_id, Mailing.STATUS_FINISHED)
+            cancelled = cancel_jobs(mailing_id)
+            if cancelled:
+                logger.info('Рассылка #%s остановлена по end_time', mailing_id)
+            return
+        mailing = Mailing.objects.filter(pk=mailing_id, is_active=True).first()
+        if mailing is None:
+            return
+        set_status(mailing_id, Mailing.STATUS_RUNNING)
+        if mailing.jobs.exclude(status=MailingJob.STATUS_FAILED).exists():
+            return
+        job = enqueue_mailing(mailing)
+        logger.info('Рассылка #%s поставлена в очередь по start_time (задача #%s)', mailing_id, job.pk)
+
+    def tick(self, now=None):
+        """Один шаг планировщика; возвращает время ближайшего события."""
+        now = now or timezone.now()
+        if self._loaded_until is None:
+            self.bootstrap(now)
+        self.load_window(now)
+        self.poll_changes(now)
+        for kind, mailing_id in self.due_events(now):
+            self.fire(kind, mailing_id)
+        if self._statuses_advanced is None or now - self._statuses_advanced >= self.status_interval:
+            advance_statuses(now)
+            self._statuses_advanced = now
+        return self.next_event_time()
@@ -0,0 +1,148 @@
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Client
+
+CLIENT_TABLE = Client._meta.db_table
+FTS_TABLE = f'{CLIENT_TABLE}_fts'
+# Триграммный индекс находит подстроки не короче трёх символов.
+MIN_TERM_LENGTH = 3
+
+SQLITE_TRIGGERS = {
+    f'{FTS_TABLE}_ai': (
+        f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {CLIENT_TABLE} BEGIN '
+        f'INSERT INTO {FTS_TABLE} (rowid, email, full_name) VALUES (new.id, new.email, new.full_name); END'
+    ),
+    f'{FTS_TABLE}_ad': (
+        f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {CLIENT_TABLE} BEGIN '
+        f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, email, full_name) "
+        f"VALUES ('delete', old.id, old.email, old.full_name); END"
+    ),
+    f'{FTS_TABLE}_au': (
+        f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF email, full_name ON {CLIENT_TABLE} BEGIN '
+        f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, email, full_name) "
+        f"VALUES ('delete', old.id, old.email, old.full_name); "
+        f'INSERT INTO {FTS_TABLE} (rowid, email, full_name) VALUES (new.id, new.email, new.full_name); END'
+    ),
+}
+POSTGRES_INDEXES = {
+    f'{CLIENT_TABLE}_email_trgm': 'email',
+    f'{CLIENT_TABLE}_full_name_trgm': 'full_name',
+}
+
+
+def install_search_index(connection):
+    """Создаёт поисковый индекс клиентов, если его ещё нет; повторный вызов безопасен.
+
+    SQLite: внешняя FTS5-таблица с триграммным токенизатором поверх
+    mailing_app_client и триггеры, которые держат её в синхронизации при
+    любых INSERT/UPDATE/DELETE, включая bulk_create и удаление каскадом.
+    PostgreSQL: расширение pg_trgm и GIN-индексы по UPPER(email) и
+    UPPER(full_name) — именно так Django строит icontains.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute("SELECT name FROM sqlite_master WHERE name = %s OR type = 'trigger'", [FTS_TABLE])
+            existing = {name for name, in cursor.fetchall()}
+            if {FTS_TABLE, *SQLITE_TRIGGERS} <= existing:
+                return
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+                f"email, full_name, content='{CLIENT_TABLE}', content_rowid='id', tokenize='trigram')"
+            )
+            for sql in SQLITE_TRIGGERS.values():
+                cursor.execute(sql)
+            # Триггеры пропадают, когда миграция пересоздаёт таблицу клиентов, — индекс строится заново.
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+        elif connection.vendor == 'postgresql':
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            for name, column in POSTGRES_INDEXES.items():
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {name} ON {CLIENT_TABLE} USING gin (UPPER({column}::text) gin_trgm_ops)'
+                )
+
+
+def uninstall_search_index(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+        elif connection.vendor == 'postgresql':
+            for name in POSTGRES_INDEXES:
+                cursor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+def rebuild_search_index():
+    uninstall_search_index(connection)
+    install_search_index(connection)
+
+
+def search_terms(query):
+    return [term for term in query.split() if len(term) >= MIN_TERM_LENGTH]
+
+
+def fts_query(terms):
+    # Каждое слово — отдельная фраза в кавычках: все должны встретиться как подстроки.
+    return ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def prefix_filter(query):
+    return Q(email__istartswith=query) | Q(full_name__istartswith=query)
+
+
+def filter_clients(queryset, query):
+    """Сужает queryset до клиентов, чьи email или имя содержат все слова query.
+
+    Без ранжирования — для админки и списков со своей сортировкой. Слова
+    короче трёх символов индекс не находит: если других нет, ищется
+    совпадение с началом email или имени без индекса.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset.filter(prefix_filter(query.strip()))
+    if connection.vendor == 'sqlite':
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [fts_query(terms)],
+        ))
+    condition = Q()
+    for term in terms:
+        condition &= Q(email__icontains=term) | Q(full_name__icontains=term)
+    return queryset.filter(condition)
+
+
+def search_clients(query, owner=None, limit=20, offset=0):
+    """Страница клиентов по query, лучшие совпадения первыми.
+
+    Возвращает (клиенты, есть ли ещё). SQLite ранжирует по bm25 из FTS5,
+    PostgreSQL — по триграммному сходству; без query клиенты идут по email.
+    """
+    clients = Client.objects.all() if owner is None else Client.objects.owned_by(owner)
+    terms = search_terms(query)
+    if terms and connection.vendor == 'sqlite':
+        sql = (
+            f'SELECT c.id FROM {FTS_TABLE} f JOIN {CLIENT_TABLE} c ON c.id = f.rowid '
+            f'WHERE {FTS_TABLE} MATCH %s' + (' AND c.owner_id = %s' if owner is not None else '') +
+            ' ORDER BY f.rank, c.id LIMIT %s OFFSET %s'
+        )
+        params = [fts_query(terms)] + ([owner.pk] if owner is not None else []) + [limit + 1, offset]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            ids = [pk for pk, in cursor.fetchall()]
+        found = clients.in_bulk(ids[:limit])
+        rows = [found[pk] for pk in ids[:limit] if pk in found]
+        return rows, len(ids) > limit
+    if terms and connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramSimilarity
+        from django.db.models.functions import Greatest
+
+        ordered = filter_clients(clients, query).annotate(
+            rank=Greatest(TrigramSimilarity('email', query), TrigramSimilarity('full_name', query)),
+        ).order_by('-rank', 'pk')
+    elif query.strip():
+        ordered = filter_clients(clients, query).order_by('email', 'pk')
+    else:
+        ordered = clients.order_by('email', 'pk')
+    rows = list(ordered[offset:offset + limit + 1])
+    return rows[:limit], len(rows) > limit
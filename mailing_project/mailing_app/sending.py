@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from .attempt_log import AttemptWriter
+from .jobs import finish_job, heartbeat, requeue_job, should_stop, slice_size
+from .models import Mailing, MailingJob
+from .ratelimit import get_limiter
+from .recipients import RecipientStream
+from .retries import new_retry
+from .smtp_pool import get_pool, is_transient
+
+
+def send_batch(mailing, recipients, pool, writer, limiter=None):
+    """Отправляет пачку получателей с учётом лимитов скорости.
+
+    Получатели, упёршиеся в лимит домена или отправителя, ждут следующего окна.
+    Попытки записываются только когда отправлена вся пачка, чтобы контрольная
+    точка рассылки не обогнала отложенных получателей.
+    """
+    results = {}
+    pending = list(recipients)
+    while pending:
+        if limiter is None:
+            allowed, pending, wait = pending, [], 0
+        else:
+            allowed, pending, wait = limiter.partition(mailing.email, pending)
+        if allowed:
+            errors = pool.send_batch([mailing.build_email(recipient.email) for recipient in allowed])
+            results.update(zip((recipient.pk for recipient in allowed), errors))
+        if pending:
+            time.sleep(wait)
+    record_results(mailing, recipients, [results[recipient.pk] for recipient in recipients], writer)
+
+
+def record_results(mailing, recipients, errors, writer):
+    for recipient, error in zip(recipients, errors):
+        retry = None
+        if error is None:
+            status = 'success'
+            server_response = 'Письмо отправлено успешно.'
+        else:
+            status = 'failed'
+            server_response = str(error)
+            if is_transient(error):
+                retry = new_retry(mailing, recipient.pk, error)
+
+        writer.add(
+            retry=retry,
+            mailing=mailing,
+            client_id=recipient.pk,
+            status=status,
+            server_response=server_response,
+        )
+
+
+def job_progress(job):
+    """Колбэк AttemptWriter: после записи попыток двигает счётчики задачи и контрольную точку рассылки."""
+    def on_flush(attempts):
+        for attempt in attempts:
+            if attempt.status == 'success':
+                job.sent += 1
+            else:
+                job.failed += 1
+        MailingJob.objects.filter(pk=job.pk).update(sent=job.sent, failed=job.failed, heartbeat_at=timezone.now())
+        checkpoint = max(attempt.client_id for attempt in attempts)
+        Mailing.objects.filter(pk=job.mailing_id, send_checkpoint__lt=checkpoint).update(send_checkpoint=checkpoint)
+    return on_flush
+
+
+def run_job(job, pool=None):
+    """Отправляет рассылку задачи пачками через пул SMTP-соединений.
+
+    Отправка продолжается с контрольной точки рассылки и пропускает получателей,
+    которым уже была попытка, так что перезапуск упавшей задачи не шлёт письма
+    повторно (кроме последней незаписанной пачки). Отправив свою долю писем
+    (slice_size), задача возвращается в очередь и уступает воркер другим владельцам.
+    """
+    pool = pool or get_pool()
+    limiter = get_limiter()
+    batch_size = settings.MAILING_SEND_BATCH_SIZE
+    mailing = job.mailing
+    recipients = RecipientStream(mailing, batch_size)
+    processed_before = job.sent + job.failed
+    share = slice_size(job)
+
+    stopped = yielded = False
+    try:
+        with AttemptWriter(on_flush=job_progress(job)) as writer:
+            for batch in recipients:
+                if should_stop(job):
+                    stopped = True
+                    break
+                send_batch(mailing, batch, pool, writer, limiter)
+                job.total = processed_before + recipients.count
+                heartbeat(job)
+                if recipients.count >= share:
+                    yielded = True
+                    break
+    except Exception as e:
+        finish_job(job, MailingJob.STATUS_FAILED, error=str(e))
+        raise
+
+    if yielded:
+        requeue_job(job)
+    else:
+        finish_job(job, MailingJob.STATUS_CANCELLED if stopped else MailingJob.STATUS_DONE)
+    return job
+
+
+def dispatch_job(job, mode=None):
+    """Выполняет задачу в режиме отправки, выбранном для развёртывания."""
+    mode = mode or settings.MAILING_DISPATCH_MODE
+    if mode == 'async':
+        from .async_sending import run_job_async
+        return asyncio.run(run_job_async(job))
+    return run_job(job)
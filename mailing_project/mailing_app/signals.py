@@ -0,0 +1,44 @@
+from django.db import connections
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete
+from django.dispatch import receiver
+
+from .dashboard import invalidate_dashboard
+from .models import Client, Mailing, MailingStats, OwnerStats
+from .rollups import forget_mailing
+from .search import install_search_index
+from .stats import bump
+
+
+@receiver(post_save, sender=Mailing)
+def count_new_mailing(sender, instance, created, **kwargs):
+    if created:
+        bump(OwnerStats, {'owner_id': instance.owner_id}, mailings=1)
+
+
+@receiver(pre_delete, sender=Mailing)
+def discount_deleted_mailing(sender, instance, **kwargs):
+    # Попытки удаляются каскадом вместе с рассылкой — вычитаем их из итогов и дневных корзин владельца.
+    stats = MailingStats.objects.filter(mailing_id=instance.pk).first()
+    bump(
+        OwnerStats,
+        {'owner_id': instance.owner_id},
+        mailings=-1,
+        success=-stats.success if stats else 0,
+        failed=-stats.failed if stats else 0,
+    )
+    forget_mailing(instance)
+
+
+@receiver(post_save, sender=Mailing)
+@receiver(post_delete, sender=Mailing)
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def reset_dashboard(sender, **kwargs):
+    invalidate_dashboard()
+
+
+@receiver(post_migrate)
+def restore_search_index(sender, using, **kwargs):
+    # Миграция, пересоздающая таблицу клиентов в SQLite, теряет триггеры поискового индекса.
+    if sender.label == 'mailing_app':
+        install_search_index(connections[using])
@@ -0,0 +1,146 @@
+import queue
+import smtplib
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError)
+# Ошибки, после которых SMTP-сессия остаётся рабочей.
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+def is_transient(error):
+    """Временная ли ошибка отправки: 4xx-ответы SMTP и сетевые сбои повторяем, 5xx — нет."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return bool(codes) and all(400 <= code < 500 for code in codes)
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return isinstance(error, (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError))
+
+
+class PooledConnection:
+    """Долгоживущее соединение почтового бэкенда с подсчётом отправленных писем."""
+
+    def __init__(self, backend=None, **kwargs):
+        self.backend = get_connection(backend, fail_silently=False, **kwargs)
+        self.sent = 0
+        self.backend.open()
+
+    def reconnect(self):
+        self.backend.close()
+        self.backend.open()
+
+    def send(self, message):
+        try:
+            self.backend.send_messages([message])
+        except RECONNECT_ERRORS:
+            # Сервер закрыл сессию (таймаут простоя, лимит писем на сессию) —
+            # переподключаемся и повторяем письмо один раз.
+            self.reconnect()
+            self.backend.send_messages([message])
+        self.sent += 1
+
+    def close(self):
+        try:
+            self.backend.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Ограниченный пул SMTP-соединений, общий для потоков одного процесса.
+
+    Соединение возвращается в пул после пачки писем и закрывается, когда
+    через него прошло max_messages писем, чтобы не упираться в лимиты сервера
+    на одну сессию.
+    """
+
+    def __init__(self, size=None, max_messages=None, backend=None, **kwargs):
+        self.size = size or settings.MAILING_SMTP_POOL_SIZE
+        self.max_messages = max_messages or settings.MAILING_SMTP_MAX_MESSAGES_PER_CONNECTION
+        self.backend = backend
+        self.kwargs = kwargs
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self.opened = 0
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        conn = None
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = PooledConnection(self.backend, **self.kwargs)
+                self.opened += 1
+            yield conn
+        except Exception:
+            if conn is not None:
+                conn.close()
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                if conn.sent >= self.max_messages:
+                    conn.close()
+                else:
+                    self._idle.put(conn)
+            self._slots.release()
+
+    def send_batch(self, messages):
+        """Отправляет пачку писем через одно соединение.
+
+        Возвращает список ошибок той же длины, что и messages: None для
+        доставленного письма, иначе исключение. Ошибка одного получателя не
+        прерывает отправку остальной пачки.
+        """
+        errors = []
+        pending = list(messages)
+        while pending:
+            try:
+                with self.connection() as conn:
+                    while pending and conn.sent < self.max_messages:
+                        try:
+                            conn.send(pending[0])
+                        except MESSAGE_ERRORS as e:
+                            errors.append(e)
+                        else:
+                            errors.append(None)
+                        pending.pop(0)
+            except Exception as e:
+                # Соединение не открылось или сломалось без восстановления:
+                # письмо считаем неотправленным, соединение выбрасываем из пула.
+                errors.append(e)
+                pending.pop(0)
+        return errors
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
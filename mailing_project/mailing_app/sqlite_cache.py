@@ -0,0 +1,202 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL, accessed REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+]
+# Время последнего чтения обновляется не чаще раза в столько секунд, чтобы get
+# почти всегда обходился без записи.
+TOUCH_GRANULARITY = 1.0
+# Проверка переполнения — раз в столько записей одного соединения.
+CULL_EVERY = 100
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite в режиме WAL, общий для всех процессов на одном хосте.
+
+    LOCATION — путь к файлу базы. Поддерживает TTL, атомарные incr/decr (целые
+    числа хранятся как INTEGER и меняются одним UPDATE под блокировкой записи),
+    версии ключей (VERSION, incr_version) и вытеснение давно не читавшихся
+    ключей (LRU) при превышении OPTIONS['MAX_ENTRIES']: раз в CULL_EVERY записей
+    удаляются истёкшие ключи, а затем 1/CULL_FREQUENCY самых старых по чтению.
+
+    Соединения открываются отдельно в каждом потоке и заново после fork.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        self._local = threading.local()
+
+    # Соединение
+
+    def _connection(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            local.connection, local.pid, local.writes = connection, os.getpid(), 0
+        return local.connection
+
+    def _write(self, statements):
+        """Выполняет пары (sql, params) одной транзакцией BEGIN IMMEDIATE.
+
+        Возвращает (rowcount, строки) последнего запроса.
+        """
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            for sql, params in statements:
+                cursor = connection.execute(sql, params)
+            result = cursor.rowcount, cursor.fetchall()
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        self._local.writes += 1
+        if self._local.writes % CULL_EVERY == 0:
+            self._cull()
+        return result
+
+    # Значения
+
+    @staticmethod
+    def _encode(value):
+        # bool — подкласс int, но должен вернуться как bool, поэтому идёт через pickle.
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    # API кэша
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        row = self._connection().execute(
+            'SELECT value, accessed FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, now),
+        ).fetchone()
+        if row is None:
+            return default
+        value, accessed = row
+        if accessed < now - TOUCH_GRANULARITY:
+            self._connection().execute('UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+        return self._decode(value)
+
+    def get_many(self, keys, version=None):
+        keys = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not keys:
+            return {}
+        now = time.time()
+        placeholders = ', '.join('?' * len(keys))
+        rows = self._connection().execute(
+            f'SELECT key, value FROM cache WHERE key IN ({placeholders}) AND (expires IS NULL OR expires > ?)',
+            (*keys, now),
+        ).fetchall()
+        return {keys[key]: self._decode(value) for key, value in rows}
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._connection().execute(
+            'SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, time.time()),
+        ).fetchone() is not None
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._write([(
+            'INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+            (key, self._encode(value), self.get_backend_timeout(timeout), time.time()),
+        )])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if not data:
+            return []
+        expires, now = self.get_backend_timeout(timeout), time.time()
+        self._write([
+            ('INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+             (self.make_and_validate_key(key, version=version), self._encode(value), expires, now))
+            for key, value in data.items()
+        ])
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        changed, _ = self._write([(
+            'INSERT INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires, '
+            'accessed = excluded.accessed WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            (key, self._encode(value), self.get_backend_timeout(timeout), now, now),
+        )])
+        return changed > 0
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        changed, _ = self._write([(
+            'UPDATE cache SET expires = ?, accessed = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), now, key, now),
+        )])
+        return changed > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        _, rows = self._write([
+            ('UPDATE cache SET value = value + ?, accessed = ? '
+             "WHERE key = ? AND typeof(value) = 'integer' AND (expires IS NULL OR expires > ?)",
+             (delta, now, key, now)),
+            ('SELECT value FROM cache WHERE key = ? AND changes() > 0', (key,)),
+        ])
+        if not rows:
+            raise ValueError(f"Key '{key}' not found or not an integer")
+        return rows[0][0]
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        changed, _ = self._write([('DELETE FROM cache WHERE key = ?', (key,))])
+        return changed > 0
+
+    def delete_many(self, keys, version=None):
+        if not keys:
+            return
+        self._write([
+            ('DELETE FROM cache WHERE key = ?', (self.make_and_validate_key(key, version=version),))
+            for key in keys
+        ])
+
+    def clear(self):
+        self._write([('DELETE FROM cache', ())])
+
+    def _cull(self):
+        """Удаляет истёкшие ключи, а при переполнении — давно не читавшиеся."""
+        connection = self._connection()
+        connection.execute('DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            excess = count - self._max_entries + self._max_entries // max(self._cull_frequency, 1)
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)', (excess,),
+            )
+
+    def close(self, **kwargs):
+        # Соединение живёт весь поток: открывать файл заново на каждый запрос дороже.
+        pass
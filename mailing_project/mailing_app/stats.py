@@ -0,0 +1,105 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from .archive import read_archive
+from .models import Mailing, MailingStats, OwnerStats
+
+REBUILD_CHUNK_SIZE = 5000
+
+
+def bump(model, lookup, **deltas):
+    """Атомарно прибавляет deltas к счётчикам строки lookup через F-выражения.
+
+    Строка создаётся, только если хотя бы один счётчик растёт: уменьшение
+    отсутствующих счётчиков (например, при каскадном удалении владельца) не
+    должно создавать новые строки.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**lookup).update(**updates):
+        return
+    if not any(delta > 0 for delta in deltas.values()):
+        return
+    _, created = model.objects.get_or_create(
+        **lookup, defaults={field: max(delta, 0) for field, delta in deltas.items()}
+    )
+    if not created:
+        model.objects.filter(**lookup).update(**updates)
+
+
+def record_attempts(attempts):
+    """Учитывает в счётчиках только что записанные попытки: по одному UPDATE на рассылку и владельца."""
+    by_mailing = {}
+    owners = {}
+    for attempt in attempts:
+        counter = by_mailing.setdefault(attempt.mailing_id, Counter())
+        counter[attempt.status] += 1
+        owners[attempt.mailing_id] = attempt.mailing.owner_id
+    by_owner = {}
+    for mailing_id, counter in by_mailing.items():
+        bump(MailingStats, {'mailing_id': mailing_id, 'owner_id': owners[mailing_id]},
+             success=counter['success'], failed=counter['failed'])
+        by_owner.setdefault(owners[mailing_id], Counter()).update(counter)
+    for owner_id, counter in by_owner.items():
+        bump(OwnerStats, {'owner_id': owner_id}, success=counter['success'], failed=counter['failed'])
+
+
+def record_delivered_retries(mailing, count):
+    """Переносит count попыток рассылки из неудачных в успешные после удачного повтора."""
+    bump(MailingStats, {'mailing_id': mailing.pk, 'owner_id': mailing.owner_id}, success=count, failed=-count)
+    bump(OwnerStats, {'owner_id': mailing.owner_id}, success=count, failed=-count)
+
+
+def owner_stats(owner):
+    """Счётчики владельца одним запросом по первичному ключу; нули, если он ещё ничего не отправлял."""
+    return OwnerStats.objects.filter(owner=owner).first() or OwnerStats(owner=owner)
+
+
+def archived_counts(directory=None):
+    """Попытки из архива по рассылкам: {mailing_id: Counter(success=..., failed=...)}."""
+    counts = {}
+    for row in read_archive(directory=directory):
+        counts.setdefault(row['mailing_id'], Counter())[row['status']] += 1
+    return counts
+
+
+def rebuild_stats(directory=None):
+    """Пересчитывает все счётчики с нуля по таблице попыток и архиву; возвращает (рассылок, владельцев).
+
+    Архивные попытки удалённых рассылок не учитываются — как и при удалении
+    рассылки, её попытки вычитаются из счётчиков владельца.
+    """
+    archived = archived_counts(directory)
+    per_mailing = (
+        Mailing.objects.order_by()
+        .values_list('pk', 'owner_id')
+        .annotate(
+            success=Count('attempts', filter=Q(attempts__status='success')),
+            failed=Count('attempts', filter=Q(attempts__status='failed')),
+        )
+    )
+    owners = {}
+    with transaction.atomic():
+        MailingStats.objects.all().delete()
+        OwnerStats.objects.all().delete()
+        chunk = []
+        mailings = 0
+        for mailing_id, owner_id, success, failed in per_mailing.iterator(chunk_size=REBUILD_CHUNK_SIZE):
+            extra = archived.get(mailing_id, Counter())
+            success += extra['success']
+            failed += extra['failed']
+            chunk.append(MailingStats(mailing_id=mailing_id, owner_id=owner_id, success=success, failed=failed))
+            owners.setdefault(owner_id, Counter()).update(mailings=1, success=success, failed=failed)
+            if len(chunk) >= REBUILD_CHUNK_SIZE:
+                mailings += len(MailingStats.objects.bulk_create(chunk))
+                chunk = []
+        mailings += len(MailingStats.objects.bulk_create(chunk))
+        OwnerStats.objects.bulk_create(
+            [OwnerStats(owner_id=owner_id, **counter) for owner_id, counter in owners.items()],
+            batch_size=REBUILD_CHUNK_SIZE,
+        )
+    return mailings, len(owners)
@@ -0,0 +1,26 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+class TestRunner(DiscoverRunner):
+    """Прогон тестов с кэшем в памяти процесса.
+
+    Общий кэш в файле SQLite читают и пишут воркеры развёрнутого сайта, поэтому
+    тесты с их cache.clear() и сбросами кэша из сигналов не должны его трогать.
+    Тесты самого SQLiteCache создают его во временном файле.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.caches_override = override_settings(CACHES=TEST_CACHES)
+        self.caches_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.caches_override.disable()
+        super().teardown_test_environment(**kwargs)
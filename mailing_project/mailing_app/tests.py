@@ -1,3 +1,1219 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from users.models import CustomUser
+from .archive import archive_attempts, archived_months, month_of, read_archive
+from .attempt_log import AttemptWriter, get_metrics
+from .benchmarks.smtp import SMTP_BACKEND, build_messages
+from .benchmarks.smtp_server import StandInSMTPServer
+from .exports import ATTEMPT_COLUMNS, attempt_rows, render
+from .forms import MailingForm
+from .imports import import_clients, process_next_import
+from .jobs import claim_job, enqueue_mailing
+from .lifecycle import advance_statuses, set_status
+from .pagination import keyset_filter
+from .models import (
+    AttemptRetry, Client, ClientImport, Mailing, MailingAttempt, MailingHourlyStats, MailingJob, MailingStats,
+    Message, OwnerDailyStats, OwnerShare, OwnerStats, Segment,
+)
+from .ratelimit import RateLimiter
+from .recipients import RecipientStream
+from .retries import new_retry, process_due_retries
+from .rollups import record_delivered_rollups
+from .scheduler import MailingScheduler
+from .search import search_clients
+from .sending import dispatch_job, run_job
+from .smtp_pool import ConnectionPool
+from .sqlite_cache import SQLiteCache
+from .stats import record_delivered_retries
+
+
+def create_active_mailing(owner, recipients):
+    now = timezone.now()
+    mailing = Mailing.objects.create(
+        owner=owner,
+        email='sender@example.com',
+        start_time=now + timedelta(minutes=1),
+        end_time=now + timedelta(hours=1),
+        message='Текст рассылки',
+    )
+    Mailing.objects.filter(pk=mailing.pk).update(start_time=now - timedelta(minutes=1), status=Mailing.STATUS_RUNNING)
+    mailing.refresh_from_db()
+    mailing.recipients.set(recipients)
+    return mailing
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class MailingQueueTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        self.clients = [
+            Client.objects.create(owner=self.owner, email=f'client{i}@example.com', full_name=f'Клиент {i}')
+            for i in range(3)
+        ]
+        self.mailing = create_active_mailing(self.owner, self.clients)
+
+    def test_send_view_only_enqueues(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('mailing_app:mailings-send', args=[self.mailing.pk]))
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(mail.outbox), 0)
+        job = MailingJob.objects.get(mailing=self.mailing)
+        self.assertEqual(job.status, MailingJob.STATUS_PENDING)
+
+        status = self.client.get(reverse('mailing_app:mailings-job-status', args=[job.pk])).json()
+        self.assertEqual(status['status'], MailingJob.STATUS_PENDING)
+
+    def test_claim_job_is_exclusive(self):
+        job = enqueue_mailing(self.mailing)
+
+        claimed = claim_job('worker-a')
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual(claimed.status, MailingJob.STATUS_RUNNING)
+        self.assertIsNone(claim_job('worker-b'))
+
+    def test_run_job_sends_and_records_attempts(self):
+        enqueue_mailing(self.mailing)
+        job = run_job(claim_job('worker'))
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual((job.total, job.sent, job.failed), (3, 3, 0))
+        self.assertEqual(MailingJob.objects.get(pk=job.pk).status, MailingJob.STATUS_DONE)
+        self.assertEqual(MailingAttempt.objects.filter(mailing=self.mailing, status='success').count(), 3)
+
+    def test_enqueue_is_idempotent_while_job_is_active(self):
+        first = enqueue_mailing(self.mailing)
+        self.assertEqual(enqueue_mailing(self.mailing).pk, first.pk)
+
+    def test_resumes_from_checkpoint_without_resending(self):
+        MailingAttempt.objects.create(mailing=self.mailing, client=self.clients[0], status='success')
+        Mailing.objects.filter(pk=self.mailing.pk).update(send_checkpoint=self.clients[0].pk)
+        for _ in range(2):
+            enqueue_mailing(self.mailing)
+            run_job(claim_job('worker'))
+
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['client1@example.com', 'client2@example.com'])
+        self.assertEqual(MailingAttempt.objects.filter(mailing=self.mailing).count(), 3)
+        self.mailing.refresh_from_db()
+        self.assertEqual(self.mailing.send_checkpoint, self.clients[-1].pk)
+
+
+class RecipientStreamTests(TestCase):
+    def setUp(self):
+        owner = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        self.clients = [
+            Client.objects.create(owner=owner, email=f'client{i}@example.com', full_name=f'Клиент {i}')
+            for i in range(7)
+        ]
+        self.mailing = create_active_mailing(owner, self.clients)
+        MailingAttempt.objects.create(mailing=self.mailing, client=self.clients[2], status='success')
+
+    def test_walks_recipients_by_keyset_skipping_attempted(self):
+        stream = RecipientStream(self.mailing, 3)
+        chunks = [[recipient.pk for recipient in chunk] for chunk in stream]
+
+        expected = [client.pk for client in self.clients if client != self.clients[2]]
+        self.assertEqual(chunks, [expected[:3], expected[3:6]])
+        self.assertEqual(stream.count, 6)
+        self.assertEqual(stream.next_chunk(), [])
+
+    def test_resumes_from_send_checkpoint(self):
+        Mailing.objects.filter(pk=self.mailing.pk).update(send_checkpoint=self.clients[3].pk)
+        stream = RecipientStream(self.mailing, 10)
+
+        chunk = stream.next_chunk()
+        self.assertEqual([recipient.email for recipient in chunk], ['client4@example.com', 'client5@example.com',
+                                                                   'client6@example.com'])
+        self.assertEqual(stream.cursor, self.clients[-1].pk)
+
+    def segment_mailing(self, size):
+        owner = CustomUser.objects.create_user(email=f'owner{size}@example.com', password='pass')
+        clients = Client.objects.bulk_create([
+            Client(owner=owner, email=f'c{size}-{i}@corp.ru', full_name='К') for i in range(size)
+        ])
+        mailing = create_active_mailing(owner, clients[::2])
+        Mailing.objects.filter(pk=mailing.pk).update(
+            segment=Segment.objects.create(owner=owner, name='Корп', email_domain='corp.ru'),
+        )
+        mailing.refresh_from_db()
+        return mailing, [client.pk for client in clients]
+
+    def chunk_cost(self, mailing, cursor):
+        """Число шагов виртуальной машины SQLite (в сотнях) на запросы одной пачки."""
+        steps = []
+        stream = RecipientStream(mailing, 20, cursor=cursor)
+        connection.ensure_connection()
+        connection.connection.set_progress_handler(lambda: steps.append(1), 100)
+        try:
+            self.assertEqual(len(stream.next_chunk()), 20)
+        finally:
+            connection.connection.set_progress_handler(None, 100)
+        return len(steps)
+
+    def test_chunk_cost_does_not_grow_with_list_or_cursor(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Стоимость запроса считается шагами SQLite')
+        small, _ = self.segment_mailing(40)
+        large, pks = self.segment_mailing(2000)
+        baseline = self.chunk_cost(small, 0)
+
+        self.assertLess(self.chunk_cost(large, 0), baseline * 2)
+        self.assertLess(self.chunk_cost(large, pks[-41]), baseline * 2)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class MailingWorkerCommandTests(TransactionTestCase):
+    def test_workers_drain_queue(self):
+        owner = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        clients = [
+            Client.objects.create(owner=owner, email=f'client{i}@example.com', full_name=f'Клиент {i}')
+            for i in range(3)
+        ]
+        for _ in range(2):
+            enqueue_mailing(create_active_mailing(owner, clients))
+
+        call_command('run_mailing_workers', workers=1, once=True, stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 6)
+        self.assertFalse(MailingJob.objects.exclude(status=MailingJob.STATUS_DONE).exists())
+
+
+class ConnectionPoolTests(TestCase):
+    def make_pool(self, server, **kwargs):
+        return ConnectionPool(backend=SMTP_BACKEND, host=server.host, port=server.port,
+                              use_tls=False, use_ssl=False, username='', password='', **kwargs)
+
+    def test_connections_are_reused_and_capped(self):
+        with StandInSMTPServer() as server:
+            pool = self.make_pool(server, size=1, max_messages=5)
+            errors = pool.send_batch(build_messages(12))
+            pool.close()
+
+        self.assertEqual(errors, [None] * 12)
+        self.assertEqual(server.messages, 12)
+        self.assertEqual(pool.opened, 3)
+
+    def test_reconnects_after_server_disconnect(self):
+        with StandInSMTPServer(max_messages_per_session=2) as server:
+            pool = self.make_pool(server, size=1, max_messages=100)
+            errors = pool.send_batch(build_messages(5))
+            pool.close()
+
+        self.assertEqual(errors, [None] * 5)
+        self.assertEqual(server.messages, 5)
+        self.assertEqual(server.sessions, 3)
+
+
+class AttemptWriterTests(TestCase):
+    def setUp(self):
+        owner = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        self.mailing = create_active_mailing(owner, [])
+
+    def test_flushes_by_size_and_on_close(self):
+        flushed = []
+        with AttemptWriter(max_size=3, max_delay=60, on_flush=lambda batch: flushed.append(len(batch))) as writer:
+            for _ in range(7):
+                writer.add(mailing=self.mailing, status='success')
+            self.assertEqual(MailingAttempt.objects.count(), 6)
+
+        self.assertEqual(MailingAttempt.objects.count(), 7)
+        self.assertEqual(flushed, [3, 3, 1])
+
+    def test_failed_flush_keeps_buffer(self):
+        writer = AttemptWriter(max_size=10, max_delay=60)
+        writer.add(mailing=self.mailing, status='success')
+        writer.add(mailing=self.mailing, status='failed')
+
+        with mock.patch.object(MailingAttempt.objects, 'bulk_create', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                writer.flush()
+        self.assertEqual(len(writer), 2)
+
+        writer.flush()
+        self.assertEqual(len(writer), 0)
+        self.assertEqual(MailingAttempt.objects.count(), 2)
+
+    def test_resent_duplicates_are_not_reported(self):
+        clients = [
+            Client.objects.create(owner=self.mailing.owner, email=f'client{i}@example.com', full_name=f'Клиент {i}')
+            for i in range(3)
+        ]
+        MailingAttempt.objects.create(mailing=self.mailing, client=clients[0], status='success')
+        flushed = []
+        before = get_metrics()['rows']
+        with AttemptWriter(max_size=10, max_delay=60, on_flush=flushed.append) as writer:
+            for client in clients:
+                writer.add(mailing=self.mailing, client_id=client.pk, status='success')
+
+        self.assertEqual([[attempt.client_id for attempt in batch] for batch in flushed],
+                         [[clients[1].pk, clients[2].pk]])
+        self.assertEqual(get_metrics()['rows'] - before, 2)
+
+
+class AsyncDispatchTests(TransactionTestCase):
+    def test_async_mode_sends_concurrently(self):
+        owner = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        clients = [
+            Client.objects.create(owner=owner, email=f'client{i}@example.com', full_name=f'Клиент {i}')
+            for i in range(30)
+        ]
+        enqueue_mailing(create_active_mailing(owner, clients))
+
+        with StandInSMTPServer(latency=0.01) as server:
+            with self.settings(EMAIL_BACKEND=SMTP_BACKEND, EMAIL_HOST=server.host, EMAIL_PORT=server.port,
+                               MAILING_ASYNC_CONCURRENCY=5):
+                job = dispatch_job(claim_job('worker'), mode='async')
+
+        self.assertEqual(server.messages, 30)
+        self.assertGreater(server.peak_sessions, 1)
+        self.assertEqual((job.sent, job.failed), (30, 0))
+        self.assertEqual(MailingAttempt.objects.filter(status='success').count(), 30)
+
+
+class MailingSchedulerTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        self.now = timezone.now()
+
+    def create_mailing(self, start, end):
+        return Mailing.objects.create(owner=self.owner, email='sender@example.com',
+                                      start_time=start, end_time=end, message='Текст')
+
+    def test_starts_and_stops_mailing(self):
+        mailing = self.create_mailing(self.now + timedelta(minutes=1), self.now + timedelta(minutes=5))
+        scheduler = MailingScheduler(horizon=timedelta(minutes=10))
+
+        scheduler.tick(self.now)
+        self.assertFalse(mailing.jobs.exists())
+
+        scheduler.tick(self.now + timedelta(minutes=2))
+        job = mailing.jobs.get()
+        self.assertEqual(job.status, MailingJob.STATUS_PENDING)
+        mailing.refresh_from_db()
+        self.assertEqual(mailing.status, Mailing.STATUS_RUNNING)
+
+        scheduler.tick(self.now + timedelta(minutes=6))
+        job.refresh_from_db()
+        self.assertEqual(job.status, MailingJob.STATUS_CANCELLED)
+        self.assertEqual(len(scheduler), 0)
+        mailing.refresh_from_db()
+        self.assertEqual(mailing.status, Mailing.STATUS_FINISHED)
+
+    def test_advance_statuses_follows_schedule(self):
+        created = self.create_mailing(self.now + timedelta(minutes=1), self.now + timedelta(minutes=5))
+        stopped = self.create_mailing(self.now + timedelta(minutes=1), self.now + timedelta(minutes=5))
+        Mailing.objects.filter(pk=stopped.pk).update(is_active=False)
+        self.assertEqual(created.status, Mailing.STATUS_CREATED)
+
+        moved = advance_statuses(self.now + timedelta(minutes=2))
+        self.assertEqual(moved, {'stopped': 1, 'finished': 0, 'running': 1})
+        advance_statuses(self.now + timedelta(minutes=6))
+
+        self.assertEqual(
+            dict(Mailing.objects.values_list('pk', 'status')),
+            {created.pk: Mailing.STATUS_FINISHED, stopped.pk: Mailing.STATUS_STOPPED},
+        )
+        self.assertFalse(set_status(created.pk, Mailing.STATUS_RUNNING))
+
+    def test_picks_up_new_and_edited_mailings(self):
+        scheduler = MailingScheduler(horizon=timedelta(minutes=10))
+        scheduler.tick(self.now)
+
+        mailing = self.create_mailing(self.now + timedelta(minutes=3), self.now + timedelta(minutes=30))
+        scheduler.tick(self.now + timedelta(seconds=1))
+        mailing.start_time = self.now + timedelta(minutes=8)
+        mailing.save()
+        scheduler.tick(self.now + timedelta(seconds=2))
+
+        scheduler.tick(self.now + timedelta(minutes=4))
+        self.assertFalse(mailing.jobs.exists())
+        scheduler.tick(self.now + timedelta(minutes=9))
+        self.assertTrue(mailing.jobs.exists())
+
+
+class RetryTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        self.clients = [
+            Client.objects.create(owner=self.owner, email=f'client{i}@example.com', full_name=f'Клиент {i}')
+            for i in range(3)
+        ]
+        self.mailing = create_active_mailing(self.owner, self.clients)
+
+    def smtp_pool(self, server):
+        return ConnectionPool(backend=SMTP_BACKEND, host=server.host, port=server.port,
+                              use_tls=False, use_ssl=False, username='', password='')
+
+    def make_due(self):
+        AttemptRetry.objects.update(due_at=timezone.now() - timedelta(seconds=1))
+
+    def test_transient_failures_are_retried(self):
+        rejections = {'client1@example.com': '451 Try again later', 'client2@example.com': '550 No such user'}
+        with StandInSMTPServer(rejections=rejections) as server:
+            enqueue_mailing(self.mailing)
+            run_job(claim_job('worker'), pool=self.smtp_pool(server))
+
+        retry = AttemptRetry.objects.get()
+        self.assertEqual(retry.client, self.clients[1])
+        self.assertGreater(retry.due_at, timezone.now())
+        self.assertEqual(process_due_retries(), 0)
+
+        self.make_due()
+        with StandInSMTPServer() as server:
+            self.assertEqual(process_due_retries(pool=self.smtp_pool(server)), 1)
+
+        self.assertFalse(AttemptRetry.objects.exists())
+        attempt = MailingAttempt.objects.get(mailing=self.mailing, client=self.clients[1])
+        self.assertEqual(attempt.status, 'success')
+        self.assertEqual(MailingAttempt.objects.get(client=self.clients[2]).status, 'failed')
+
+    @override_settings(MAILING_RETRY_MAX_ATTEMPTS=2)
+    def test_exhausted_retries_are_dead_lettered(self):
+        rejections = {'client0@example.com': '421 Service not available'}
+        with StandInSMTPServer(rejections=rejections) as server:
+            pool = self.smtp_pool(server)
+            enqueue_mailing(self.mailing)
+            run_job(claim_job('worker'), pool=pool)
+            for _ in range(2):
+                self.make_due()
+                process_due_retries(pool=pool)
+
+        retry = AttemptRetry.objects.get()
+        self.assertEqual(retry.state, AttemptRetry.STATE_DEAD)
+        self.assertEqual(retry.retries, 2)
+
+    def test_retries_of_stopped_or_closed_mailings_are_cancelled(self):
+        closed = create_active_mailing(self.owner, self.clients[:1])
+        Mailing.objects.filter(pk=closed.pk).update(end_time=timezone.now() - timedelta(seconds=1))
+        Mailing.objects.filter(pk=self.mailing.pk).update(is_active=False, status=Mailing.STATUS_STOPPED)
+        for mailing in (self.mailing, closed):
+            new_retry(mailing, self.clients[0].pk, '451 Try again later').save()
+        self.make_due()
+
+        with StandInSMTPServer() as server:
+            self.assertEqual(process_due_retries(pool=self.smtp_pool(server)), 2)
+
+        self.assertEqual(server.messages, 0)
+        self.assertEqual(set(AttemptRetry.objects.values_list('state', flat=True)), {AttemptRetry.STATE_DEAD})
+        self.assertEqual(AttemptRetry.objects.get(mailing=self.mailing).last_error,
+                         'Рассылка остановлена до успешной отправки.')
+
+
+class RateLimiterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.limiter = RateLimiter(limits={'domain': {'default': 3, 'slow.com': 1}, 'sender': {'default': 4}},
+                                   period=60)
+
+    def test_partition_by_domain_and_sender(self):
+        recipients = [Client(pk=i, email=email) for i, email in enumerate(
+            ['a@slow.com', 'b@slow.com', 'c@fast.com', 'd@fast.com', 'e@fast.com', 'f@fast.com'])]
+
+        allowed, deferred, wait = self.limiter.partition('sender@example.com', recipients, now=120)
+
+        self.assertEqual([r.email for r in allowed], ['a@slow.com', 'c@fast.com', 'd@fast.com'])
+        self.assertEqual(len(deferred), 3)
+        self.assertEqual(wait, 60)
+
+        allowed, _, _ = self.limiter.partition('sender@example.com', deferred, now=130)
+        self.assertEqual([r.email for r in allowed], ['e@fast.com'])
+
+        allowed, deferred, wait = self.limiter.partition('sender@example.com', recipients[:1], now=185)
+        self.assertEqual(len(allowed), 1)
+
+        snapshot = self.limiter.snapshot(now=190)
+        self.assertIn({'scope': 'domain', 'key': 'slow.com', 'limit': 1, 'used': 1, 'rate_per_sec': 0.1},
+                      snapshot['keys'])
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', MAILING_FAIR_SLICE=2,
+                   MAILING_SEND_BATCH_SIZE=2, MAILING_RATE_LIMITS={})
+class FairSchedulingTests(TestCase):
+    def test_jobs_of_different_owners_are_interleaved(self):
+        big, small = [CustomUser.objects.create_user(email=f'{name}@example.com', password='pass')
+                      for name in ('big', 'small')]
+        OwnerShare.objects.create(owner=big, weight=2)
+        big_clients = [Client.objects.create(owner=big, email=f'big{i}@example.com', full_name='B') for i in range(8)]
+        small_clients = [Client.objects.create(owner=small, email=f'small{i}@example.com', full_name='S')
+                         for i in range(4)]
+        enqueue_mailing(create_active_mailing(big, big_clients))
+        enqueue_mailing(create_active_mailing(small, small_clients))
+
+        while (job := claim_job('worker')) is not None:
+            run_job(job)
+
+        order = [m.to[0][:-len('@example.com')].rstrip('0123456789') for m in mail.outbox]
+        self.assertEqual(order, ['big'] * 4 + ['small'] * 2 + ['big'] * 4 + ['small'] * 2)
+
+
+class StatisticsTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        self.clients = [
+            Client.objects.create(owner=self.owner, email=f'client{i}@example.com', full_name=f'Клиент {i}')
+            for i in range(3)
+        ]
+        self.mailing = create_active_mailing(self.owner, self.clients)
+
+    def write(self, *statuses):
+        with AttemptWriter(max_size=100, max_delay=60) as writer:
+            for client, status in zip(self.clients, statuses):
+                writer.add(mailing=self.mailing, client_id=client.pk, status=status)
+
+    def test_counters_follow_attempt_writes(self):
+        self.write('success', 'failed')
+        self.write('success', 'failed', 'success')
+
+        stats = OwnerStats.objects.get(owner=self.owner)
+        self.assertEqual((stats.mailings, stats.success, stats.failed), (1, 2, 1))
+        self.assertEqual(MailingStats.objects.get(mailing=self.mailing).success, 2)
+
+        MailingAttempt.objects.filter(status='failed').update(status='success')
+        record_delivered_retries(self.mailing, 1)
+        stats.refresh_from_db()
+        self.assertEqual((stats.success, stats.failed), (3, 0))
+
+        self.mailing.delete()
+        stats.refresh_from_db()
+        self.assertEqual((stats.mailings, stats.success, stats.failed), (0, 0, 0))
+
+    def test_reconcile_rebuilds_from_attempts(self):
+        self.write('success', 'failed', 'failed')
+        OwnerStats.objects.update(success=100)
+
+        call_command('reconcile_mailing_stats', stdout=StringIO())
+
+        stats = OwnerStats.objects.get(owner=self.owner)
+        self.assertEqual((stats.mailings, stats.success, stats.failed), (1, 1, 2))
+
+    def test_statistics_view_reads_counters(self):
+        self.write('success', 'failed', 'success')
+        self.client.force_login(self.owner)
+
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('mailing_app:statistics'))
+        self.assertEqual(response.context['success_attempts'], 2)
+        self.assertEqual(response.context['total_mailings'], 1)
+
+
+class DashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        self.clients = [
+            Client.objects.create(owner=self.owner, email=f'client{i}@example.com', full_name=f'Клиент {i}')
+            for i in range(2)
+        ]
+        self.mailings = [create_active_mailing(self.owner, self.clients) for _ in range(3)]
+        self.client.force_login(self.owner)
+
+    @override_settings(MAILING_DASHBOARD_PAGE_SIZE=2)
+    def test_numbers_are_cached_and_list_is_paginated(self):
+        response = self.client.get(reverse('mailing_app:home'))
+        self.assertEqual(response.context['total_mailings'], 3)
+        self.assertEqual(response.context['active_mailings'], 3)
+        self.assertEqual(response.context['total_recipients'], 2)
+        self.assertEqual(len(response.context['active_mailings_list']), 2)
+        self.assertTrue(response.context['is_paginated'])
+
+        # Сессия, пользователь и одна страница активных рассылок — цифры берутся из кэша.
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('mailing_app:home'), {'page': 2})
+        self.assertEqual(len(response.context['active_mailings_list']), 1)
+
+    def test_saving_mailing_or_client_invalidates_cache(self):
+        self.client.get(reverse('mailing_app:home'))
+
+        Client.objects.create(owner=self.owner, email='new@example.com', full_name='Новый')
+        self.mailings[0].delete()
+
+        response = self.client.get(reverse('mailing_app:home'))
+        self.assertEqual(response.context['total_mailings'], 2)
+        self.assertEqual(response.context['total_recipients'], 3)
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        self.clients = [
+            Client.objects.create(owner=self.owner, email=f'client{i}@example.com', full_name=f'Клиент {i}')
+            for i in range(3)
+        ]
+        self.mailing = create_active_mailing(self.owner, self.clients)
+        self.client.force_login(self.owner)
+
+    def write(self, *statuses):
+        with AttemptWriter(max_size=100, max_delay=60) as writer:
+            for client, status in zip(self.clients, statuses):
+                writer.add(mailing=self.mailing, client_id=client.pk, status=status)
+
+    def test_writer_fills_hourly_and_daily_buckets(self):
+        self.write('success', 'failed', 'failed')
+        MailingAttempt.objects.filter(client=self.clients[1]).update(status='success')
+        record_delivered_rollups(self.mailing, [MailingAttempt.objects.get(client=self.clients[1]).attempt_time])
+
+        hour = MailingHourlyStats.objects.get(mailing=self.mailing)
+        self.assertEqual((hour.success, hour.failed), (2, 1))
+        day = OwnerDailyStats.objects.get(owner=self.owner)
+        self.assertEqual((day.success, day.failed), (2, 1))
+
+        response = self.client.get(reverse('mailing_app:mailings-chart', args=[self.mailing.pk]))
+        chart = response.json()
+        self.assertEqual(len(chart['labels']), 48)
+        self.assertEqual((chart['success'][-1], chart['failed'][-1]), (2, 1))
+
+        chart = self.client.get(reverse('mailing_app:statistics-chart'), {'since': '2000-01-01'}).status_code
+        self.assertEqual(chart, 400)
+
+    def test_rebuild_matches_incremental_rollups(self):
+        self.write('success', 'failed', 'success')
+        expected = list(MailingHourlyStats.objects.values_list('mailing_id', 'hour', 'success', 'failed'))
+        MailingHourlyStats.objects.all().delete()
+
+        call_command('rebuild_attempt_rollups', stdout=StringIO())
+
+        self.assertEqual(list(MailingHourlyStats.objects.values_list('mailing_id', 'hour', 'success', 'failed')),
+                         expected)
+        day = OwnerDailyStats.objects.get(owner=self.owner)
+        self.assertEqual((day.success, day.failed), (2, 1))
+
+        self.mailing.delete()
+        day.refresh_from_db()
+        self.assertEqual((day.success, day.failed), (0, 0))
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        owner = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        clients = [
+            Client.objects.create(owner=owner, email=f'client{i}@example.com', full_name=f'Клиент {i}')
+            for i in range(5)
+        ]
+        self.mailing = create_active_mailing(owner, clients)
+        with AttemptWriter(max_size=100, max_delay=60) as writer:
+            for client in clients:
+                writer.add(mailing=self.mailing, client_id=client.pk, status='success')
+        now = timezone.now()
+        self.old = [now - timedelta(days=200), now - timedelta(days=170), now - timedelta(days=170)]
+        for attempt, moment in zip(MailingAttempt.objects.order_by('pk'), self.old):
+            MailingAttempt.objects.filter(pk=attempt.pk).update(attempt_time=moment)
+
+    def test_moves_old_attempts_into_monthly_files(self):
+        moved = archive_attempts(older_than=timedelta(days=90), batch_size=2, directory=self.directory)
+
+        self.assertEqual(moved, 3)
+        self.assertEqual(MailingAttempt.objects.count(), 2)
+        self.assertEqual(archived_months(self.directory), sorted({month_of(moment) for moment in self.old}))
+        rows = list(read_archive(directory=self.directory, mailing_id=self.mailing.pk))
+        self.assertEqual(sorted(row['attempt_time'] for row in rows), sorted(self.old))
+        self.assertEqual(list(read_archive(since=self.old[1], directory=self.directory)), rows[1:])
+        # Статистика и корзины архивом не затрагиваются.
+        self.assertEqual(OwnerStats.objects.get().success, 5)
+
+    def test_rebuilds_count_archived_attempts(self):
+        archive_attempts(older_than=timedelta(days=90), directory=self.directory)
+        OwnerStats.objects.update(success=0)
+
+        with override_settings(MAILING_ARCHIVE_DIR=self.directory):
+            call_command('reconcile_mailing_stats', stdout=StringIO())
+            call_command('rebuild_attempt_rollups', stdout=StringIO())
+
+        self.assertEqual(OwnerStats.objects.get().success, 5)
+        self.assertEqual(MailingStats.objects.get(mailing=self.mailing).success, 5)
+        self.assertEqual(sum(MailingHourlyStats.objects.values_list('success', flat=True)), 5)
+        self.assertEqual(sum(OwnerDailyStats.objects.values_list('success', flat=True)), 5)
+        oldest = MailingHourlyStats.objects.order_by('hour').first()
+        self.assertEqual((oldest.hour, oldest.success), (self.old[0].replace(minute=0, second=0, microsecond=0), 1))
+
+    def test_interrupted_batch_is_not_duplicated(self):
+        with mock.patch.object(MailingAttempt.objects, 'filter', side_effect=[
+            MailingAttempt.objects.filter(attempt_time__lt=timezone.now() - timedelta(days=90)),
+            DatabaseError,
+        ]):
+            with self.assertRaises(DatabaseError):
+                archive_attempts(older_than=timedelta(days=90), directory=self.directory)
+        self.assertEqual(MailingAttempt.objects.count(), 5)
+
+        archive_attempts(older_than=timedelta(days=90), directory=self.directory)
+
+        self.assertEqual(len(list(read_archive(directory=self.directory))), 3)
+        self.assertEqual(MailingAttempt.objects.count(), 2)
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.path = os.path.join(directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2}})
+
+    def test_values_are_shared_between_instances(self):
+        other = SQLiteCache(self.path, {})
+        self.cache.set('counter', 1)
+        self.assertEqual(other.incr('counter', 5), 6)
+        self.assertEqual(self.cache.decr('counter'), 5)
+        self.cache.set('flag', True)
+        self.assertIs(other.get('flag'), True)
+        with self.assertRaises(ValueError):
+            other.incr('flag')
+        with self.assertRaises(ValueError):
+            other.incr('missing')
+
+    def test_ttl_add_and_versions(self):
+        self.cache.set('expired', 'value', timeout=0)
+        self.assertIsNone(self.cache.get('expired'))
+        self.assertTrue(self.cache.add('expired', 'fresh'))
+        self.assertFalse(self.cache.add('expired', 'again'))
+        self.assertEqual(self.cache.get('expired'), 'fresh')
+
+        self.cache.set('key', 'v1')
+        self.cache.incr_version('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get('key', version=2), 'v1')
+
+    def test_least_recently_read_keys_are_evicted(self):
+        with mock.patch('mailing_app.sqlite_cache.CULL_EVERY', 1), \
+                mock.patch('mailing_app.sqlite_cache.TOUCH_GRANULARITY', 0):
+            for i in range(10):
+                self.cache.set(f'key{i}', i)
+            self.cache.get('key0')
+            self.cache.set('key10', 10)
+
+        self.assertEqual(self.cache.get('key0'), 0)
+        self.assertIsNone(self.cache.get('key1'))
+        self.assertEqual(self.cache.get('key10'), 10)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        Client.objects.bulk_create([
+            Client(owner=self.owner, email=f'client{i}@example.com', full_name=f'Клиент {i}') for i in range(45)
+        ])
+        self.client.force_login(self.owner)
+
+    def test_walks_pages_by_cursor_without_count(self):
+        url = reverse('mailing_app:clients-list')
+        expected = list(Client.objects.order_by('-pk').values_list('pk', flat=True))
+        seen, pages, cursor = [], [], None
+        while True:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, {'cursor': cursor} if cursor else {})
+            self.assertFalse(any('COUNT(' in query['sql'] for query in queries))
+            page = response.context['page_obj']
+            pages.append(page)
+            seen.extend(client.pk for client in page.object_list)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+
+        self.assertEqual(seen, expected)
+        self.assertEqual([len(page) for page in pages], [20, 20, 5])
+
+        response = self.client.get(url, {'cursor': pages[-1].previous_cursor})
+        self.assertEqual([client.pk for client in response.context['page_obj']], expected[20:40])
+        self.assertTrue(response.context['page_obj'].has_previous())
+
+        self.assertEqual(self.client.get(url, {'cursor': 'garbage'}).status_code, 404)
+
+    def test_keyset_filter_for_composite_key(self):
+        condition = keyset_filter(['-start_time', 'pk'], ['2026-01-01', 5])
+        self.assertEqual(str(condition), str(Q(start_time__lt='2026-01-01') | Q(start_time='2026-01-01', pk__gt=5)))
+
+
+class ListQueryCountTests(TestCase):
+    """Число запросов страниц-списков не должно зависеть от числа строк."""
+
+    def setUp(self):
+        self.owner = CustomUser.objects.create_superuser(email='admin@example.com', password='pass')
+        self.client.force_login(self.owner)
+        self.batch = 0
+
+    def add_rows(self, count):
+        self.batch += 1
+        for i in range(count):
+            recipients = [
+                Client.objects.create(owner=self.owner, email=f'c{self.batch}-{i}-{j}@example.com', full_name='К')
+                for j in range(2)
+            ]
+            Message.objects.create(subject=f'Тема {i}', body='Текст')
+            mailing = create_active_mailing(self.owner, recipients)
+            segment = Segment.objects.create(owner=self.owner, name=f'Сегмент {self.batch}-{i}')
+            Mailing.objects.filter(pk=mailing.pk).update(segment=segment)
+            with AttemptWriter(max_size=100, max_delay=60) as writer:
+                writer.add(mailing=mailing, client_id=recipients[0].pk, status='success')
+                writer.add(retry=new_retry(mailing, recipients[1].pk, 'ошибка'), mailing=mailing,
+                           client_id=recipients[1].pk, status='failed')
+            enqueue_mailing(mailing)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+
+    def test_list_views_do_not_query_per_row(self):
+        urls = [
+            reverse('mailing_app:clients-list'),
+            reverse('mailing_app:messages-list'),
+            reverse('mailing_app:mailings-list'),
+            reverse('admin:mailing_app_mailing_changelist'),
+            reverse('admin:mailing_app_mailingattempt_changelist'),
+            reverse('admin:mailing_app_mailingjob_changelist'),
+            reverse('admin:mailing_app_attemptretry_changelist'),
+        ]
+        self.add_rows(1)
+        few = {url: self.count_queries(url) for url in urls}
+        self.add_rows(5)
+        many = {url: self.count_queries(url) for url in urls}
+        self.assertEqual(many, few)
+
+    def test_mailing_list_is_annotated(self):
+        self.add_rows(1)
+        with self.assertNumQueries(1):
+            mailing = Mailing.objects.with_list_stats().get()
+            self.assertEqual((mailing.recipient_count, mailing.success_count, mailing.failed_count), (2, 1, 1))
+            self.assertIsNotNone(mailing.last_attempt_time)
+            self.assertEqual(mailing.owner.email, 'admin@example.com')
+            self.assertEqual(mailing.segment.name, 'Сегмент 1-0')
+
+
+class RecipientPickerTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        self.other = CustomUser.objects.create_user(email='other@example.com', password='pass')
+        self.clients = Client.objects.bulk_create([
+            Client(owner=self.owner, email=f'anna{i:02}@example.com', full_name=f'Анна {i}') for i in range(25)
+        ] + [Client(owner=self.owner, email='boris@example.com', full_name='Борис')])
+        self.foreign = Client.objects.create(owner=self.other, email='anna-foreign@example.com', full_name='Анна')
+        self.client.force_login(self.owner)
+
+    def form_data(self, recipients):
+        now = timezone.now()
+        return {
+            'email': 'sender@example.com',
+            'start_time': (now + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M'),
+            'end_time': (now + timedelta(hours=2)).strftime('%Y-%m-%dT%H:%M'),
+            'message': 'Текст рассылки',
+            'recipients': [str(pk) for pk in recipients],
+        }
+
+    def test_autocomplete_is_scoped_to_owner_and_paged(self):
+        url = reverse('mailing_app:clients-autocomplete')
+        first = self.client.get(url, {'q': 'anna', 'limit': 20}).json()
+        self.assertEqual(len(first['results']), 20)
+        self.assertTrue(first['has_more'])
+        second = self.client.get(url, {'q': 'anna', 'limit': 20, 'offset': 20}).json()
+        self.assertEqual(len(second['results']), 5)
+        self.assertFalse(second['has_more'])
+        emails = [row['email'] for row in first['results'] + second['results']]
+        self.assertNotIn('anna-foreign@example.com', emails)
+        self.assertEqual(emails, sorted(emails))
+        self.assertEqual(self.client.get(url, {'q': 'Бор'}).json()['results'][0]['email'], 'boris@example.com')
+        self.assertEqual(self.client.get(url, {'limit': 'x'}).status_code, 400)
+
+    def test_rejects_unknown_and_foreign_recipients(self):
+        form = MailingForm(self.form_data([self.clients[0].pk, self.foreign.pk, 10 ** 9]), owner=self.owner)
+        self.assertFalse(form.is_valid())
+        self.assertIn(str(self.foreign.pk), form.errors['recipients'][0])
+
+    def test_saves_selected_ids_with_one_existence_query(self):
+        ids = [client.pk for client in self.clients]
+        form = MailingForm(self.form_data(ids + ids[:3]), owner=self.owner)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(len(queries), 1)
+        form.instance.owner = self.owner
+        mailing = form.save()
+        self.assertEqual(set(mailing.recipients.values_list('pk', flat=True)), set(ids))
+
+    def test_create_view_uses_picker(self):
+        response = self.client.post(reverse('mailing_app:create_mailing'), self.form_data([self.clients[1].pk]))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(Mailing.objects.get().recipients.all()), [self.clients[1]])
+        self.assertContains(
+            self.client.get(reverse('mailing_app:create_mailing')), reverse('mailing_app:clients-autocomplete'),
+        )
+
+    def test_rerendered_form_labels_own_recipients_only(self):
+        data = self.form_data([self.clients[0].pk, self.foreign.pk])
+        data['message'] = ''
+        response = self.client.post(reverse('mailing_app:create_mailing'), data)
+        self.assertEqual(response.status_code, 200)
+        selected = response.context['form']['recipients'].subwidgets[0].data['selected']
+        self.assertEqual(selected, [
+            (self.clients[0].pk, 'anna00@example.com'),
+            (self.foreign.pk, f'#{self.foreign.pk}'),
+        ])
+        self.assertNotContains(response, 'anna-foreign@example.com')
+
+
+class ClientSearchTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create_superuser(email='admin@example.com', password='pass')
+        self.other = CustomUser.objects.create_user(email='other@example.com', password='pass')
+        Client.objects.bulk_create([
+            Client(owner=self.owner, email='ivanov@example.com', full_name='Иван Иванов'),
+            Client(owner=self.owner, email='petrov@example.com', full_name='Пётр Иванович'),
+            Client(owner=self.owner, email='sidorov@example.com', full_name='Сидор Сидоров'),
+            Client(owner=self.other, email='ivanova@example.com', full_name='Анна Иванова'),
+        ])
+        self.client.force_login(self.owner)
+
+    def emails(self, query, owner=None, **kwargs):
+        return [client.email for client in search_clients(query, owner=owner, **kwargs)[0]]
+
+    def test_index_follows_inserts_updates_and_deletes(self):
+        self.assertEqual(self.emails('иван', self.owner), ['ivanov@example.com', 'petrov@example.com'])
+        self.assertEqual(self.emails('иван'), ['ivanov@example.com', 'petrov@example.com', 'ivanova@example.com'])
+
+        petrov = Client.objects.get(email='petrov@example.com')
+        petrov.full_name = 'Пётр Петров'
+        petrov.save()
+        Client.objects.filter(email='ivanov@example.com').delete()
+        self.assertEqual(self.emails('иван', self.owner), [])
+        self.assertEqual(self.emails('петр пётр', self.owner), ['petrov@example.com'])
+
+    def test_ranks_and_pages_results(self):
+        rows, has_more = search_clients('сидор', owner=self.owner)
+        self.assertEqual([client.email for client in rows], ['sidorov@example.com'])
+        self.assertFalse(has_more)
+        first, has_more = search_clients('example', owner=self.owner, limit=2)
+        self.assertTrue(has_more)
+        second, has_more = search_clients('example', owner=self.owner, limit=2, offset=2)
+        self.assertFalse(has_more)
+        self.assertEqual(len({client.pk for client in first + second}), 3)
+        # Короткий запрос не попадает в триграммный индекс — ищется по началу email или имени.
+        self.assertEqual(self.emails('si', self.owner), ['sidorov@example.com'])
+
+    def test_admin_and_client_list_use_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:mailing_app_client_changelist'), {'q': 'иван'})
+        self.assertEqual(response.context['cl'].result_count, 3)
+        if connection.vendor == 'sqlite':
+            self.assertTrue(any('MATCH' in query['sql'] for query in queries))
+            self.assertFalse(any('LIKE' in query['sql'] for query in queries))
+
+        response = self.client.get(reverse('mailing_app:clients-list'), {'q': 'сидор'})
+        self.assertEqual([client.email for client in response.context['object_list']], ['sidorov@example.com'])
+
+    def test_rebuild_command(self):
+        call_command('rebuild_client_search', stdout=StringIO())
+        self.assertEqual(self.emails('сидоров'), ['sidorov@example.com'])
+
+
+class ClientImportTests(TestCase):
+    CSV = (
+        'email,full_name,comment\n'
+        'new1@example.com,Новый Один,\n'
+        'not-an-email,Без почты,\n'
+        'own@example.com,Обновлённое имя,vip\n'
+        'foreign@example.com,Чужой,\n'
+        'new2@example.com,,\n'
+        'new1@example.com,Новый Первый,повтор\n'
+    )
+
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        other = CustomUser.objects.create_user(email='other@example.com', password='pass')
+        Client.objects.create(owner=self.owner, email='own@example.com', full_name='Старое имя')
+        Client.objects.create(owner=other, email='foreign@example.com', full_name='Чужой клиент')
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_upserts_in_chunks_and_reports_rejected_rows(self):
+        rejected, calls = StringIO(), []
+        counts = import_clients(StringIO(self.CSV), self.owner, rejected, chunk_size=2,
+                                progress=lambda counts: calls.append(dict(counts)))
+
+        self.assertEqual(counts, {'processed': 6, 'imported': 3, 'rejected': 3})
+        self.assertEqual([call['processed'] for call in calls], [2, 4, 6])
+        self.assertEqual(Client.objects.get(email='own@example.com').full_name, 'Обновлённое имя')
+        self.assertEqual(Client.objects.get(email='new1@example.com').comment, 'повтор')
+        self.assertEqual(Client.objects.get(email='foreign@example.com').full_name, 'Чужой клиент')
+        lines = rejected.getvalue().splitlines()
+        self.assertEqual(lines[0], 'line,email,full_name,comment,error')
+        self.assertEqual([line.split(',')[0] for line in lines[1:]], ['3', '5', '6'])
+
+        with self.assertRaises(ValueError):
+            import_clients(StringIO('email\nx@example.com\n'), self.owner, StringIO())
+
+    def test_queries_per_chunk_not_per_row(self):
+        rows = ''.join(f'bulk{i}@example.com,Клиент {i}\n' for i in range(500))
+        with CaptureQueriesContext(connection) as queries:
+            import_clients(StringIO('email,full_name\n' + rows), self.owner, StringIO(), chunk_size=250)
+        self.assertLessEqual(len(queries), 20)
+        self.assertEqual(Client.objects.filter(owner=self.owner).count(), 501)
+
+    def test_upload_is_imported_by_worker(self):
+        self.client.force_login(self.owner)
+        with self.settings(MAILING_IMPORT_DIR=self.directory.name):
+            response = self.client.post(reverse('mailing_app:clients-import'), {
+                'file': SimpleUploadedFile('clients.csv', self.CSV.encode('utf-8-sig'), content_type='text/csv'),
+            })
+        self.assertEqual(response.status_code, 302)
+        client_import = ClientImport.objects.get()
+        self.assertEqual(client_import.status, ClientImport.STATUS_PENDING)
+
+        self.assertTrue(process_next_import('test-worker'))
+        self.assertFalse(process_next_import('test-worker'))
+        status = self.client.get(reverse('mailing_app:clients-import-status', args=[client_import.pk])).json()
+        self.assertEqual((status['status'], status['processed'], status['imported'], status['rejected']),
+                         ('done', 6, 3, 3))
+        self.assertFalse(os.path.exists(client_import.source))
+        response = self.client.get(reverse('mailing_app:clients-import-rejected', args=[client_import.pk]))
+        self.assertIn('Неверный формат email', b''.join(response.streaming_content).decode())
+
+    def test_resumes_from_checkpoint(self):
+        path = Path(self.directory.name) / 'clients.csv'
+        path.write_text(self.CSV, encoding='utf-8')
+        client_import = ClientImport.objects.create(owner=self.owner, source=str(path), processed=4, imported=2,
+                                                    rejected=2)
+        ClientImport.objects.filter(pk=client_import.pk).update(
+            status=ClientImport.STATUS_RUNNING, heartbeat_at=timezone.now() - timedelta(hours=1),
+        )
+        self.assertTrue(process_next_import('test-worker'))
+        client_import.refresh_from_db()
+        self.assertEqual((client_import.status, client_import.processed, client_import.imported,
+                          client_import.rejected), (ClientImport.STATUS_DONE, 6, 3, 3))
+        self.assertFalse(Client.objects.filter(email='not-an-email').exists())
+
+    def test_restart_before_first_chunk_keeps_one_header(self):
+        path = Path(self.directory.name) / 'clients.csv'
+        path.write_text(self.CSV, encoding='utf-8')
+        client_import = ClientImport.objects.create(owner=self.owner, source=str(path))
+        Path(client_import.rejected_path).write_text('line,email,full_name,comment,error\r\n', encoding='utf-8')
+
+        self.assertTrue(process_next_import('test-worker'))
+        lines = Path(client_import.rejected_path).read_text(encoding='utf-8').splitlines()
+        self.assertEqual(lines.count('line,email,full_name,comment,error'), 1)
+        self.assertEqual(len(lines), 4)
+
+    def test_unexpected_error_marks_import_failed(self):
+        path = Path(self.directory.name) / 'clients.csv'
+        path.write_text(self.CSV, encoding='utf-8')
+        client_import = ClientImport.objects.create(owner=self.owner, source=str(path))
+
+        with mock.patch('mailing_app.imports.import_chunk', side_effect=DatabaseError('база недоступна')):
+            with self.assertRaises(DatabaseError):
+                process_next_import('test-worker')
+        client_import.refresh_from_db()
+        self.assertEqual((client_import.status, client_import.error), (ClientImport.STATUS_FAILED, 'база недоступна'))
+        self.assertFalse(process_next_import('test-worker'))
+
+    def test_command(self):
+        path = Path(self.directory.name) / 'clients.csv'
+        path.write_text(self.CSV, encoding='utf-8')
+        out = StringIO()
+        call_command('import_clients', str(path), owner='owner@example.com', chunk_size=3, stdout=out)
+        self.assertIn('записано 3, отклонено 3', out.getvalue())
+        self.assertTrue((Path(self.directory.name) / 'clients.csv.rejected.csv').exists())
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        other = CustomUser.objects.create_user(email='other@example.com', password='pass')
+        self.recipients = [
+            Client.objects.create(owner=self.owner, email=f'c{i}@example.com', full_name=f'Клиент {i}')
+            for i in range(3)
+        ]
+        Client.objects.create(owner=other, email='foreign@example.com', full_name='Чужой')
+        self.mailing = create_active_mailing(self.owner, self.recipients[:2])
+        foreign = create_active_mailing(other, [])
+        MailingAttempt.objects.bulk_create([
+            MailingAttempt(mailing=self.mailing, client=self.recipients[0], status='success'),
+            MailingAttempt(mailing=self.mailing, client=self.recipients[1], status='failed', server_response='550'),
+            MailingAttempt(mailing=foreign, client=None, status='success'),
+        ])
+        self.client.force_login(self.owner)
+
+    def test_streams_only_own_attempts(self):
+        response = self.client.get(reverse('mailing_app:attempts-export'))
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], ','.join(ATTEMPT_COLUMNS))
+        self.assertEqual(len(lines), 3)
+
+        response = self.client.get(reverse('mailing_app:attempts-export'), {'format': 'jsonl', 'status': 'failed'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([(row['client_id'], row['server_response']) for row in rows], [(self.recipients[1].pk, '550')])
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+
+        later = (timezone.now() + timedelta(hours=1)).isoformat()
+        response = self.client.get(reverse('mailing_app:attempts-export'), {'since': later})
+        self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 1)
+        self.assertEqual(self.client.get(reverse('mailing_app:attempts-export'), {'since': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('mailing_app:attempts-export'), {'format': 'xml'}).status_code, 400)
+
+    def test_clients_of_mailing(self):
+        response = self.client.get(reverse('mailing_app:clients-export'),
+                                   {'format': 'jsonl', 'mailing': self.mailing.pk})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(sorted(row['email'] for row in rows), ['c0@example.com', 'c1@example.com'])
+
+    def test_clients_of_segment_mailing(self):
+        self.recipients[2].comment = '#vip'
+        self.recipients[2].save()
+        segment = Segment.objects.create(owner=self.owner, name='VIP', tags='#vip')
+        mailing = create_active_mailing(self.owner, self.recipients[:1])
+        Mailing.objects.filter(pk=mailing.pk).update(segment=segment)
+
+        response = self.client.get(reverse('mailing_app:clients-export'), {'format': 'jsonl', 'mailing': mailing.pk})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(sorted(row['email'] for row in rows), ['c0@example.com', 'c2@example.com'])
+
+        foreign = Mailing.objects.exclude(owner=self.owner).get()
+        response = self.client.get(reverse('mailing_app:clients-export'), {'format': 'jsonl', 'mailing': foreign.pk})
+        self.assertEqual(b''.join(response.streaming_content), b'')
+
+    def test_function_views_still_render_templates(self):
+        # Выгрузка не должна подменять django.shortcuts.render во views.
+        self.assertEqual(self.client.get(reverse('mailing_app:mailing-create')).status_code, 200)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('mailing_app:signup')).status_code, 200)
+
+    def test_reads_rows_in_chunks(self):
+        rows = attempt_rows(owner_id=self.owner.pk, chunk_size=1)
+        chunks = render(rows, ATTEMPT_COLUMNS, 'csv', group=1)
+        with self.assertNumQueries(0):
+            self.assertEqual(next(chunks), ','.join(ATTEMPT_COLUMNS) + '\r\n')
+        self.assertEqual(len(list(chunks)), 2)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('export_data', 'clients', owner='owner@example.com', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 4)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', MAILING_RATE_LIMITS={})
+class SegmentTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        other = CustomUser.objects.create_user(email='other@example.com', password='pass')
+        self.vip = Client.objects.create(owner=self.owner, email='a@corp.ru', full_name='А', comment='#vip #msk')
+        self.club = Client.objects.create(owner=self.owner, email='b@corp.ru', full_name='Б', comment='#vipclub')
+        self.gmail = Client.objects.create(owner=self.owner, email='c@gmail.com', full_name='В', comment='#vip')
+        Client.objects.create(owner=other, email='d@corp.ru', full_name='Г', comment='#vip')
+        self.client.force_login(self.owner)
+
+    def segment(self, **kwargs):
+        return Segment.objects.create(owner=self.owner, name='Сегмент', **kwargs)
+
+    def test_filters(self):
+        self.assertEqual(set(self.segment(email_domain='corp.ru').clients()), {self.vip, self.club})
+        self.assertEqual(set(self.segment(tags='#vip').clients()), {self.vip, self.gmail})
+        self.assertEqual(list(self.segment(email_domain='@corp.ru', tags='vip, #msk').clients()), [self.vip])
+        Client.objects.filter(pk=self.gmail.pk).update(created_at=timezone.now() - timedelta(days=10))
+        since = timezone.now() - timedelta(days=1)
+        self.assertEqual(set(self.segment(created_after=since).clients()), {self.vip, self.club})
+        self.assertEqual(list(self.segment(created_before=since).clients()), [self.gmail])
+
+    def test_sender_resolves_segment_without_through_rows(self):
+        mailing = create_active_mailing(self.owner, [self.club])
+        Mailing.objects.filter(pk=mailing.pk).update(segment=self.segment(tags='#vip'))
+        mailing.refresh_from_db()
+        self.assertEqual(Mailing.recipients.through.objects.filter(mailing=mailing).count(), 1)
+
+        enqueue_mailing(mailing)
+        run_job(claim_job())
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['a@corp.ru', 'b@corp.ru', 'c@gmail.com'])
+        self.assertEqual(MailingAttempt.objects.filter(mailing=mailing).count(), 3)
+
+    def test_mailing_list_names_segment(self):
+        mailing = create_active_mailing(self.owner, [self.club])
+        Mailing.objects.filter(pk=mailing.pk).update(segment=self.segment(tags='#vip'))
+        response = self.client.get(reverse('mailing_app:mailings-list'))
+        self.assertContains(response, 'выбрано получателей: 1,')
+        self.assertContains(response, 'сегмент «Сегмент»')
+
+    def test_form_accepts_segment_instead_of_recipients(self):
+        segment = self.segment(tags='#vip')
+        now = timezone.now()
+        data = {
+            'email': 'sender@example.com',
+            'start_time': (now + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M'),
+            'end_time': (now + timedelta(hours=2)).strftime('%Y-%m-%dT%H:%M'),
+            'message': 'Текст',
+        }
+        self.assertFalse(MailingForm(data, owner=self.owner).is_valid())
+        foreign = Segment.objects.create(owner=CustomUser.objects.get(email='other@example.com'), name='Чужой')
+        self.assertFalse(MailingForm({**data, 'segment': foreign.pk}, owner=self.owner).is_valid())
+        response = self.client.post(reverse('mailing_app:create_mailing'), {**data, 'segment': segment.pk})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Mailing.objects.get().segment, segment)
+
+    def test_segment_views_are_scoped_and_protected(self):
+        self.client.post(reverse('mailing_app:segments-add'), {'name': 'VIP', 'tags': '#vip'})
+        segment = Segment.objects.get(name='VIP')
+        self.assertEqual(segment.owner, self.owner)
+        mailing = create_active_mailing(self.owner, [])
+        Mailing.objects.filter(pk=mailing.pk).update(segment=segment)
+        self.client.post(reverse('mailing_app:segments-delete', args=[segment.pk]))
+        self.assertTrue(Segment.objects.filter(pk=segment.pk).exists())
+
+        self.client.force_login(CustomUser.objects.get(email='other@example.com'))
+        self.assertEqual(self.client.get(reverse('mailing_app:segments-edit', args=[segment.pk])).status_code, 404)
+
+
+class OwnerScopingTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        self.other = CustomUser.objects.create_user(email='other@example.com', password='pass')
+        for user in (self.owner, self.other):
+            client = Client.objects.create(owner=user, email=f'client-{user.pk}@example.com', full_name='Клиент')
+            Message.objects.create(owner=user, subject=f'Тема {user.pk}', body='Текст')
+            create_active_mailing(user, [client])
+        self.client.force_login(self.owner)
+
+    def test_views_show_and_change_only_own_rows(self):
+        for name, model in [('clients-list', Client), ('messages-list', Message), ('mailings-list', Mailing)]:
+            response = self.client.get(reverse(f'mailing_app:{name}'))
+            self.assertEqual({row.owner_id for row in response.context['object_list']}, {self.owner.pk}, name)
+
+        foreign_client = Client.objects.get(owner=self.other)
+        foreign_mailing = Mailing.objects.get(owner=self.other)
+        self.assertEqual(self.client.post(reverse('mailing_app:clients-delete', args=[foreign_client.pk])).status_code,
+                         404)
+        self.assertEqual(self.client.get(reverse('mailing_app:mailings-send', args=[foreign_mailing.pk])).status_code,
+                         404)
+        self.assertTrue(Client.objects.filter(pk=foreign_client.pk).exists())
+
+        self.client.post(reverse('mailing_app:messages-add'), {'subject': 'Новая', 'body': 'Текст'})
+        self.assertEqual(Message.objects.get(subject='Новая').owner, self.owner)
+
+    def plan(self, queryset):
+        if connection.vendor == 'postgresql':
+            # На крошечной тестовой таблице Postgres иначе выбрал бы последовательное чтение.
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+        return queryset.explain()
+
+    def index_name(self, model, fields):
+        return next(index.name for index in model._meta.indexes if index.fields == fields)
+
+    def test_hot_queries_use_owner_indexes(self):
+        clients_page = Client.objects.owned_by(self.owner).order_by('-pk')[:21]
+        self.assertIn(self.index_name(Client, ['owner', 'id']), self.plan(clients_page))
+
+        mailings_page = Mailing.objects.owned_by(self.owner).order_by('-start_time', '-pk')[:21]
+        plan = self.plan(mailings_page)
+        self.assertIn(self.index_name(Mailing, ['owner', 'start_time']), plan)
+        if connection.vendor == 'sqlite':
+            self.assertNotIn('TEMP B-TREE', plan)
@@ -4,7 +4,9 @@ from .views import (
     ClientListView, ClientCreateView, ClientUpdateView, ClientDeleteView,
     MessageListView, MessageCreateView, MessageUpdateView, MessageDeleteView,
     MailingListView, MailingCreateView, MailingUpdateView, MailingDeleteView,
-    MailingSendView,
+    MailingSendView, MailingJobStatusView, MailingRatesView, MailingChartView, OwnerChartView,
+    RecipientAutocompleteView, ClientImportView, ClientImportStatusView, ClientImportRejectedView,
+    AttemptExportView, ClientExportView, SegmentListView, SegmentCreateView, SegmentUpdateView, SegmentDeleteView,
     HomePageView, StatisticsView, signup_view, UserLoginView, mailing_create,
 )
 
@@ -14,8 +16,17 @@ urlpatterns = [
     path('', HomePageView.as_view(), name='home'),
     path('clients/', ClientListView.as_view(), name='clients-list'),
     path('clients/add/', ClientCreateView.as_view(), name='clients-add'),
+    path('clients/import/', ClientImportView.as_view(), name='clients-import'),
+    path('clients/import/<int:pk>/', ClientImportStatusView.as_view(), name='clients-import-status'),
+    path('clients/import/<int:pk>/rejected/', ClientImportRejectedView.as_view(), name='clients-import-rejected'),
+    path('clients/export/', ClientExportView.as_view(), name='clients-export'),
+    path('clients/autocomplete/', RecipientAutocompleteView.as_view(), name='clients-autocomplete'),
     path('clients/<int:pk>/edit/', ClientUpdateView.as_view(), name='clients-edit'),
     path('clients/<int:pk>/delete/', ClientDeleteView.as_view(), name='clients-delete'),
+    path('segments/', SegmentListView.as_view(), name='segments-list'),
+    path('segments/add/', SegmentCreateView.as_view(), name='segments-add'),
+    path('segments/<int:pk>/edit/', SegmentUpdateView.as_view(), name='segments-edit'),
+    path('segments/<int:pk>/delete/', SegmentDeleteView.as_view(), name='segments-delete'),
     path('messages/', MessageListView.as_view(), name='messages-list'),
     path('messages/add/', MessageCreateView.as_view(), name='messages-add'),path('messages/<int:pk>/edit/', MessageUpdateView.as_view(), name='messages-edit'),
     path('messages/<int:pk>/delete/', MessageDeleteView.as_view(), name='messages-delete'),
@@ -24,7 +35,12 @@ urlpatterns = [
     path('mailings/<int:pk>/edit/', MailingUpdateView.as_view(), name='mailings-edit'),
     path('mailings/<int:pk>/delete/', MailingDeleteView.as_view(), name='mailings-delete'),
     path('mailings/<int:pk>/send/', MailingSendView.as_view(), name='mailings-send'),
+    path('mailings/jobs/<int:pk>/', MailingJobStatusView.as_view(), name='mailings-job-status'),
+    path('mailings/attempts/export/', AttemptExportView.as_view(), name='attempts-export'),
+    path('mailings/rates/', MailingRatesView.as_view(), name='mailings-rates'),
+    path('mailings/<int:pk>/chart/', MailingChartView.as_view(), name='mailings-chart'),
     path('statistics/', StatisticsView.as_view(), name='statistics'),
+    path('statistics/chart/', OwnerChartView.as_view(), name='statistics-chart'),
     path('signup/', signup_view, name='signup'),
     path('login/', UserLoginView.as_view(), name='login'),
     path('add/', MailingCreateView.as_view(), name='mailing_add'),
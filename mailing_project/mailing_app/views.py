@@ -1,78 +1,207 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.decorators import user_passes_test, login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.views import LoginView
-from django.core.mail import send_mail
-from django.db.models import Min, Max
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_control
-from django.views.generic import ListView, CreateView, UpdateView, DeleteView, TemplateView, View
+from django.views.generic import ListView, CreateView, UpdateView, DeleteView, FormView, TemplateView, View
 from django.urls import reverse_lazy
 from django.shortcuts import get_object_or_404, redirect,render
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django.contrib import messages
-from .models import Client, Message, Mailing, MailingAttempt
-from .forms import ClientForm, MessageForm, MailingForm, SignUpForm, EmailAuthenticationForm
+from django.db.models import ProtectedError
+from .models import Client, ClientImport, Message, Mailing, MailingJob, Segment
+from .forms import ClientForm, ClientImportForm, MessageForm, SegmentForm, MailingForm, SignUpForm, EmailAuthenticationForm
+from .dashboard import active_mailings_page, dashboard_numbers
+from . import exports
+from .imports import save_upload
+from .jobs import enqueue_mailing
+from .pagination import KeysetPage, KeysetPaginationMixin, decode_cursor, encode_cursor
+from .ratelimit import RateLimiter
+from .rollups import DAY, HOUR, chart_data, day_bucket, hour_bucket, mailing_hourly, owner_daily
+from .search import search_clients
+from .stats import owner_stats
 
 
 class ProfileView(TemplateView):
     template_name = 'profile.html'
 
-class ClientListView(ListView):
+class OwnerScopedMixin(LoginRequiredMixin):
+    """Представление видит только строки текущего пользователя (см. OwnedQuerySet).
+
+    Список, изменение и удаление чужой строки дают 404; создаваемая через
+    форму строка получает владельцем текущего пользователя.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().owned_by(self.request.user)
+
+    def form_valid(self, form):
+        # У формы подтверждения DeleteView нет instance.
+        instance = getattr(form, 'instance', None)
+        if instance is not None and not instance.owner_id:
+            instance.owner = self.request.user
+        return super().form_valid(form)
+
+
+class ClientListView(OwnerScopedMixin, KeysetPaginationMixin, ListView):
+    """Список клиентов; с ?q=... — результаты поиска, лучшие совпадения первыми."""
     model = Client
     paginate_by = 20
 
-class ClientCreateView(CreateView):
+    def paginate_queryset(self, queryset, page_size):
+        query = self.request.GET.get('q', '').strip()
+        if not query:
+            return super().paginate_queryset(queryset, page_size)
+        # У поиска порядок задаёт релевантность, поэтому курсор хранит смещение.
+        cursor = self.request.GET.get(self.cursor_kwarg)
+        offset = decode_cursor(cursor)[1] if cursor else [0]
+        if len(offset) != 1 or not str(offset[0]).isdigit():
+            raise Http404('Некорректный курсор страницы.')
+        offset = int(offset[0])
+        rows, has_more = search_clients(query, owner=self.request.user, limit=page_size, offset=offset)
+        page = KeysetPage(
+            rows,
+            encode_cursor([offset + page_size]) if has_more else None,
+            encode_cursor([max(offset - page_size, 0)]) if offset else None,
+        )
+        return None, page, rows, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        return super().get_context_data(query=self.request.GET.get('q', '').strip(), **kwargs)
+
+class ClientCreateView(OwnerScopedMixin, CreateView):
     model = Client
     form_class = ClientForm
     success_url = reverse_lazy('mailing_app:clients-list')
 
-class ClientUpdateView(UpdateView):
+class ClientUpdateView(OwnerScopedMixin, UpdateView):
     model = Client
     form_class = ClientForm
     success_url = reverse_lazy('mailing_app:clients-list')
 
-class ClientDeleteView(DeleteView):
+class ClientDeleteView(OwnerScopedMixin, DeleteView):
     model = Client
     success_url = reverse_lazy('mailing_app:clients-list')
 
-class MessageListView(ListView):
+class ClientImportView(LoginRequiredMixin, FormView):
+    """Загрузка CSV с клиентами: файл сохраняется на диск, импорт выполняют воркеры."""
+    template_name = 'mailing_app/client_import.html'
+    form_class = ClientImportForm
+    success_url = reverse_lazy('mailing_app:clients-import')
+
+    def form_valid(self, form):
+        client_import = save_upload(form.cleaned_data['file'], self.request.user)
+        messages.success(self.request, f'Файл поставлен в очередь на импорт (#{client_import.pk}).')
+        return super().form_valid(form)
+
+    def get_context_data(self, **kwargs):
+        imports = ClientImport.objects.owned_by(self.request.user).order_by('-created_at')[:10]
+        return super().get_context_data(imports=imports, **kwargs)
+
+
+class ClientImportStatusView(LoginRequiredMixin, View):
+    def get(self, request, pk):
+        client_import = get_object_or_404(ClientImport.objects.owned_by(request.user), pk=pk)
+        return JsonResponse({
+            'id': client_import.pk,
+            'status': client_import.status,
+            'size': client_import.size,
+            'position': client_import.position,
+            'processed': client_import.processed,
+            'imported': client_import.imported,
+            'rejected': client_import.rejected,
+            'started_at': client_import.started_at,
+            'finished_at': client_import.finished_at,
+            'error': client_import.error,
+        })
+
+
+class ClientImportRejectedView(LoginRequiredMixin, View):
+    """CSV отклонённых строк импорта: номер строки, поля и причина."""
+
+    def get(self, request, pk):
+        client_import = get_object_or_404(ClientImport.objects.owned_by(request.user), pk=pk)
+        try:
+            rejected = open(client_import.rejected_path, 'rb')
+        except FileNotFoundError:
+            raise Http404('Файл отклонённых строк ещё не создан.')
+        return FileResponse(rejected, as_attachment=True, filename=f'import-{client_import.pk}-rejected.csv',
+                            content_type='text/csv')
+
+
+class SegmentMixin(OwnerScopedMixin):
+    model = Segment
+    success_url = reverse_lazy('mailing_app:segments-list')
+
+
+class SegmentListView(SegmentMixin, ListView):
+    pass
+
+
+class SegmentCreateView(SegmentMixin, CreateView):
+    form_class = SegmentForm
+
+
+class SegmentUpdateView(SegmentMixin, UpdateView):
+    form_class = SegmentForm
+
+
+class SegmentDeleteView(SegmentMixin, DeleteView):
+    def form_valid(self, form):
+        try:
+            return super().form_valid(form)
+        except ProtectedError:
+            messages.error(self.request, 'Сегмент используется в рассылках и не может быть удалён.')
+            return redirect(self.success_url)
+
+
+class MessageListView(OwnerScopedMixin, KeysetPaginationMixin, ListView):
     model = Message
     paginate_by = 20
 
-class MessageCreateView(CreateView):
+class MessageCreateView(OwnerScopedMixin, CreateView):
     model = Message
     form_class = MessageForm
     success_url = reverse_lazy('mailing_app:messages-list')
 
-class MessageUpdateView(UpdateView):
+class MessageUpdateView(OwnerScopedMixin, UpdateView):
     model = Message
     form_class = MessageForm
     success_url = reverse_lazy('mailing_app:messages-list')
 
-class MessageDeleteView(DeleteView):
+class MessageDeleteView(OwnerScopedMixin, DeleteView):
     model = Message
     success_url = reverse_lazy('mailing_app:messages-list')
 
-class MailingListView(ListView):
+class MailingListView(OwnerScopedMixin, KeysetPaginationMixin, ListView):
     model = Mailing
     paginate_by = 20
+    # Новые по времени начала первыми: страница читается по индексу (owner, start_time).
+    keyset_ordering = ('-start_time', '-pk')
 
-class MailingCreateView(LoginRequiredMixin, CreateView):
+    def get_queryset(self):
+        return super().get_queryset().with_list_stats()
+
+class MailingCreateView(OwnerScopedMixin, CreateView):
     model = Mailing
     form_class = MailingForm
     success_url = reverse_lazy('mailing_app:statistics')
 
-    def form_valid(self, form):
-        form.instance.owner = self.request.user
-        return super().form_valid(form)
+    def get_form_kwargs(self):
+        return {**super().get_form_kwargs(), 'owner': self.request.user}
 
-class MailingUpdateView(UpdateView):
+class MailingUpdateView(OwnerScopedMixin, UpdateView):
     model = Mailing
     form_class = MailingForm
     success_url = reverse_lazy('mailing_app:mailings-list')
 
-class MailingDeleteView(DeleteView):
+class MailingDeleteView(OwnerScopedMixin, DeleteView):
     model = Mailing
     success_url = reverse_lazy('mailing_app:mailings-list')
 
@@ -81,59 +210,172 @@ class HomePageView(TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        now = timezone.now()
-        all_mailings = Mailing.objects.all()
-        active_mailings = Mailing.objects.filter(start_time__lte=now, end_time__gte=now)
-        total_recipients = Client.objects.count()
+        numbers = dashboard_numbers()
+        page = active_mailings_page(self.request.GET.get('page'), numbers)
 
+        context.update(numbers)
         context.update({
-            'all_mailings_count': all_mailings.count(),
-            'active_mailings_count': active_mailings.count(),
-            'start_time': active_mailings.aggregate(min_start=Min('start_time'))['min_start'],
-            'end_time': active_mailings.aggregate(max_end=Max('end_time'))['max_end'],
-            'total_recipients': total_recipients,
-            'active_mailings_list': active_mailings,
-            'last_updated': now,
+            'active_mailings_list': page.object_list,
+            'page_obj': page,
+            'is_paginated': page.has_other_pages(),
         })
         return context
 
 
-class MailingSendView(View):
+class MailingSendView(LoginRequiredMixin, View):
     def get(self, request, pk):
-        mailing = get_object_or_404(Mailing, pk=pk)
+        mailing = get_object_or_404(Mailing.objects.owned_by(request.user), pk=pk)
         now = timezone.now()
         if not (mailing.start_time <= now <= mailing.end_time):
             messages.error(request, 'Отправка разрешена только между start_time и end_time.')
             return redirect('mailing_app:mailings-list')
 
-        recipients = mailing.recipients.all()
-        message_obj = mailing.message
-
-        for client in recipients:
-            try:
-                send_mail(
-                    subject=message_obj.subject,
-                    message=message_obj.body,
-                    from_email=None,
-                    recipient_list=[client.email],
-                    fail_silently=False,
-                )
-                status = 'Успешно'
-                server_response = 'Письмо отправлено успешно.'
-            except Exception as e:
-                status = 'Не успешно'
-                server_response = str(e)
-
-            MailingAttempt.objects.create(
-                mailing=mailing,
-                client=client,
-                status=status,
-                server_response=server_response,
-            )
-
-        messages.success(request, f'Рассылка #{mailing.pk} запущена для {recipients.count()} клиентов.')
+        job = enqueue_mailing(mailing)
+
+        messages.success(request, f'Рассылка #{mailing.pk} поставлена в очередь (задача #{job.pk}).')
         return redirect('mailing_app:mailings-list')
 
+
+class RecipientAutocompleteView(LoginRequiredMixin, View):
+    """Поиск клиентов пользователя по началу email или имени для выбора получателей.
+
+    Параметры: q, limit (не больше 100), offset. Отдаёт limit строк и признак
+    has_more — лишняя строка выбирается вместо COUNT(*).
+    """
+    max_limit = 100
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.GET.get('limit', 20)), 1), self.max_limit)
+            offset = max(int(request.GET.get('offset', 0)), 0)
+        except ValueError:
+            return JsonResponse({'error': 'Некорректные параметры.'}, status=400)
+        rows, has_more = search_clients(request.GET.get('q', ''), owner=request.user, limit=limit, offset=offset)
+        return JsonResponse({
+            'results': [{'id': client.pk, 'email': client.email, 'full_name': client.full_name} for client in rows],
+            'has_more': has_more,
+        })
+
+
+class MailingJobStatusView(LoginRequiredMixin, View):
+    def get(self, request, pk):
+        job = get_object_or_404(MailingJob, pk=pk, mailing__owner=request.user)
+        return JsonResponse({
+            'id': job.pk,
+            'mailing': job.mailing_id,
+            'status': job.status,
+            'total': job.total,
+            'sent': job.sent,
+            'failed': job.failed,
+            'started_at': job.started_at,
+            'finished_at': job.finished_at,
+            'error': job.error,
+        })
+
+@method_decorator(user_passes_test(lambda u: u.is_staff), name='dispatch')
+class MailingRatesView(View):
+    def get(self, request):
+        return JsonResponse(RateLimiter().snapshot())
+
+
+def chart_range(request, parse, default_until, default_span, step):
+    """Границы графика из параметров since/until; ValueError, если они некорректны."""
+    until = parse(request.GET['until']) if 'until' in request.GET else default_until
+    if until is None:
+        raise ValueError('Некорректный интервал.')
+    since = parse(request.GET['since']) if 'since' in request.GET else until - default_span
+    if since is None or since >= until:
+        raise ValueError('Некорректный интервал.')
+    if (until - since) / step > settings.MAILING_CHART_MAX_POINTS:
+        raise ValueError('Слишком длинный интервал.')
+    return since, until
+
+
+def parse_moment(value):
+    moment = parse_datetime(value)
+    if moment is not None and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class ExportView(LoginRequiredMixin, View):
+    """Потоковая выгрузка строк пользователя в CSV или JSON Lines (?format=csv|jsonl).
+
+    Ответ собирается по мере чтения базы, поэтому память не растёт с числом
+    строк, а первый байт уходит сразу.
+    """
+    name = None
+    columns = ()
+
+    def rows(self, request, mailing_id):
+        raise NotImplementedError
+
+    def get(self, request):
+        fmt = request.GET.get('format', 'csv')
+        if fmt not in exports.FORMATS:
+            return JsonResponse({'error': 'Формат должен быть csv или jsonl.'}, status=400)
+        mailing_id = request.GET.get('mailing')
+        if mailing_id is not None and not mailing_id.isdigit():
+            return JsonResponse({'error': 'Некорректный номер рассылки.'}, status=400)
+        try:
+            rows = self.rows(request, int(mailing_id) if mailing_id else None)
+        except ValueError as error:
+            return JsonResponse({'error': str(error)}, status=400)
+        response = StreamingHttpResponse(exports.render(rows, self.columns, fmt), content_type=exports.FORMATS[fmt])
+        response['Content-Disposition'] = f'attachment; filename="{self.name}.{fmt}"'
+        return response
+
+
+class AttemptExportView(ExportView):
+    """Попытки рассылок пользователя; фильтры mailing, since, until (ISO 8601) и status."""
+    name = 'attempts'
+    columns = exports.ATTEMPT_COLUMNS
+
+    def rows(self, request, mailing_id):
+        bounds = {}
+        for name in ('since', 'until'):
+            if name in request.GET:
+                bounds[name] = parse_moment(request.GET[name])
+                if bounds[name] is None:
+                    raise ValueError('Некорректный интервал.')
+        return exports.attempt_rows(owner_id=request.user.pk, mailing_id=mailing_id,
+                                    status=request.GET.get('status'), **bounds)
+
+
+class ClientExportView(ExportView):
+    """Клиенты пользователя; с mailing — только получатели рассылки."""
+    name = 'clients'
+    columns = exports.CLIENT_COLUMNS
+
+    def rows(self, request, mailing_id):
+        return exports.client_rows(owner_id=request.user.pk, mailing_id=mailing_id)
+
+
+class MailingChartView(LoginRequiredMixin, View):
+    """Попытки рассылки по часам для графика; читает только часовые корзины."""
+
+    def get(self, request, pk):
+        mailing = get_object_or_404(Mailing.objects.owned_by(request.user), pk=pk)
+        try:
+            since, until = chart_range(request, parse_moment, hour_bucket(timezone.now()) + HOUR,
+                                       timedelta(hours=48), HOUR)
+        except ValueError as error:
+            return JsonResponse({'error': str(error)}, status=400)
+        return JsonResponse(chart_data(mailing_hourly(mailing, since, until)))
+
+
+class OwnerChartView(LoginRequiredMixin, View):
+    """Попытки всех рассылок пользователя по дням для графика; читает только дневные корзины."""
+
+    def get(self, request):
+        try:
+            since, until = chart_range(request, parse_date, day_bucket(timezone.now()) + DAY,
+                                       timedelta(days=30), DAY)
+        except ValueError as error:
+            return JsonResponse({'error': str(error)}, status=400)
+        return JsonResponse(chart_data(owner_daily(request.user, since, until)))
+
+
 @method_decorator(cache_control(public=True, max_age=300), name='dispatch')
 class StatisticsView(LoginRequiredMixin, TemplateView):
     template_name = 'mailing_app/statistics.html'
@@ -141,14 +383,11 @@ class StatisticsView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         user = self.request.user
         context = super().get_context_data(**kwargs)
-        mailings = Mailing.objects.filter(owner=user)
-
-        context['total_mailings'] = mailings.count()
-
-        attempts = MailingAttempt.objects.filter(mailing__in=mailings)
+        stats = owner_stats(user)
 
-        context['success_attempts'] = attempts.filter(status='success').count()
-        context['failed_attempts'] = attempts.filter(status='failed').count()
+        context['total_mailings'] = stats.mailings
+        context['success_attempts'] = stats.success
+        context['failed_attempts'] = stats.failed
 
         context['messages_sent'] = context['success_attempts']
 
@@ -164,7 +403,7 @@ def mailing_view(request):
 @login_required
 def mailing_create(request):
     if request.method == 'POST':
-        form = MailingForm(request.POST)
+        form = MailingForm(request.POST, owner=request.user)
         if form.is_valid():
             mailing = form.save(commit=False)
             mailing.owner = request.user
@@ -173,7 +412,7 @@ def mailing_create(request):
             messages.success(request, '✅ Рассылка создана!')
             return redirect('mailing_app:statistics')
     else:
-        form =MailingForm()
+        form =MailingForm(owner=request.user)
     return render(request, 'mailing_app/mailing_form.html', {'form': form})
 
 
@@ -136,13 +136,21 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 AUTH_USER_MODEL = 'users.CustomUser'
 
 
+# Общий для всех процессов хоста кэш в файле SQLite (WAL): счётчики лимитов
+# скорости и сброс кэша главной страницы видны всем воркерам gunicorn
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'mailing-cache',
+        'BACKEND': 'mailing_app.sqlite_cache.SQLiteCache',
+        'LOCATION': env('CACHE_LOCATION', default=str(BASE_DIR / 'cache.sqlite3')),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100_000,
+        },
     }
 }
 
+# Тесты подменяют общий файловый кэш кэшем в памяти
+TEST_RUNNER = 'mailing_app.test_runner.TestRunner'
+
 
 SITE_ID = 1
 
@@ -153,4 +161,64 @@ LOGIN_URL = '/login/'
 
 LOGOUT_REDIRECT_URL = '/login/'
 
-LOGIN_REDIRECT_URL = '/'
\ No newline at end of file
+LOGIN_REDIRECT_URL = '/'
+
+MAILING_SMTP_POOL_SIZE = 4
+
+MAILING_SMTP_MAX_MESSAGES_PER_CONNECTION = 100
+
+MAILING_SEND_BATCH_SIZE = 50
+
+MAILING_ATTEMPT_FLUSH_SIZE = 500
+
+MAILING_ATTEMPT_FLUSH_INTERVAL = 2.0
+
+# 'sync' — последовательная отправка пачками, 'async' — параллельная отправка в пуле
+# из MAILING_ASYNC_CONCURRENCY потоков под управлением asyncio
+MAILING_DISPATCH_MODE = env('MAILING_DISPATCH_MODE', default='sync')
+
+MAILING_ASYNC_CONCURRENCY = 20
+
+# Задача без отметки воркера дольше этого времени (сек) считается брошенной и забирается заново
+MAILING_JOB_STALE_AFTER = 300
+
+MAILING_RETRY_BASE_DELAY = 60
+
+MAILING_RETRY_MAX_DELAY = 3600
+
+MAILING_RETRY_MAX_ATTEMPTS = 5
+
+MAILING_RETRY_BATCH_SIZE = 100
+
+# Лимиты отправки: писем за MAILING_RATE_LIMIT_PERIOD секунд на домен получателя и на отправителя
+MAILING_RATE_LIMITS = {
+    'domain': {'default': 600},
+    'sender': {'default': 1200},
+}
+
+MAILING_RATE_LIMIT_PERIOD = 60
+
+# Сколько писем задача владельца с весом 1 отправляет за один подход воркера
+MAILING_FAIR_SLICE = 1000
+
+# Цифры главной страницы кэшируются и сбрасываются сигналами; TTL ограничивает
+# устаревание числа активных рассылок, статус которых меняется без сигналов
+MAILING_DASHBOARD_CACHE_TTL = 60
+MAILING_DASHBOARD_PAGE_SIZE = 10
+
+# Наибольшее число точек (часов или дней) в одном ответе графика
+MAILING_CHART_MAX_POINTS = 2000
+
+# Попытки старше MAILING_ATTEMPT_RETENTION_DAYS дней команда archive_attempts переносит
+# в сжатые файлы по месяцам в MAILING_ARCHIVE_DIR, удаляя их пачками
+MAILING_ATTEMPT_RETENTION_DAYS = 90
+MAILING_ARCHIVE_DIR = env('MAILING_ARCHIVE_DIR', default=str(BASE_DIR / 'archive'))
+MAILING_ARCHIVE_BATCH_SIZE = 5000
+
+# Загрузки CSV с клиентами и файлы отклонённых строк; клиенты записываются
+# пачками по MAILING_IMPORT_CHUNK_SIZE строк
+MAILING_IMPORT_DIR = env('MAILING_IMPORT_DIR', default=str(BASE_DIR / 'imports'))
+MAILING_IMPORT_CHUNK_SIZE = 5000
+
+# Выгрузки попыток и клиентов читают базу и отдают ответ пачками по столько строк
+MAILING_EXPORT_CHUNK_SIZE = 2000
@@ -11,6 +11,7 @@ from django.core.mail import send_mail
 from .models import CustomUser
 from django.contrib.auth import login
 from mailing_app.models import Client
+from mailing_app.pagination import KeysetPaginationMixin
 
 
 class RegisterView(View):
@@ -73,7 +74,7 @@ class ClientUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         return not self.request.user.is_blocked
 
 
-class UsersListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+class UsersListView(LoginRequiredMixin, UserPassesTestMixin, KeysetPaginationMixin, ListView):
     model = CustomUser
     template_name = 'users/user_list.html'
     paginate_by = 20